@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+get_data on a simulated RC-4 over a modelled serial link, decoding in line and with read-ahead.
+
+the link takes latency per response plus the time of each byte at the baudrate (8N1), the
+callback formats every row as elitech-datareader --command get does, plus an optional store time per page.
+
+    python benchmarks/get_data.py [--records 16000] [--latency 0.005] [--store 0.01]
+"""
+
+__author__ = 'civic'
+
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import elitech
+from elitech.simulator import SimulatedLogger, SimulatedSerial
+
+
+def run(args, read_ahead):
+    """
+    :rtype: float  seconds
+    """
+    logger = SimulatedLogger(records=[n % 400 - 100 for n in range(args.records)])
+    device = elitech.Device(None)
+    device.wait_time = 0
+    device._ser = SimulatedSerial(logger, latency=args.latency, byte_time=10.0 / args.baudrate)
+    out = io.StringIO()
+
+    def sink(rows):
+        for line in rows:
+            out.write(u"{0}\t{1:%Y-%m-%d %H:%M:%S}\t{2:.1f}\n".format(*line))
+        if args.store:
+            time.sleep(args.store)
+
+    start = time.time()
+    device.get_data(sink, read_ahead=read_ahead)
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser('get_data read-ahead benchmark')
+    parser.add_argument('--records', type=int, default=16000)
+    parser.add_argument('--baudrate', type=int, default=115200)
+    parser.add_argument('--latency', type=float, default=0.005, help='sec per response')
+    parser.add_argument('--store', type=float, default=0.01, help='sec per page spent by the sink')
+    args = parser.parse_args()
+    base = run(args, 0)
+    print("{:<14}{:8.2f} s".format('in line', base))
+    for read_ahead in (1, 4):
+        t = run(args, read_ahead)
+        print("{:<14}{:8.2f} s{:8.2f}x".format('read_ahead={}'.format(read_ahead), t, base / t))
+
+
+if __name__ == '__main__':
+    main()
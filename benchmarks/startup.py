@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+cold start time of the elitech-datareader script.
+
+runs a fresh interpreter for each sample and reports the median wall time of
+importing the script module, of the modules a device command imports on top of it,
+and of the bare interpreter for comparison.
+
+    python benchmarks/startup.py [--runs 20]
+"""
+
+__author__ = 'civic'
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = [
+    ('interpreter', 'pass'),
+    ('cli import', 'import scripts.elitech_device'),
+    ('cli parse_args', 'import sys, scripts.elitech_device as m; sys.argv = ["x", "-c", "latest", "--value_only", "/dev/null"]; m.parse_args()'),
+    ('device command', 'import scripts.elitech_device, elitech, serial'),
+]
+
+
+def measure(code, runs):
+    """
+    :rtype: float  median seconds
+    """
+    samples = []
+    for _ in range(runs):
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', code], cwd=ROOT)
+        samples.append(time.time() - start)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser('elitech-datareader startup benchmark')
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+    base = None
+    for name, code in CASES:
+        t = measure(code, args.runs)
+        base = t if base is None else base
+        print("{:<16}{:8.1f} ms{:+8.1f} ms".format(name, t * 1000, (t - base) * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,13 @@
 __author__ = 'civic'
 
-from serial import Serial
-
+import sys
 import time
 from datetime import (
     datetime,
     timedelta
 )
-import serial
 import math
+from contextlib import contextmanager
 
 from .msg import (
     AlarmSetting,
@@ -34,22 +33,138 @@ from .msg import (
     DevNumResponse,
     UserInfoRequest,
     UserInfoResponse,
+    RawResponse,
+    _page_layout,
+    _interval_timedelta,
+    _records_to_rows,
 )
+from .sync import FairLock, ReadAhead, SingleFlight
 import six
 
+# serial_port prefix of ports served by elitech-broker
+BROKER_PREFIX = 'unix:'
+
 class Device:
     def __init__(self, serial_port, baudrate=115200, timeout=5):
+        """
+        :param serial_port: serial port path, or 'unix:<socket path>' to talk through elitech-broker
+        """
+        self.serial_port = serial_port
+        self.wait_time = 0.5
         if serial_port is not None:
-            self._ser = serial.Serial(serial_port, baudrate=baudrate, timeout=timeout)
-            self._ser.close()
+            # serial and the broker client are imported only when used, for a fast CLI start
+            if serial_port.startswith(BROKER_PREFIX):
+                from .broker import BrokerTransport
+                self._ser = BrokerTransport(serial_port[len(BROKER_PREFIX):], timeout)
+                self.wait_time = 0
+            else:
+                import serial
+                self._ser = serial.Serial(serial_port, baudrate=baudrate, timeout=timeout)
+                self._ser.close()
         self.debug = False
-        self.wait_time = 0.5
         self.encode = 'utf8'
+        self._lock = FairLock()
+        self._in_session = False
+        self._flight = SingleFlight()
+        self.last_exchange = None
+        # init() is skipped while the last successful exchange is younger than link_ttl seconds (0: always init).
+        # link_state (elitech.link.LinkState) shares that time with other processes using the port.
+        self.link_ttl = 0
+        self.link_state = None
+        self._link_time = None
+        self._init_skipped = False
+
+    @contextmanager
+    def session(self):
+        """
+        keep the port open for every exchange in the block. other threads wait until it ends.
+        """
+        with self._lock:
+            if self._in_session:
+                yield self
+                return
+            self._ser.open()
+            self._in_session = True
+            try:
+                yield self
+            finally:
+                self._in_session = False
+                self._ser.close()
+                self._save_link()
+                time.sleep(self.wait_time)
+
+    @contextmanager
+    def _port(self):
+        """
+        open the port for one exchange. callers from other threads wait in arrival order.
+        """
+        with self._lock:
+            if self._in_session:
+                yield
+                return
+            self._ser.open()
+            try:
+                yield
+            finally:
+                self._ser.close()
+                self._save_link()
+                time.sleep(self.wait_time)
+
+    def _link_good(self):
+        """
+        :rtype: bool  an exchange succeeded within link_ttl
+        """
+        if not self.link_ttl:
+            return False
+        times = [self._link_time]
+        if self.link_state is not None:
+            times.append(self.link_state.last_ok(self.serial_port))
+        times = [t for t in times if t is not None]
+        return bool(times) and 0 <= time.time() - max(times) < self.link_ttl
+
+    def _save_link(self):
+        if self.link_state is None:
+            return
+        if self._link_time is not None:
+            self.link_state.mark(self.serial_port, self._link_time)
+        self.link_state.save()
 
     def _talk(self, request, response):
         """
+        last_exchange is set to the host times (request written, response read).
+        when init was skipped and the exchange fails, init is sent and the exchange retried once.
         :type request: RequestMessage
         """
+        try:
+            self._exchange(request, response)
+        except Exception:
+            self._forget_link()
+            if not self._init_skipped:
+                raise
+            self._init_skipped = False
+            self._flush_input()
+            self._exchange(InitRequest(), InitResponse())
+            self._exchange(request, response)
+        # only a checked reply proves the link. raw responses are not checked unless asked to.
+        if not isinstance(response, RawResponse) or response.check:
+            self._link_time = time.time()
+        return response
+
+    def _flush_input(self):
+        """
+        drop bytes left from a partial reply. flushInput for pyserial 2.7.
+        """
+        if hasattr(self._ser, 'reset_input_buffer'):
+            self._ser.reset_input_buffer()
+        elif hasattr(self._ser, 'flushInput'):
+            self._ser.flushInput()
+
+    def _forget_link(self):
+        self._link_time = None
+        if self.link_state is not None:
+            self.link_state.forget(self.serial_port)
+
+    def _exchange(self, request, response):
         ba = request.to_bytes()
 
         if (self.debug):
@@ -63,38 +178,48 @@ class Device:
                     six.print_()
             six.print_()
 
+        sent = datetime.now()
         self._ser.write(ba)
 
         response.read(self._ser)
-
-        return response
+        self.last_exchange = (sent, datetime.now())
 
     def init(self):
         """
+        skipped while the link is known good (see link_ttl), the response msg is None then.
         :rtype: InitResponse
         """
+        if self._link_good():
+            self._init_skipped = True
+            return InitResponse()
+        self._init_skipped = False
         req = InitRequest()
 
-        try:
-            self._ser.open()
+        with self._port():
             res = self._talk(req, InitResponse())
-        finally:
-            self._ser.close()
-            time.sleep(self.wait_time)
 
         return res
 
     def get_devinfo(self):
         """
+        concurrent calls share one request and the same response object.
         :rtype: DevInfoResponse
         """
+        return self._coalesce(('devinfo',), self._get_devinfo)
+
+    def _coalesce(self, key, fn, *args):
+        """
+        run fn through the single flight, or directly when this thread already holds the port
+        (inside session()): the flight leader may be another thread waiting for that port.
+        """
+        if self._lock.owned():
+            return fn(*args)
+        return self._flight.do(key, fn, *args)
+
+    def _get_devinfo(self):
         req = DevInfoRequest()
-        try:
-            self._ser.open()
+        with self._port():
             res = self._talk(req, DevInfoResponse(self.encode))
-        finally:
-            self._ser.close()
-            time.sleep(self.wait_time)
 
         return res
 
@@ -103,83 +228,140 @@ class Device:
         :type req: ParamPutRequest
         :rtype: ParamPutResponse
         """
-        try:
-            self._ser.open()
+        with self._port():
             res = self._talk(req, ParamPutResponse())
-        finally:
-            self._ser.close()
-            time.sleep(self.wait_time)
 
         return res
 
-    def get_data(self, callback=None, page_size=None):
+    def get_data(self, callback=None, page_size=None, as_frame=False, read_ahead=0):
         """
+        :param as_frame: return a pandas.DataFrame (elitech.frame.records_to_dataframe) built from the raw records
+                         instead of rows. requires pandas.
+        :param read_ahead: decode pages and run callback on a worker thread with up to read_ahead pages waiting,
+                           so the next page is requested while the previous one is processed. 0 decodes in line.
         :type devinfo: DevInfoResponse
         :rtype:list[(int,datetime,float)]
         """
+        if as_frame:
+            from .frame import records_to_dataframe
         devinfo = self.get_devinfo()
         header = self.get_data_header(devinfo.station_no)
 
-        if page_size is None:
-            if devinfo.model_no == 40: # RC-4
-                page_size = 100
-                data_size = 1
-            elif devinfo.model_no == 42: #RC-4HC
-                page_size = 200
-                data_size = 2
-            elif devinfo.model_no == 50: #RC-5
-                page_size = 500
-                data_size = 1
-            else:
-                raise ValueError("Unknowm model_no (%d). can't decide page_size", devinfo.model_no)
+        page_size, data_size = _page_layout(devinfo.model_no, page_size)
 
         page = int(math.ceil(header.rec_count * data_size / float(page_size)))
-        dt = timedelta(hours=devinfo.rec_interval.hour,
-                      minutes=devinfo.rec_interval.minute,
-                      seconds=devinfo.rec_interval.second)
+        dt = _interval_timedelta(devinfo.rec_interval)
 
         data_list = []
-        base_time = devinfo.start_time
-        no = 1
+        records = []
+        # next record number and time, updated by decode (on the worker thread with read_ahead)
+        position = [1, devinfo.start_time]
+
+        def decode(page_records):
+            rows = _records_to_rows(page_records, devinfo.model_no, position[0], position[1], dt)
+            position[0] += len(rows)
+            position[1] += dt * len(rows)
+            if callback is not None:
+                callback(rows)
+            else:
+                data_list.extend(rows)
+
+        worker = ReadAhead(decode, read_ahead) if read_ahead > 0 else None
         try:
-            self._ser.open()
+            with self._port():
+                for p in range(page):
+
+                    req = DataBodyRequest(devinfo.station_no, p)
+                    count = page_size if (p+1) * page_size <= devinfo.rec_count * data_size else (devinfo.rec_count * data_size % page_size)
+                    res = DataBodyResponse(count)
+                    self._talk(req, res)
+
+                    if as_frame:
+                        records.extend(res.records)
+                        if callback is None:
+                            continue
+
+                    if worker is not None:
+                        worker.put(res.records)
+                    else:
+                        decode(res.records)
+        except BaseException:
+            exc_info = sys.exc_info()
+            if worker is not None:
+                try:
+                    worker.close()
+                except Exception:
+                    pass  # the exchange error is the one to report
+            six.reraise(*exc_info)
+        if worker is not None:
+            worker.close()
+
+        if as_frame:
+            return records_to_dataframe(records, devinfo)
+        return data_list
+
+    def get_raw_data(self, callback, page_size=None):
+        """
+        read devinfo, data header and every data body page without decoding the records.
+        callback(name, msg) receives each response as soon as it is read and checked,
+        name is 'devinfo', 'header' or 'page_NNN'.
+        :type callback: (str, bytes) -> None
+        :raises elitech.msg.ResponseError: a response is short, or a page fails its checksum
+        :rtype: DevInfoResponse
+        """
+        devinfo = DevInfoResponse(self.encode)
+        header = DataHeaderResponse()
+        with self._port():
+            res = self._talk(DevInfoRequest(), RawResponse(DevInfoResponse.LENGTH, check=True))
+            devinfo.parse(res.msg)
+            callback('devinfo', res.msg)
+
+            res = self._talk(DataHeaderRequest(devinfo.station_no), RawResponse(DataHeaderResponse.LENGTH, check=True))
+            header.parse(res.msg)
+            callback('header', res.msg)
+
+            page_size, data_size = _page_layout(devinfo.model_no, page_size)
+            total = header.rec_count * data_size
+            page = int(math.ceil(total / float(page_size)))
             for p in range(page):
+                count = min(page_size, total - p * page_size)
+                res = self._talk(DataBodyRequest(devinfo.station_no, p),
+                                 RawResponse(DataBodyResponse.length(count), checksum=True))
+                callback('page_{:03d}'.format(p), res.msg)
 
-                req = DataBodyRequest(devinfo.station_no, p)
-                count = page_size if (p+1) * page_size <= devinfo.rec_count * data_size else (devinfo.rec_count * data_size % page_size)
-                res = DataBodyResponse(count)
-                self._talk(req, res)
+        return devinfo
 
-                if devinfo.model_no == 42:
-                    for rec_temp, rec_humi in zip(*[iter(res.records)] * 2):
-                        data_list.append((no, base_time, rec_temp/10.0, rec_humi/10.0))
-                        no += 1
-                        base_time += dt
-                else:
-                    for rec in res.records:
-                        data_list.append((no, base_time, rec/10.0))
-                        no += 1
-                        base_time += dt
-                if callback is not None:
-                    callback(data_list)
-                    data_list = []
-        finally:
-            self._ser.close()
-            time.sleep(self.wait_time)
+    def get_records(self, devinfo, first_no, last_no, page_size=None):
+        """
+        read only the body pages holding records first_no..last_no (1-based, inclusive).
+        last_no must be the current record count of the logger, the last page length depends on it.
+        :type devinfo: DevInfoResponse
+        :rtype: list[(int,datetime,float)]
+        """
+        page_size, data_size = _page_layout(devinfo.model_no, page_size)
+        dt = _interval_timedelta(devinfo.rec_interval)
+        total = last_no * data_size
+        first_page = (first_no - 1) * data_size // page_size
 
-        return data_list
+        data_list = []
+        with self._port():
+            for p in range(first_page, int(math.ceil(total / float(page_size)))):
+                res = DataBodyResponse(min(page_size, total - p * page_size))
+                self._talk(DataBodyRequest(devinfo.station_no, p), res)
+
+                no = p * page_size // data_size + 1
+                data_list.extend(_records_to_rows(res.records, devinfo.model_no, no,
+                                                  devinfo.start_time + dt * (no - 1), dt))
+
+        return [row for row in data_list if row[0] >= first_no]
 
     def get_data_header(self, target_station_no):
         """
         :rtype: DataHeaderResponse
         """
-        try:
-            self._ser.open()
+        with self._port():
             req = DataHeaderRequest(target_station_no)
             res = self._talk(req, DataHeaderResponse())
-        finally:
-            self._ser.close()
-            time.sleep(self.wait_time)
 
         return res
 
@@ -189,16 +371,12 @@ class Device:
         :type set_time: datetime
         :rtype:ClockSetResponse
         """
-        try:
-            self._ser.open()
+        with self._port():
             if set_time is None:
                 set_time = datetime.now()
             req = ClockSetRequest(station_no, set_time)
             res = ClockSetResponse()
             self._talk(req, res)
-        finally:
-            self._ser.close()
-            time.sleep(self.wait_time)
         return res
 
     def set_device_number(self, station_no, device_number):
@@ -207,14 +385,10 @@ class Device:
         :type device_number: string
         :rtype:DevNumResponse
         """
-        try:
-            self._ser.open()
+        with self._port():
             req = DevNumRequest(station_no)
             req.device_number = device_number
             res = self._talk(req, DevNumResponse())
-        finally:
-            self._ser.close()
-            time.sleep(self.wait_time)
 
         return res
 
@@ -224,14 +398,10 @@ class Device:
         :type user_info: string
         :rtype: UserInfo
         """
-        try:
-            self._ser.open()
+        with self._port():
             req = UserInfoRequest(station_no, self.encode)
             req.user_info = user_info
             res = self._talk(req, UserInfoResponse())
-        finally:
-            self._ser.close()
-            time.sleep(self.wait_time)
 
         return res
 
@@ -239,61 +409,48 @@ class Device:
         request = RequestMessage()
         request.to_bytes = lambda : request_bytes
 
-        response = ResponseMessage()
-
-        response.msg = None
-        def __read(ser):
-            response.msg = ser.read(response_length)
+        response = RawResponse(response_length)
 
-        response.read = __read
-
-        try:
-            self._ser.open()
+        with self._port():
             self._talk(request, response)
-        finally:
-            self._ser.close()
-            time.sleep(self.wait_time)
 
         return response.msg
 
-    def get_latest(self, callback=None, page_size=None):
+    def get_latest(self, callback=None, page_size=None, devinfo=None):
         """
+        concurrent calls with the same arguments share one serial transaction.
+        :param devinfo: devinfo from a previous call. skips the devinfo request, record count is taken from the data header.
         :type devinfo: DevInfoResponse
         :rtype:list[(int,datetime,float)]
         """
-        devinfo = self.get_devinfo()
-        if devinfo.rec_count == 0:
-            return (None, None, None)
+        latest = self._coalesce(('latest', page_size, id(devinfo)), self._get_latest, page_size, devinfo)
+        if callback is not None and latest[0] is not None:
+            callback(latest)
+        return latest
+
+    def _get_latest(self, page_size, devinfo):
+        if devinfo is None:
+            devinfo = self.get_devinfo()
+            if devinfo.rec_count == 0:
+                return (None, None, None)
         header = self.get_data_header(devinfo.station_no)
+        if header.rec_count == 0:
+            return (None, None, None)
 
-        if page_size is None:
-            if devinfo.model_no == 40: # RC-4
-                page_size = 100
-                data_size = 1
-            elif devinfo.model_no == 42: #RC-4HC
-                page_size = 200
-                data_size = 2
-            elif devinfo.model_no == 50: #RC-5
-                page_size = 500
-                data_size = 1
-            else:
-                raise ValueError("Unknowm model_no (%d). can't decide page_size", devinfo.model_no)
+        page_size, data_size = _page_layout(devinfo.model_no, page_size)
 
         page = int(math.ceil(header.rec_count * data_size / float(page_size)))
-        dt = timedelta(hours=devinfo.rec_interval.hour,
-                       minutes=devinfo.rec_interval.minute,
-                       seconds=devinfo.rec_interval.second)
+        dt = _interval_timedelta(devinfo.rec_interval)
 
-
-        base_time = devinfo.start_time + dt * (header.rec_count-1)
+        # the header, read just now, has the start of the current recording even when devinfo is cached
+        base_time = header.start_time + dt * (header.rec_count-1)
 
         no = header.rec_count
-        try:
-            self._ser.open()
+        with self._port():
 
             p = page - 1
             req = DataBodyRequest(devinfo.station_no, p)
-            count = page_size if (p+1) * page_size <= devinfo.rec_count * data_size else (devinfo.rec_count * data_size % page_size)
+            count = page_size if (p+1) * page_size <= header.rec_count * data_size else (header.rec_count * data_size % page_size)
 
             res = DataBodyResponse(count)
             self._talk(req, res)
@@ -304,11 +461,6 @@ class Device:
             else:
                 rec = res.records[-1]
                 latest = (no, base_time, rec/10.0)
-            if callback is not None:
-                callback(latest)
-        finally:
-            self._ser.close()
-            time.sleep(self.wait_time)
 
         return latest
 
@@ -0,0 +1,190 @@
+# coding: utf-8
+
+__author__ = 'civic'
+
+import numpy as np
+
+METHODS = ('nearest', 'linear', 'hold')
+
+_US = np.timedelta64(1, 'us')
+
+
+def _us(td):
+    """
+    :type td: timedelta or numpy.timedelta64
+    :rtype: int  microseconds
+    """
+    return int(np.timedelta64(td, 'us') / _US)
+
+
+class Series:
+    """
+    one recording in columnar form: sorted unique datetime64[us] times and float values.
+    several sessions of a logger can be concatenated; the gaps between them stay gaps.
+    """
+
+    def __init__(self, times, values, name=None):
+        times = np.asarray(times, dtype='datetime64[us]')
+        values = np.asarray(values, dtype=float)
+        order = np.argsort(times, kind='mergesort')
+        times, values = times[order], values[order]
+        keep = np.concatenate(([True], times[1:] != times[:-1])) if len(times) else np.ones(0, bool)
+        self.times = times[keep]
+        self.values = values[keep]
+        self.name = name
+
+    @classmethod
+    def from_rows(cls, rows, column=2, name=None):
+        """
+        :type rows: list[tuple]  get_data rows (no, datetime, temp[, humi])
+        :param column: 2 temperature, 3 humidity
+        :rtype: Series
+        """
+        return cls([row[1] for row in rows], [row[column] for row in rows], name)
+
+    @classmethod
+    def concat(cls, series, name=None):
+        """
+        :type series: list[Series]
+        :rtype: Series
+        """
+        return cls(np.concatenate([s.times for s in series]), np.concatenate([s.values for s in series]), name)
+
+    def default_gap(self):
+        """
+        1.5 times the median sample step.
+        :rtype: numpy.timedelta64
+        """
+        if len(self.times) < 2:
+            return np.timedelta64(0, 'us')
+        step = np.median((self.times[1:] - self.times[:-1]) / _US)
+        return np.timedelta64(int(step * 1.5), 'us')
+
+
+def grid(start, end, step):
+    """
+    :type start: datetime
+    :type end: datetime  exclusive
+    :type step: timedelta
+    :rtype: numpy.ndarray  datetime64[us]
+    """
+    return np.arange(np.datetime64(start, 'us'), np.datetime64(end, 'us'), np.timedelta64(_us(step), 'us'))
+
+
+def _interpolate(times, values, points, method, max_gap):
+    """
+    values of one series at points. NaN where the series has a gap longer than max_gap
+    (microseconds) around the point, or no data.
+    """
+    out = np.full(len(points), np.nan)
+    if len(times) == 0 or len(points) == 0:
+        return out
+    t = times.astype('int64')
+    g = points.astype('int64')
+    nxt = np.searchsorted(t, g, side='right')
+    prev = nxt - 1
+    has_prev = prev >= 0
+    has_next = nxt < len(t)
+    p = np.clip(prev, 0, len(t) - 1)
+    n = np.clip(nxt, 0, len(t) - 1)
+
+    if method == 'hold':
+        ok = has_prev & (g - t[p] <= max_gap)
+        out[ok] = values[p[ok]]
+    elif method == 'linear':
+        ok = has_prev & has_next & (t[n] - t[p] <= max_gap)
+        w = (g[ok] - t[p[ok]]) / (t[n[ok]] - t[p[ok]]).astype(float)
+        out[ok] = values[p[ok]] + w * (values[n[ok]] - values[p[ok]])
+        exact = has_prev & (t[p] == g)
+        out[exact] = values[p[exact]]
+    elif method == 'nearest':
+        d_prev = np.where(has_prev, g - t[p], np.iinfo('int64').max)
+        d_next = np.where(has_next, t[n] - g, np.iinfo('int64').max)
+        nearest = np.where(d_prev <= d_next, p, n)
+        ok = np.minimum(d_prev, d_next) <= max_gap / 2.0
+        out[ok] = values[nearest[ok]]
+    else:
+        raise ValueError("method must be one of {}".format(', '.join(METHODS)))
+    return out
+
+
+def align(series, points, method='linear', max_gap=None):
+    """
+    resample several series onto common grid points.
+    :type series: list[Series]
+    :type points: numpy.ndarray  grid()
+    :param max_gap: samples further apart are not interpolated across. default 1.5 times each series' median step.
+    :rtype: numpy.ndarray  shape (len(points), len(series)), NaN where a series has no data
+    """
+    points = np.asarray(points, dtype='datetime64[us]')
+    matrix = np.empty((len(points), len(series)))
+    for i, s in enumerate(series):
+        gap = _us(max_gap) if max_gap is not None else _us(s.default_gap())
+        matrix[:, i] = _interpolate(s.times, s.values, points, method, gap)
+    return matrix
+
+
+class _Stream:
+    """
+    buffer over an iterator of (times, values) chunks in time order.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self.times = np.empty(0, dtype='datetime64[us]')
+        self.values = np.empty(0)
+        self._done = False
+
+    def fill(self, until):
+        """
+        read until a sample after `until` is buffered or the input ends.
+        """
+        while not self._done and (len(self.times) == 0 or self.times[-1] <= until):
+            try:
+                times, values = next(self._chunks)
+            except StopIteration:
+                self._done = True
+                return
+            chunk = Series(times, values)
+            self.times = np.concatenate((self.times, chunk.times))
+            self.values = np.concatenate((self.values, chunk.values))
+
+    def trim(self, before):
+        """
+        drop samples older than the last one before `before`.
+        """
+        i = np.searchsorted(self.times, before, side='left') - 1
+        if i > 0:
+            self.times = self.times[i:]
+            self.values = self.values[i:]
+
+
+def iter_align(sources, start, end, step, max_gap, method='linear', chunk_points=10000):
+    """
+    align() over a long range without holding the recordings in memory.
+
+    each source is an iterable of (times, values) chunks in time order, e.g. one per get_data page
+    or per archived file. sources are read only as far as the current grid chunk needs.
+    :type sources: list
+    :type max_gap: timedelta
+    :rtype: collections.Iterable[(numpy.ndarray, numpy.ndarray)]  grid points, matrix of each chunk
+    """
+    streams = [_Stream(source) for source in sources]
+    gap = _us(max_gap)
+    first = np.datetime64(start, 'us')
+    stop = np.datetime64(end, 'us')
+    step = np.timedelta64(_us(step), 'us')
+    c = 0
+    while first + c * step < stop:
+        # each chunk's points are generated on their own, the whole grid may not fit in memory
+        chunk_end = min(first + (c + chunk_points) * step, stop)
+        chunk = np.arange(first + c * step, chunk_end, step)
+        ahead = chunk[-1] + np.timedelta64(gap, 'us')
+        matrix = np.empty((len(chunk), len(streams)))
+        for i, stream in enumerate(streams):
+            stream.fill(ahead)
+            matrix[:, i] = _interpolate(stream.times, stream.values, chunk, method, gap)
+            if chunk_end < stop:
+                stream.trim(chunk_end)
+        yield chunk, matrix
+        c += chunk_points
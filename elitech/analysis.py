@@ -0,0 +1,143 @@
+# coding: utf-8
+
+__author__ = 'civic'
+
+from collections import namedtuple
+
+import numpy as np
+
+from .msg import AlarmSetting, _interval_timedelta
+
+# consecutive out of range samples before the logger alarms
+ALARM_SAMPLES = {
+    AlarmSetting.NONE: None,
+    AlarmSetting.T3: 3,
+    AlarmSetting.T10: 10,
+}
+
+# channel: (row column, upper or lower, devinfo limit field)
+CHANNELS = (
+    ('temp_upper', 2, True, 'upper_limit'),
+    ('temp_lower', 2, False, 'lower_limit'),
+    ('humi_upper', 3, True, 'humi_upper_limit'),
+    ('humi_lower', 3, False, 'humi_lower_limit'),
+)
+
+# duration: samples * rec_interval. alarm: the run is long enough for the logger alarm setting.
+Excursion = namedtuple('Excursion', ['channel', 'limit', 'start', 'end', 'duration', 'peak', 'samples',
+                                     'first_no', 'last_no', 'alarm'])
+
+
+def _runs(mask):
+    """
+    :rtype: (numpy.ndarray, numpy.ndarray)  first index, index after the last of each True run
+    """
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], mask.view(np.int8), [0]))))
+    return edges[0::2], edges[1::2]
+
+
+class _Run:
+    def __init__(self, start, first_no, peak):
+        self.start = start
+        self.first_no = first_no
+        self.peak = peak
+        self.samples = 0
+        self.end = None
+        self.last_no = None
+
+
+class ExcursionAnalyzer:
+    """
+    finds runs of records beyond the logger's own limits, page by page.
+
+    pass it as the get_data (or iter_dump) callback. each page is evaluated with numpy,
+    only a run still open at the end of the page is carried to the next, so memory does not
+    grow with the recording. humidity is analysed when rows carry it (RC-4HC).
+    """
+
+    def __init__(self, devinfo, on_excursion=None, alarm=None):
+        """
+        :type devinfo: elitech.msg.DevInfoResponse
+        :param on_excursion: called with each Excursion as it ends. default keeps them in excursions.
+        :type alarm: AlarmSetting  default devinfo.alarm
+        """
+        self.interval = _interval_timedelta(devinfo.rec_interval)
+        self.limits = dict((name, getattr(devinfo, field)) for name, _, _, field in CHANNELS)
+        self.alarm_samples = ALARM_SAMPLES[alarm if alarm is not None else devinfo.alarm]
+        self.excursions = []
+        self.on_excursion = on_excursion if on_excursion is not None else self.excursions.append
+        self.samples = 0
+        self.samples_out = dict((name, 0) for name, _, _, _ in CHANNELS)
+        self._open = {}
+
+    def __call__(self, rows):
+        """
+        :type rows: list[tuple]  (no, datetime, temp[, humi]) of one page
+        """
+        if not rows:
+            return
+        self.samples += len(rows)
+        columns = list(zip(*rows))
+        for name, column, upper, _ in CHANNELS:
+            if column >= len(columns) or self.limits[name] is None:
+                continue
+            values = np.asarray(columns[column], dtype=float)
+            mask = values > self.limits[name] if upper else values < self.limits[name]
+            self.samples_out[name] += int(mask.sum())
+            self._page(name, upper, values, mask, rows)
+
+    def _page(self, name, upper, values, mask, rows):
+        starts, ends = _runs(mask)
+        run = self._open.pop(name, None)
+        if run is not None and (len(starts) == 0 or starts[0] != 0):
+            self._emit(name, run)
+            run = None
+
+        for s, e in zip(starts, ends):
+            peak = values[s:e].max() if upper else values[s:e].min()
+            if run is None:
+                run = _Run(rows[s][1], rows[s][0], peak)
+            else:
+                run.peak = max(run.peak, peak) if upper else min(run.peak, peak)
+            run.samples += int(e - s)
+            run.end = rows[e - 1][1]
+            run.last_no = rows[e - 1][0]
+            if e == len(rows):
+                self._open[name] = run
+            else:
+                self._emit(name, run)
+            run = None
+
+    def _emit(self, name, run):
+        alarm = self.alarm_samples is not None and run.samples >= self.alarm_samples
+        self.on_excursion(Excursion(name, self.limits[name], run.start, run.end, self.interval * run.samples,
+                                    float(run.peak), run.samples, run.first_no, run.last_no, alarm))
+
+    def close(self):
+        """
+        end the recording. runs still open at the last record are emitted.
+        """
+        for name, _, _, _ in CHANNELS:
+            run = self._open.pop(name, None)
+            if run is not None:
+                self._emit(name, run)
+
+    def time_out(self):
+        """
+        time above or below each limit.
+        :rtype: dict[str, timedelta]
+        """
+        return dict((name, self.interval * count) for name, count in self.samples_out.items())
+
+
+def analyze(device, page_size=None, alarm=None):
+    """
+    download and analyse a logger.
+    :type device: elitech.Device
+    :rtype: ExcursionAnalyzer
+    """
+    devinfo = device.get_devinfo()
+    analyzer = ExcursionAnalyzer(devinfo, alarm=alarm)
+    device.get_data(callback=analyzer, page_size=page_size)
+    analyzer.close()
+    return analyzer
@@ -0,0 +1,143 @@
+# coding: utf-8
+
+__author__ = 'civic'
+
+import json
+from datetime import datetime, time
+from enum import Enum
+
+from .msg import _bin
+from .provision import SETTINGS, _clock, provision_device
+
+COMMANDS = ('devinfo', 'latest', 'get', 'set', 'clock', 'raw')
+
+_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _json_value(v):
+    if isinstance(v, Enum):
+        return v.name
+    if isinstance(v, datetime):
+        return v.strftime(_TIME_FORMAT)
+    if isinstance(v, time):
+        return v.strftime('%H:%M:%S')
+    return v
+
+
+def _devinfo(devinfo):
+    return dict((k, _json_value(v)) for k, v in vars(devinfo).items() if not k.startswith('_'))
+
+
+def _row(row):
+    return [_json_value(v) for v in row]
+
+
+def _changes(changes):
+    return [[field, _json_value(current), _json_value(requested)] for field, current, requested in changes]
+
+
+class BatchRunner:
+    """
+    runs commands against one device in one port session, init is sent once for the whole batch.
+
+    each command is a dict with `command` (one of COMMANDS), its arguments and an optional `id`
+    echoed in the result:
+      {"command": "devinfo"}
+      {"command": "latest", "page_size": 100}
+      {"command": "get", "page_size": 100}
+      {"command": "set", "interval": 60, "user_info": "room 1"}   keys of elitech.provision.SETTINGS
+      {"command": "clock", "time": "2015-10-01 00:00:00"}          time defaults to now
+      {"command": "raw", "req": "CC 00 0A 00 D6", "res_len": 3}
+    results are {"id", "command", "ok": true, "result"} or {"id", "command", "ok": false, "error"}.
+    """
+
+    def __init__(self, device):
+        """
+        :type device: elitech.Device
+        """
+        self.device = device
+
+    def run(self, commands):
+        """
+        :type commands: collections.Iterable[dict]
+        :rtype: collections.Iterable[dict]  one result per command, yielded as soon as it is done
+        """
+        with self.device.session():
+            self.device.init()
+            for command in commands:
+                yield self.execute(command)
+
+    def execute(self, command):
+        """
+        :param command: dict, or the exception raised while parsing it
+        :rtype: dict
+        """
+        name = command.get('command') if isinstance(command, dict) else None
+        result = {'id': command.get('id') if isinstance(command, dict) else None, 'command': name}
+        try:
+            if isinstance(command, Exception):
+                raise command
+            if not isinstance(command, dict):
+                raise ValueError("command must be a json object")
+            if name not in COMMANDS:
+                raise ValueError("command must be one of {}".format(', '.join(COMMANDS)))
+            result['result'] = getattr(self, '_' + name)(command)
+            result['ok'] = True
+        except Exception as e:
+            result['ok'] = False
+            result['error'] = u"{}: {}".format(type(e).__name__, e)
+        return result
+
+    def _devinfo(self, command):
+        return _devinfo(self.device.get_devinfo())
+
+    def _latest(self, command):
+        latest = self.device.get_latest(page_size=command.get('page_size'))
+        return _row(latest) if latest[0] is not None else None
+
+    def _get(self, command):
+        return [_row(row) for row in self.device.get_data(page_size=command.get('page_size'))]
+
+    def _set(self, command):
+        unknown = set(command) - set(SETTINGS) - {'command', 'id'}
+        if unknown:
+            raise ValueError("unknown settings: {}".format(', '.join(sorted(unknown))))
+        devinfo, changes, mismatches = provision_device(self.device, command, init=False)
+        return {'changes': _changes(changes), 'mismatches': _changes(mismatches)}
+
+    def _clock(self, command):
+        devinfo = self.device.get_devinfo()
+        clock = _clock(command.get('time', 'now'))
+        self.device.set_clock(devinfo.station_no, clock)
+        return clock.strftime(_TIME_FORMAT)
+
+    def _raw(self, command):
+        res = self.device.raw_send(_bin(command['req']), int(command.get('res_len', 1000)))
+        return ' '.join('{:02X}'.format(b) for b in bytearray(res))
+
+
+def run_batch(device, lines, out):
+    """
+    read json lines commands, write a json line result per command.
+    blank lines are skipped, a line that is not json gets an error result.
+    :type device: elitech.Device
+    :type lines: collections.Iterable[str]
+    :param out: file-like, flushed after every result
+    :rtype: int  number of failed commands
+    """
+    def commands():
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield e
+
+    failed = 0
+    for result in BatchRunner(device).run(commands()):
+        failed += 0 if result['ok'] else 1
+        out.write(json.dumps(result, sort_keys=True) + '\n')
+        out.flush()
+    return failed
@@ -0,0 +1,240 @@
+# coding: utf-8
+
+__author__ = 'civic'
+
+import itertools
+import os
+import socket
+import struct
+import threading
+import time
+from six.moves import queue, socketserver
+
+from . import BROKER_PREFIX
+from .msg import DevInfoRequest, DevInfoResponse
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+PRIORITY_AUTO = 255
+
+# client -> broker: priority, flags, request length, response length, request bytes
+_REQUEST = struct.Struct('>BBHH')
+_NO_CACHE = 0x01
+# broker -> client: status, length, response bytes (or error message)
+_REPLY = struct.Struct('>BH')
+_OK = 0
+_ERROR = 1
+
+_DEVINFO_REQUEST = DevInfoRequest().to_bytes()
+_WRITE_COMMANDS = (0x05, 0x07, 0x09, 0x0B)  # param put, clock set, user info, dev num
+
+
+def _recv_exact(sock, length):
+    buf = b''
+    while len(buf) < length:
+        chunk = sock.recv(length - len(buf))
+        if not chunk:
+            raise EOFError("broker connection closed")
+        buf += chunk
+    return buf
+
+
+def classify(request):
+    """
+    data body pages are bulk, everything else is interactive.
+    :type request: bytes
+    :rtype: int
+    """
+    ba = bytearray(request)
+    if len(ba) >= 3 and ba[0] == 0x33 and ba[2] == 0x02:
+        return PRIORITY_BULK
+    return PRIORITY_INTERACTIVE
+
+
+class BrokerTransport:
+    """
+    serial.Serial look-alike that sends each exchange to a broker over a unix socket.
+
+    a written request is held until the response is read, then request and
+    expected response length go to the broker as one frame. with use_cache False,
+    devinfo is read from the logger instead of the broker cache.
+
+    a reply must arrive within timeout (serial read timeout of the exchange) plus queue_wait
+    seconds (waiting behind other clients' exchanges), or socket.timeout is raised and the
+    connection dropped. None waits forever.
+    """
+
+    def __init__(self, socket_path, timeout=None, priority=PRIORITY_AUTO, queue_wait=30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.priority = priority
+        self.queue_wait = queue_wait
+        self.use_cache = True
+        self._sock = None
+        self._pending = b''
+
+    def open(self):
+        if self._sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            if self.timeout is not None:
+                sock.settimeout(self.timeout + (self.queue_wait or 0))
+            sock.connect(self.socket_path)
+            self._sock = sock
+
+    def close(self):
+        self._pending = b''
+
+    def disconnect(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def write(self, ba):
+        self._pending += ba
+
+    def read(self, length):
+        self.open()
+        request, self._pending = self._pending, b''
+        try:
+            flags = 0 if self.use_cache else _NO_CACHE
+            self._sock.sendall(_REQUEST.pack(self.priority, flags, len(request), length) + request)
+            status, size = _REPLY.unpack(_recv_exact(self._sock, _REPLY.size))
+            body = _recv_exact(self._sock, size)
+        except (socket.error, EOFError):
+            self.disconnect()
+            raise
+        if status != _OK:
+            raise IOError(body.decode('utf-8', 'replace'))
+        return body
+
+
+class _Job:
+    def __init__(self, request, length, use_cache):
+        self.request = request
+        self.length = length
+        self.use_cache = use_cache
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        broker = self.server.broker
+        while True:
+            try:
+                priority, flags, req_len, res_len = _REQUEST.unpack(_recv_exact(self.request, _REQUEST.size))
+                request = _recv_exact(self.request, req_len)
+            except (EOFError, socket.error):
+                return
+            try:
+                body, status = broker.submit(request, res_len, priority, not flags & _NO_CACHE), _OK
+            except Exception as e:
+                body, status = str(e).encode('utf-8'), _ERROR
+            self.request.sendall(_REPLY.pack(status, len(body)) + body)
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class Broker:
+    """
+    owns one serial port and serves protocol exchanges to many clients over a unix socket.
+
+    exchanges are queued by priority (interactive before bulk data pages) then arrival order,
+    and run one at a time on the port. devinfo answers are cached for `devinfo_ttl` seconds
+    and dropped after any write command.
+    """
+
+    def __init__(self, ser, socket_path, devinfo_ttl=5.0):
+        """
+        :type ser: serial.Serial  opened serial port
+        :type socket_path: str
+        """
+        self.ser = ser
+        self.socket_path = socket_path
+        self.devinfo_ttl = devinfo_ttl
+        self._jobs = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._devinfo = None
+        self._devinfo_time = 0
+        self._server = None
+        self._threads = []
+
+    def submit(self, request, length, priority=PRIORITY_AUTO, use_cache=True):
+        """
+        queue one exchange and wait for the response.
+        :type request: bytes
+        :type length: int
+        :param use_cache: False to read devinfo from the logger (a fresh devinfo.current), the answer is still cached.
+        :rtype: bytes
+        """
+        if use_cache and request == _DEVINFO_REQUEST and length == DevInfoResponse.LENGTH:
+            cached = self._cached_devinfo()
+            if cached is not None:
+                return cached
+        if priority == PRIORITY_AUTO:
+            priority = classify(request)
+        job = _Job(request, length, use_cache)
+        self._jobs.put((priority, next(self._seq), job))
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _cached_devinfo(self):
+        if self._devinfo is not None and time.time() - self._devinfo_time < self.devinfo_ttl:
+            return self._devinfo
+        return None
+
+    def _exchange(self, job):
+        ba = bytearray(job.request)
+        if len(ba) >= 3 and ba[0] == 0x33 and ba[2] in _WRITE_COMMANDS:
+            self._devinfo = None
+
+        if job.use_cache and job.request == _DEVINFO_REQUEST and job.length == DevInfoResponse.LENGTH:
+            cached = self._cached_devinfo()
+            if cached is not None:
+                return cached
+
+        if job.request:
+            self.ser.write(job.request)
+        res = self.ser.read(job.length) if job.length else b''
+
+        if job.request == _DEVINFO_REQUEST and len(res) == DevInfoResponse.LENGTH:
+            self._devinfo = res
+            self._devinfo_time = time.time()
+        return res
+
+    def _serial_loop(self):
+        while True:
+            _, _, job = self._jobs.get()
+            if job is None:
+                return
+            try:
+                job.result = self._exchange(job)
+            except Exception as e:
+                job.error = e
+            job.done.set()
+
+    def start(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = _Server(self.socket_path, _Handler)
+        self._server.broker = self
+        for target in (self._serial_loop, self._server.serve_forever):
+            t = threading.Thread(target=target)
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+    def shutdown(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._jobs.put((-1, -1, None))
+        for t in self._threads:
+            t.join()
+        self._threads = []
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
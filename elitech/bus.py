@@ -0,0 +1,168 @@
+# coding: utf-8
+
+__author__ = 'civic'
+
+import math
+
+from .msg import (
+    DataHeaderRequest,
+    DataHeaderResponse,
+    DataBodyRequest,
+    DataBodyResponse,
+    RawResponse,
+    _append_checksum,
+    _interval_timedelta,
+    _page_layout,
+    _records_to_rows,
+)
+
+
+class Station:
+    """
+    one logger on a shared serial line.
+
+    DevInfoRequest carries no station number, so model_no and rec_interval of
+    each station can not be read on a shared line. take them from a devinfo read
+    while the logger was alone on the port (from_devinfo) or from configuration.
+    :type station_no: int
+    :type model_no: int
+    :type rec_interval: datetime.time
+    :type header: DataHeaderResponse
+    """
+
+    def __init__(self, station_no, model_no=40, rec_interval=None):
+        self.station_no = station_no
+        self.model_no = model_no
+        self.rec_interval = rec_interval
+        self.header = None
+
+    @classmethod
+    def from_devinfo(cls, devinfo):
+        """
+        :type devinfo: elitech.msg.DevInfoResponse
+        :rtype: Station
+        """
+        return cls(devinfo.station_no, devinfo.model_no, devinfo.rec_interval)
+
+
+def _valid(msg, length):
+    ba = bytearray(msg or b'')
+    return len(ba) == length and ba[0] == 0x55 and bytearray(_append_checksum(bytes(ba[:-1])))[-1] == ba[-1]
+
+
+class Bus:
+    """
+    several stations on one serial line, addressed by target_station_no.
+    """
+
+    def __init__(self, device, probe_timeout=0.2):
+        """
+        :type device: elitech.Device
+        :param probe_timeout: serial read timeout while probing station numbers
+        """
+        self.device = device
+        self.probe_timeout = probe_timeout
+
+    def discover(self, candidates=range(1, 256)):
+        """
+        probe station numbers with a data header request. stations that answer a valid header are on the line.
+        :rtype: list[int]
+        """
+        ser = self.device._ser
+        timeout = getattr(ser, 'timeout', None)
+        found = []
+        with self.device.session():
+            if timeout is not None:
+                ser.timeout = self.probe_timeout
+            try:
+                for station_no in candidates:
+                    res = self.device._talk(DataHeaderRequest(station_no), RawResponse(DataHeaderResponse.LENGTH))
+                    if _valid(res.msg, DataHeaderResponse.LENGTH):
+                        found.append(station_no)
+                    else:
+                        self.device._flush_input()
+            finally:
+                if timeout is not None:
+                    ser.timeout = timeout
+        return found
+
+    def read_headers(self, stations):
+        """
+        refresh station.header (record count, start time) of every station in one session.
+        :type stations: list[Station]
+        """
+        with self.device.session():
+            for station in stations:
+                station.header = self.device.get_data_header(station.station_no)
+
+    def poll_latest(self, stations):
+        """
+        latest record of every station.
+        :type stations: list[Station]
+        :rtype: dict[int, tuple]
+        """
+        latest = {}
+        with self.device.session():
+            for station in stations:
+                station.header = self.device.get_data_header(station.station_no)
+                rec_count = station.header.rec_count
+                if rec_count == 0:
+                    latest[station.station_no] = None
+                    continue
+                rows = self.device.get_records(self._devinfo(station), rec_count, rec_count)
+                latest[station.station_no] = rows[-1]
+        return latest
+
+    def download(self, stations, callback, page_size=None):
+        """
+        download all records of several stations. page requests are interleaved
+        round-robin so every station progresses together.
+        :type stations: list[Station]
+        :param callback: called with (station_no, rows) for every page
+        """
+        with self.device.session():
+            pending = []
+            for station in stations:
+                self._interval(station)
+                station.header = self.device.get_data_header(station.station_no)
+                size, data_size = _page_layout(station.model_no, page_size)
+                total = station.header.rec_count * data_size
+                pending.append([station, size, data_size, total, 0, int(math.ceil(total / float(size)))])
+
+            while pending:
+                for task in list(pending):
+                    station, size, data_size, total, p, pages = task
+                    if p >= pages:
+                        pending.remove(task)
+                        continue
+                    res = DataBodyResponse(min(size, total - p * size))
+                    self.device._talk(DataBodyRequest(station.station_no, p), res)
+                    callback(station.station_no, self._rows(station, res.records, p * size // data_size + 1))
+                    task[4] = p + 1
+
+    def _devinfo(self, station):
+        devinfo = _StationInfo()
+        devinfo.station_no = station.station_no
+        devinfo.model_no = station.model_no
+        devinfo.rec_interval = self._interval(station)
+        devinfo.start_time = station.header.start_time
+        return devinfo
+
+    def _interval(self, station):
+        if station.rec_interval is None:
+            raise ValueError("rec_interval of station {} is unknown".format(station.station_no))
+        return station.rec_interval
+
+    def _rows(self, station, records, no):
+        dt = _interval_timedelta(self._interval(station))
+        return _records_to_rows(records, station.model_no, no, station.header.start_time + dt * (no - 1), dt)
+
+
+class _StationInfo:
+    """
+    the devinfo fields Device.get_records needs.
+    """
+    station_no = None
+    model_no = None
+    rec_interval = None
+    start_time = None
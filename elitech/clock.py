@@ -0,0 +1,257 @@
+# coding: utf-8
+
+__author__ = 'civic'
+
+import io
+import json
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from .msg import DevInfoRequest, DevInfoResponse
+
+_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+# offset: logger clock - host clock in seconds. rtt: round trip of the devinfo exchange in seconds.
+DriftSample = namedtuple('DriftSample', ['host_time', 'offset', 'rtt'])
+
+ClockSyncResult = namedtuple('ClockSyncResult', ['port', 'dev_num', 'offset', 'rtt', 'action', 'error'])
+
+
+def measure_drift(device):
+    """
+    read devinfo and compare devinfo.current with host time.
+
+    the logger answers somewhere between request and response, so host time is taken
+    at the middle of the exchange and rtt is the uncertainty. devinfo.current is truncated
+    to the second, half a second is added to compensate. through elitech-broker, the
+    devinfo cache is bypassed.
+    :type device: elitech.Device
+    :rtype: (DevInfoResponse, DriftSample)
+    """
+    with device._port():
+        use_cache = getattr(device._ser, 'use_cache', None)
+        if use_cache is not None:
+            device._ser.use_cache = False
+        try:
+            devinfo = device._talk(DevInfoRequest(), DevInfoResponse(device.encode))
+        finally:
+            if use_cache is not None:
+                device._ser.use_cache = use_cache
+        sent, received = device.last_exchange
+    host_time = sent + (received - sent) / 2
+    offset = (devinfo.current - host_time).total_seconds() + 0.5
+    return devinfo, DriftSample(host_time, offset, (received - sent).total_seconds())
+
+
+def set_clock_aligned(device, station_no, rtt=0.0):
+    """
+    set the logger clock to host time. the clock set frame only carries whole seconds,
+    so it is sent when host time plus the one way latency crosses a second.
+    :type device: elitech.Device
+    """
+    one_way = timedelta(seconds=rtt / 2.0)
+    target = datetime.now() + one_way
+    time.sleep(1 - target.microsecond / 1000000.0)
+    target = datetime.now() + one_way + timedelta(microseconds=500000)
+    return device.set_clock(station_no, target.replace(microsecond=0))
+
+
+def _fit(samples):
+    """
+    least squares line of offset over host time.
+    :rtype: (datetime, float, float)  origin, offset at origin, seconds of drift per second
+    """
+    origin = samples[0].host_time
+    xs = [(s.host_time - origin).total_seconds() for s in samples]
+    ys = [s.offset for s in samples]
+    n = float(len(samples))
+    mx = sum(xs) / n
+    my = sum(ys) / n
+    sxx = sum((x - mx) ** 2 for x in xs)
+    if sxx == 0:
+        return origin, my, 0.0
+    slope = sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sxx
+    return origin, my - slope * mx, slope
+
+
+class DriftHistory:
+    """
+    drift samples and clock sets per logger (dev_num), kept in a json file.
+
+    samples between two clock sets lie on one line (the crystal runs at a steady rate),
+    which is used to predict drift without talking to the logger and to correct timestamps.
+    """
+
+    def __init__(self, path=None, max_samples=1000):
+        self.path = path
+        self.max_samples = max_samples
+        self._loggers = {}
+        if path is not None and os.path.exists(path):
+            with io.open(path, encoding='utf-8') as f:
+                self._loggers = json.load(f)
+
+    def save(self):
+        if self.path is None:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with io.open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(json.dumps(self._loggers, indent=1, sort_keys=True))
+        os.rename(self.path + '.tmp', self.path)
+
+    def _entry(self, dev_num):
+        return self._loggers.setdefault(dev_num, {'port': None, 'sets': [], 'samples': []})
+
+    def add(self, dev_num, sample, port=None, fingerprint=None):
+        """
+        :type sample: DriftSample
+        :param fingerprint: elitech.discover fingerprint of the port node when the sample was taken
+        """
+        entry = self._entry(dev_num)
+        if port is not None:
+            for other in self._loggers.values():
+                if other['port'] == port:
+                    other['port'] = None
+            entry['port'] = port
+            entry['fingerprint'] = fingerprint
+        entry['samples'].append([sample.host_time.strftime(_TIME_FORMAT), sample.offset, sample.rtt])
+        del entry['samples'][:-self.max_samples]
+
+    def clock_set(self, dev_num, host_time=None):
+        """
+        record that the logger clock was set. later samples start a new line.
+        """
+        entry = self._entry(dev_num)
+        entry['sets'].append((host_time or datetime.now()).strftime(_TIME_FORMAT))
+
+    def dev_num_on(self, port, fingerprint=None):
+        """
+        logger last measured on port. with a fingerprint, None unless the port node is the one
+        that logger was measured on (not replugged or swapped since).
+        :rtype: str
+        """
+        for dev_num, entry in self._loggers.items():
+            if entry['port'] == port:
+                if fingerprint is not None and entry.get('fingerprint') != fingerprint:
+                    return None
+                return dev_num
+        return None
+
+    def samples(self, dev_num, when=None):
+        """
+        samples of the clock segment (between clock sets) containing when, default the current one.
+        :rtype: list[DriftSample]
+        """
+        entry = self._loggers.get(dev_num)
+        if entry is None:
+            return []
+        when = when or datetime.now()
+        sets = sorted(datetime.strptime(t, _TIME_FORMAT) for t in entry['sets'])
+        begin = max([t for t in sets if t <= when] or [datetime.min])
+        end = min([t for t in sets if t > when] or [datetime.max])
+        samples = (DriftSample(datetime.strptime(t, _TIME_FORMAT), offset, rtt) for t, offset, rtt in entry['samples'])
+        return [s for s in samples if begin <= s.host_time < end]
+
+    def offset_at(self, dev_num, when=None):
+        """
+        logger clock - host clock in seconds at host time `when`, from the line through the
+        samples of that clock segment. None if there are no samples.
+        :rtype: float
+        """
+        when = when or datetime.now()
+        samples = self.samples(dev_num, when)
+        if not samples:
+            return None
+        origin, offset, slope = _fit(samples)
+        return offset + slope * (when - origin).total_seconds()
+
+    def rate(self, dev_num, when=None):
+        """
+        drift in seconds per day of the clock segment containing when. None with less than 2 samples.
+        :rtype: float
+        """
+        samples = self.samples(dev_num, when)
+        if len(samples) < 2:
+            return None
+        return _fit(samples)[2] * 86400
+
+
+def _port_fingerprint(port):
+    """
+    :rtype: list  None if the port node cannot be read
+    """
+    from .discover import _fingerprint, usb_ids
+    try:
+        return _fingerprint(port, usb_ids().get(os.path.realpath(port)))
+    except OSError:
+        return None
+
+
+def _sync_one(port, threshold, baudrate, timeout, encode):
+    import elitech
+    device = elitech.Device(port, baudrate, timeout)
+    device.encode = encode
+    with device.session():
+        devinfo, before = measure_drift(device)
+        after = None
+        if abs(before.offset) > threshold:
+            set_clock_aligned(device, devinfo.station_no, before.rtt)
+            after = measure_drift(device)[1]
+    return devinfo, before, after
+
+
+def sync_clocks(ports, threshold=2.0, history=None, jobs=16, max_age=timedelta(days=7), force=False,
+                baudrate=115200, timeout=1.0, encode='utf8'):
+    """
+    measure drift of every port in parallel and set the clock where it exceeds threshold seconds.
+
+    with a history, a logger whose predicted drift is below threshold / 2 and which was measured
+    within max_age is not contacted at all (action 'predicted'). this needs the port node to be
+    unchanged since (see elitech.discover), a replugged or swapped logger is always measured.
+    :type ports: list[str]
+    :type history: DriftHistory
+    :rtype: list[ClockSyncResult]  action is predicted, ok or set
+    """
+    now = datetime.now()
+    results = {}
+    to_measure = []
+    fingerprints = dict((port, _port_fingerprint(port)) for port in ports)
+    for port in ports:
+        dev_num = None
+        if history is not None and fingerprints[port] is not None:
+            dev_num = history.dev_num_on(port, fingerprints[port])
+        if dev_num is not None and not force:
+            samples = history.samples(dev_num, now)
+            predicted = history.offset_at(dev_num, now)
+            if len(samples) >= 2 and now - samples[-1].host_time < max_age and abs(predicted) < threshold / 2.0:
+                results[port] = ClockSyncResult(port, dev_num, predicted, None, 'predicted', None)
+                continue
+        to_measure.append(port)
+
+    def run(port):
+        try:
+            return port, _sync_one(port, threshold, baudrate, timeout, encode), None
+        except Exception as e:
+            return port, None, str(e) or e.__class__.__name__
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for port, result, error in executor.map(run, to_measure):
+            if error is not None:
+                results[port] = ClockSyncResult(port, None, None, None, None, error)
+                continue
+            devinfo, before, after = result
+            if history is not None:
+                history.add(devinfo.dev_num, before, port, fingerprints[port])
+                if after is not None:
+                    history.clock_set(devinfo.dev_num, after.host_time - timedelta(seconds=after.rtt))
+                    history.add(devinfo.dev_num, after, port, fingerprints[port])
+            action = 'ok' if after is None else 'set'
+            results[port] = ClockSyncResult(port, devinfo.dev_num, before.offset, before.rtt, action, None)
+
+    if history is not None:
+        history.save()
+    return [results[port] for port in ports]
@@ -0,0 +1,232 @@
+# coding: utf-8
+
+__author__ = 'civic'
+
+import io
+import os
+import sqlite3
+from multiprocessing import Pool, cpu_count
+
+from .dump import is_dump, load_dump, load_dump_info
+
+# journal of converted dumps, one per output target and sink
+JOURNAL_FORMAT = '.elitech-convert.{}.done'
+
+
+def _common_dir(paths):
+    """
+    deepest directory containing every path.
+    """
+    parts = [os.path.dirname(p).split(os.sep) for p in paths]
+    common = parts[0]
+    for other in parts[1:]:
+        n = 0
+        while n < min(len(common), len(other)) and common[n] == other[n]:
+            n += 1
+        common = common[:n]
+    return os.sep.join(common) or os.sep
+
+
+def find_dumps(paths):
+    """
+    collect dump directories under paths, sorted so that conversion order is deterministic.
+    the output name is the path relative to the root it was found under (the directory name
+    for a root that is a dump itself). with several roots, names found under a root are
+    prefixed with its directory name, so dumps with the same name under different roots get
+    different names.
+    :type paths: list[str]
+    :rtype: list[(str, str)]  (dump directory, output name)
+    :raises ValueError: two dumps would get the same output name
+    """
+    found = {}
+    for root in paths:
+        root = os.path.abspath(root)
+        if is_dump(root):
+            found.setdefault(root, os.path.basename(root))
+            continue
+        prefix = [os.path.basename(root)] if len(paths) > 1 else []
+        for dirpath, dirnames, _ in os.walk(root):
+            dirnames.sort()
+            if is_dump(dirpath):
+                found.setdefault(dirpath, '_'.join(prefix + os.path.relpath(dirpath, root).split(os.sep)))
+
+    dumps = sorted(found.items())
+    seen = {}
+    for path, name in dumps:
+        if name in seen:
+            raise ValueError("dumps {} and {} have the same output name {}".format(seen[name], path, name))
+        seen[name] = path
+    return dumps
+
+
+def _decode(args):
+    path, encode = args
+    devinfo, _ = load_dump_info(path, encode)
+    return path, devinfo, load_dump(path, encode)
+
+
+def session_name(devinfo):
+    """
+    name of a recording session: dev_num (station_no without one) and start time.
+    :type devinfo: elitech.msg.DevInfoResponse
+    :rtype: str
+    """
+    return '{}_{:%Y%m%d%H%M%S}'.format(devinfo.dev_num or devinfo.station_no, devinfo.start_time)
+
+
+class Sink:
+    def write(self, name, devinfo, data_list):
+        """
+        :type name: str
+        :type devinfo: elitech.msg.DevInfoResponse
+        :type data_list: list[tuple]
+        """
+        pass
+
+    def close(self):
+        pass
+
+
+class TsvSink(Sink):
+    """
+    one tsv file per dump, same format as elitech-datareader --command get.
+    """
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        if not os.path.isdir(out_dir):
+            os.makedirs(out_dir)
+
+    def write(self, name, devinfo, data_list):
+        path = os.path.join(self.out_dir, name + '.tsv')
+        with io.open(path + '.tmp', 'w', encoding='utf-8') as f:
+            for line in data_list:
+                if len(line) == 3:
+                    f.write(u"{0}\t{1:%Y-%m-%d %H:%M:%S}\t{2:.1f}\n".format(*line))
+                else:
+                    f.write(u"{0}\t{1:%Y-%m-%d %H:%M:%S}\t{2:.1f}\t{3:.1f}\n".format(*line))
+        os.rename(path + '.tmp', path)
+
+
+class SqliteSink(Sink):
+    """
+    all dumps in a single records table. a dump is committed as one transaction.
+    """
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS records ("
+                          "source TEXT, dev_num TEXT, station_no INTEGER, no INTEGER, "
+                          "time TEXT, temp REAL, humi REAL, PRIMARY KEY (source, no))")
+
+    def write(self, name, devinfo, data_list):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((name, devinfo.dev_num, devinfo.station_no, line[0], line[1].strftime('%Y-%m-%d %H:%M:%S'),
+                  line[2], line[3] if len(line) == 4 else None) for line in data_list))
+
+    def close(self):
+        self.conn.close()
+
+
+class ParquetSink(Sink):
+    """
+    one parquet file per dump. requires pyarrow.
+    """
+    def __init__(self, out_dir):
+        import pyarrow
+        import pyarrow.parquet
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.out_dir = out_dir
+        if not os.path.isdir(out_dir):
+            os.makedirs(out_dir)
+
+    def write(self, name, devinfo, data_list):
+        columns = {
+            'no': [line[0] for line in data_list],
+            'time': [line[1] for line in data_list],
+            'temp': [line[2] for line in data_list],
+        }
+        if devinfo.model_no == 42:
+            columns['humi'] = [line[3] for line in data_list]
+        table = self._pa.table(columns)
+        path = os.path.join(self.out_dir, name + '.parquet')
+        self._pq.write_table(table, path + '.tmp')
+        os.rename(path + '.tmp', path)
+
+
+class RollupSink(Sink):
+    """
+    minute / hour / day rollups of every dump in a sqlite database (elitech.rollup).
+    the source is the recording session (see session_name), not the dump name, so dumps and
+    incremental downloads of one session extend one source.
+    """
+    def __init__(self, path):
+        from .rollup import RollupIndex
+        self.index = RollupIndex(path)
+
+    def write(self, name, devinfo, data_list):
+        self.index.add(session_name(devinfo) if devinfo is not None else name, data_list)
+
+    def close(self):
+        self.index.close()
+
+
+SINKS = {
+    'tsv': TsvSink,
+    'sqlite': SqliteSink,
+    'parquet': ParquetSink,
+    'rollup': RollupSink,
+}
+
+
+def _journal_path(out, sink_name):
+    """
+    inside an output directory, next to an output file.
+    """
+    name = JOURNAL_FORMAT.format(sink_name)
+    if os.path.isdir(out):
+        return os.path.join(out, name)
+    return os.path.abspath(out) + name
+
+
+def convert_dumps(paths, sink_name, out, processes=None, encode='utf8', progress=None, resume=True):
+    """
+    decode dump directories on a process pool and write them to the sink in sorted order.
+    completed dumps are recorded in a journal of the output and sink so an interrupted run resumes.
+    :type paths: list[str]
+    :type sink_name: str  tsv / sqlite / parquet
+    :type out: str  output directory (tsv, parquet) or database file (sqlite)
+    :type progress: (int, int, str) -> None
+    :rtype: int  number of converted dumps
+    """
+    sink = SINKS[sink_name](out)
+    journal = _journal_path(out, sink_name)
+
+    done = set()
+    if resume and os.path.exists(journal):
+        with io.open(journal, encoding='utf-8') as f:
+            done = set(line.rstrip('\n') for line in f)
+
+    dumps = find_dumps(paths)
+    names = dict(dumps)
+    todo = [path for path, _ in dumps if path not in done]
+    total = len(dumps)
+    count = total - len(todo)
+
+    pool = Pool(processes or cpu_count())
+    try:
+        with io.open(journal, 'a' if resume else 'w', encoding='utf-8') as f:
+            for path, devinfo, data_list in pool.imap(_decode, [(p, encode) for p in todo]):
+                sink.write(names[path], devinfo, data_list)
+                f.write(path + u'\n')
+                f.flush()
+                count += 1
+                if progress is not None:
+                    progress(count, total, path)
+    finally:
+        pool.terminate()
+        pool.join()
+        sink.close()
+
+    return len(todo)
@@ -0,0 +1,160 @@
+# coding: utf-8
+
+__author__ = 'civic'
+
+import binascii
+import glob
+import io
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .msg import DevInfoRequest, DevInfoResponse, RawResponse, ResponseError
+
+PORT_PATTERNS = (
+    '/dev/ttyUSB*',
+    '/dev/ttyACM*',
+    '/dev/tty.SLAB_USBtoUART*',
+    '/dev/tty.wchusbserial*',
+)
+BY_ID_DIR = '/dev/serial/by-id'
+
+FoundLogger = namedtuple('FoundLogger', ['port', 'usb_id', 'devinfo'])
+
+
+def candidate_ports(patterns=PORT_PATTERNS):
+    """
+    :rtype: list[str]
+    """
+    ports = set()
+    for pattern in patterns:
+        ports.update(glob.glob(pattern))
+    return sorted(ports)
+
+
+def usb_ids(by_id_dir=BY_ID_DIR):
+    """
+    map device node -> stable usb serial path (/dev/serial/by-id/...).
+    :rtype: dict[str, str]
+    """
+    ids = {}
+    if os.path.isdir(by_id_dir):
+        for name in os.listdir(by_id_dir):
+            path = os.path.join(by_id_dir, name)
+            ids[os.path.realpath(path)] = path
+    return ids
+
+
+def _fingerprint(port, usb_id):
+    """
+    identity of what is plugged in a port. changes when the usb device is replugged or swapped.
+    """
+    st = os.stat(port)
+    return [usb_id, st.st_rdev, st.st_ctime]
+
+
+def probe(port, timeout=0.5, baudrate=115200, encode='utf8'):
+    """
+    send the init handshake and read devinfo. None if the port opens but no logger answers.
+    errors opening or using the port (busy, no permission, unplugged) are raised: they say nothing about the logger.
+    :type port: str
+    :rtype: (DevInfoResponse, bytes)
+    """
+    import elitech
+    device = elitech.Device(port, baudrate, timeout)
+    device.wait_time = 0
+    try:
+        with device.session():
+            device.init()
+            raw = device._talk(DevInfoRequest(), RawResponse(DevInfoResponse.LENGTH, check=True)).msg
+    except ResponseError:
+        return None
+    devinfo = DevInfoResponse(encode)
+    devinfo.parse(raw)
+    return devinfo, raw
+
+
+def _try_probe(port, timeout, baudrate, encode):
+    """
+    :rtype: (DevInfoResponse, bytes) or None or Exception
+    """
+    try:
+        return probe(port, timeout, baudrate, encode)
+    except Exception as e:
+        return e
+
+
+def _load_cache(cache_path):
+    if cache_path is None or not os.path.exists(cache_path):
+        return {}
+    try:
+        with io.open(cache_path, encoding='utf-8') as f:
+            return json.load(f)
+    except ValueError:
+        return {}
+
+
+def _save_cache(cache_path, cache):
+    directory = os.path.dirname(os.path.abspath(cache_path))
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    with io.open(cache_path + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(json.dumps(cache, indent=1, sort_keys=True))
+    os.rename(cache_path + '.tmp', cache_path)
+
+
+def discover(ports=None, timeout=0.5, baudrate=115200, jobs=16, cache_path=None, encode='utf8'):
+    """
+    find the ports with a logger. ports are probed in parallel; with cache_path,
+    a port whose usb device did not change since the last run is answered from the cache.
+    a port that could not be opened is skipped and not cached, it is probed again on the next run.
+    devinfo from the cache identifies the logger (model_no, station_no, dev_num),
+    its record count and clock are those of the last probe.
+    :type ports: list[str]  default candidate_ports()
+    :rtype: list[FoundLogger]
+    """
+    if ports is None:
+        ports = candidate_ports()
+    ids = usb_ids()
+    cache = _load_cache(cache_path)
+
+    found = {}
+    to_probe = []
+    for port in ports:
+        usb_id = ids.get(os.path.realpath(port))
+        try:
+            fingerprint = _fingerprint(port, usb_id)
+        except OSError:
+            continue
+        entry = cache.get(port)
+        if entry is not None and entry['fingerprint'] == fingerprint:
+            if entry['devinfo'] is not None:
+                devinfo = DevInfoResponse(encode)
+                devinfo.parse(binascii.unhexlify(entry['devinfo']))
+                found[port] = FoundLogger(port, usb_id, devinfo)
+        else:
+            to_probe.append((port, usb_id, fingerprint))
+
+    if to_probe:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            results = executor.map(lambda p: _try_probe(p[0], timeout, baudrate, encode), to_probe)
+            for (port, usb_id, fingerprint), result in zip(to_probe, results):
+                if isinstance(result, Exception):
+                    continue
+                raw = None
+                if result is not None:
+                    devinfo, raw = result
+                    found[port] = FoundLogger(port, usb_id, devinfo)
+                cache[port] = {
+                    'fingerprint': fingerprint,
+                    'devinfo': binascii.hexlify(raw).decode('ascii') if raw is not None else None,
+                }
+
+    if cache_path is not None:
+        for port in list(cache):
+            if not os.path.exists(port):
+                del cache[port]
+        _save_cache(cache_path, cache)
+
+    return [found[port] for port in sorted(found)]
@@ -0,0 +1,143 @@
+# coding: utf-8
+
+__author__ = 'civic'
+
+import io
+import mmap
+import os
+import re
+
+from .msg import (
+    DevInfoResponse,
+    DataHeaderResponse,
+    DataBodyResponse,
+    _check_response,
+    _interval_timedelta,
+    _records_to_rows,
+)
+
+DEVINFO_FILE = 'devinfo.bin'
+HEADER_FILE = 'header.bin'
+_PAGE_FILE = re.compile(r'^page_(\d+)\.bin$')
+
+
+def dump_data(device, directory, page_size=None):
+    """
+    write raw devinfo, data header and data body pages to directory without decoding.
+    :type device: elitech.Device
+    :type directory: str
+    :rtype: DevInfoResponse
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    def write(name, msg):
+        with io.open(os.path.join(directory, name + '.bin'), 'wb') as f:
+            f.write(msg)
+
+    return device.get_raw_data(write, page_size=page_size)
+
+
+def is_dump(directory):
+    """
+    :type directory: str
+    :rtype: bool
+    """
+    return os.path.isfile(os.path.join(directory, DEVINFO_FILE)) and \
+        os.path.isfile(os.path.join(directory, HEADER_FILE))
+
+
+def _read_file(path):
+    with io.open(path, 'rb') as f:
+        return f.read()
+
+
+def _pages(directory):
+    """
+    :rtype: list[(int, str)]  (page number, path) ordered by page number
+    """
+    pages = []
+    for name in os.listdir(directory):
+        m = _PAGE_FILE.match(name)
+        if m:
+            pages.append((int(m.group(1)), os.path.join(directory, name)))
+    return sorted(pages)
+
+
+def page_files(directory):
+    """
+    page dump files ordered by page number.
+    :type directory: str
+    :rtype: list[str]
+    """
+    return [path for _, path in _pages(directory)]
+
+
+def read_page_records(path):
+    """
+    decode every record of a page dump file through a memory map.
+    :type path: str
+    :rtype: tuple[int]
+    """
+    with io.open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            _check_response(mm[:], len(mm), checksum=True)
+            res = DataBodyResponse((len(mm) - 2) // 2)
+            res.parse(mm)
+        finally:
+            mm.close()
+    return res.records
+
+
+def load_dump_info(directory, encode='utf8'):
+    """
+    :type directory: str
+    :rtype: (DevInfoResponse, DataHeaderResponse)
+    """
+    devinfo = DevInfoResponse(encode)
+    devinfo.parse(_read_file(os.path.join(directory, DEVINFO_FILE)))
+    header = DataHeaderResponse()
+    header.parse(_read_file(os.path.join(directory, HEADER_FILE)))
+    return devinfo, header
+
+
+def iter_dump(directory, encode='utf8'):
+    """
+    decode a dump directory page by page.
+    yields list of (no, datetime, temp[, humi]) rows per page, same as Device.get_data callback.
+    :type directory: str
+    :rtype: collections.Iterable[list[tuple]]
+    """
+    devinfo, header = load_dump_info(directory, encode)
+    dt = _interval_timedelta(devinfo.rec_interval)
+    data_size = 2 if devinfo.model_no == 42 else 1
+
+    # every page but the last is full, so a page's first record follows from its number.
+    # check that before decoding anything, a short page would shift every later record.
+    pages = _pages(directory)
+    sizes = [(os.path.getsize(path) - 2) // 2 for _, path in pages]
+    page_size = max(sizes) if sizes else 0
+    for i, (n, path) in enumerate(pages):
+        if n != i:
+            raise ValueError("{}: page {} is missing".format(directory, i))
+        if i < len(pages) - 1 and sizes[i] != page_size:
+            raise ValueError("{}: page {} has {} values, expected {}".format(directory, n, sizes[i], page_size))
+    if sum(sizes) != header.rec_count * data_size:
+        raise ValueError("{}: pages hold {} values, header has {} records".format(
+            directory, sum(sizes), header.rec_count))
+
+    for n, path in pages:
+        no = n * page_size // data_size + 1
+        yield _records_to_rows(read_page_records(path), devinfo.model_no, no, devinfo.start_time + dt * (no - 1), dt)
+
+
+def load_dump(directory, encode='utf8'):
+    """
+    :type directory: str
+    :rtype: list[tuple]
+    """
+    data_list = []
+    for rows in iter_dump(directory, encode):
+        data_list.extend(rows)
+    return data_list
@@ -0,0 +1,114 @@
+# coding: utf-8
+
+__author__ = 'civic'
+
+import threading
+import time
+from six.moves import BaseHTTPServer, socketserver
+
+from .msg import WorkStatus
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _epoch(dt):
+    return time.mktime(dt.timetuple())
+
+
+def _labels(labels):
+    return ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                    for k, v in labels)
+
+
+def render_metrics(poller):
+    """
+    render the poller cache in prometheus text format. never touches a serial port.
+    :type poller: elitech.poller.Poller
+    :rtype: str
+    """
+    metrics = [
+        ('elitech_up', 'gauge', 'last poll of the logger succeeded'),
+        ('elitech_temperature', 'gauge', 'latest recorded temperature'),
+        ('elitech_humidity_percent', 'gauge', 'latest recorded humidity (RC-4HC)'),
+        ('elitech_record_count', 'gauge', 'number of records on the logger'),
+        ('elitech_record_timestamp_seconds', 'gauge', 'logger time of the latest record'),
+        ('elitech_work_status', 'gauge', 'logger work status'),
+        ('elitech_last_success_timestamp_seconds', 'gauge', 'host time of the last successful poll'),
+        ('elitech_polls_total', 'counter', 'polls attempted'),
+        ('elitech_poll_errors_total', 'counter', 'polls failed'),
+    ]
+    samples = dict((name, []) for name, _, _ in metrics)
+
+    for port, logger in sorted(poller.loggers.items()):
+        devinfo = logger.devinfo
+        labels = [('port', port)]
+        if logger.identity is not None:
+            # the last known identity, so that series do not change labels while the logger fails
+            labels += [('dev_num', logger.identity[0]), ('station_no', logger.identity[1])]
+
+        samples['elitech_up'].append((labels, 1 if devinfo is not None else 0))
+        samples['elitech_polls_total'].append((labels, logger.polls))
+        samples['elitech_poll_errors_total'].append((labels, logger.errors))
+        if logger.last_success is not None:
+            samples['elitech_last_success_timestamp_seconds'].append((labels, _epoch(logger.last_success)))
+        if devinfo is None:
+            # the last poll failed, the cached reading is stale
+            continue
+
+        samples['elitech_record_count'].append((labels, logger.rec_count))
+        for status in WorkStatus:
+            samples['elitech_work_status'].append(
+                (labels + [('status', status.name)], 1 if devinfo.work_sts == status else 0))
+
+        reading = logger.latest
+        if reading is not None:
+            unit = devinfo.temp_unit.name if devinfo.temp_unit is not None else 'C'
+            samples['elitech_temperature'].append((labels + [('unit', unit)], reading.temp))
+            if reading.humi is not None:
+                samples['elitech_humidity_percent'].append((labels, reading.humi))
+            samples['elitech_record_timestamp_seconds'].append((labels, _epoch(reading.time)))
+
+    lines = []
+    for name, kind, help_text in metrics:
+        lines.append('# HELP {} {}'.format(name, help_text))
+        lines.append('# TYPE {} {}'.format(name, kind))
+        for labels, value in samples[name]:
+            lines.append('{}{{{}}} {}'.format(name, _labels(labels), value))
+    return '\n'.join(lines) + '\n'
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_metrics(self.server.poller).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    serves /metrics from the poller cache.
+    """
+    daemon_threads = True
+
+    def __init__(self, poller, address=('', 9488)):
+        """
+        :type poller: elitech.poller.Poller
+        :type address: (str, int)
+        """
+        BaseHTTPServer.HTTPServer.__init__(self, address, _Handler)
+        self.poller = poller
+
+    def start(self):
+        t = threading.Thread(target=self.serve_forever)
+        t.daemon = True
+        t.start()
+        return t
@@ -0,0 +1,72 @@
+# coding: utf-8
+
+__author__ = 'civic'
+
+import numpy as np
+import pandas as pd
+
+from .msg import _interval_timedelta
+
+
+def _attrs(devinfo):
+    """
+    devinfo fields for DataFrame.attrs.
+    :rtype: dict
+    """
+    return dict((k, v) for k, v in vars(devinfo).items() if not k.startswith('_'))
+
+
+def _index(devinfo, first_no, count):
+    """
+    times of records first_no.. in one call instead of one datetime per record.
+    :rtype: pandas.DatetimeIndex
+    """
+    dt = pd.Timedelta(_interval_timedelta(devinfo.rec_interval))
+    return pd.date_range(pd.Timestamp(devinfo.start_time) + dt * (first_no - 1), periods=count, freq=dt, name='time')
+
+
+def records_to_dataframe(records, devinfo, first_no=1):
+    """
+    DataFrame of raw body records (temperature*10, for RC-4HC temperature and humidity interleaved).
+    :type records: list[int] or numpy.ndarray
+    :type devinfo: elitech.msg.DevInfoResponse
+    :param first_no: record number of the first record
+    :rtype: pandas.DataFrame  index time, columns no, temp[, humi], devinfo fields in attrs
+    """
+    values = np.asarray(records, dtype='int64') / 10.0
+    if devinfo.model_no == 42:
+        values = values.reshape(-1, 2)
+        columns = {'temp': values[:, 0], 'humi': values[:, 1]}
+    else:
+        columns = {'temp': values}
+    count = len(columns['temp'])
+    frame = pd.DataFrame(columns, index=_index(devinfo, first_no, count))
+    frame.insert(0, 'no', np.arange(first_no, first_no + count, dtype='int64'))
+    frame.attrs.update(_attrs(devinfo))
+    return frame
+
+
+def to_dataframe(rows, devinfo):
+    """
+    DataFrame of get_data rows.
+    the index comes from start_time and rec_interval when record numbers are consecutive and
+    the first and last row times agree with it, otherwise (e.g. rows with missing records,
+    retimed or stitched rows) from the row times.
+    :type rows: list[tuple]  (no, datetime, temp[, humi])
+    :type devinfo: elitech.msg.DevInfoResponse
+    :rtype: pandas.DataFrame  index time, columns no, temp[, humi], devinfo fields in attrs
+    """
+    count = len(rows)
+    width = len(rows[0]) if rows else (4 if devinfo.model_no == 42 else 3)
+    no = np.fromiter((row[0] for row in rows), dtype='int64', count=count)
+    columns = {'no': no, 'temp': np.fromiter((row[2] for row in rows), dtype=float, count=count)}
+    if width > 3:
+        columns['humi'] = np.fromiter((row[3] for row in rows), dtype=float, count=count)
+
+    index = _index(devinfo, int(no[0]) if count else 1, count)
+    if count and not ((np.diff(no) == 1).all() and index[0] == pd.Timestamp(rows[0][1])
+                      and index[-1] == pd.Timestamp(rows[-1][1])):
+        index = pd.DatetimeIndex([row[1] for row in rows], name='time')
+    frame = pd.DataFrame(columns, index=index)
+    frame.attrs.update(_attrs(devinfo))
+    return frame
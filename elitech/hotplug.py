@@ -0,0 +1,247 @@
+# coding: utf-8
+
+__author__ = 'civic'
+
+import ctypes
+import ctypes.util
+import fnmatch
+import io
+import json
+import os
+import select
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .convert import session_name
+from .discover import probe
+
+NODE_PATTERNS = ('ttyUSB*', 'ttyACM*', 'tty.SLAB_USBtoUART*', 'tty.wchusbserial*')
+
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_MOVED_FROM = 0x40
+_IN_MOVED_TO = 0x80
+_IN_NONBLOCK = 0o4000
+
+
+class _Inotify:
+    """
+    wake-up source for changes in one directory. linux only.
+    """
+
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(_IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = _IN_CREATE | _IN_DELETE | _IN_MOVED_FROM | _IN_MOVED_TO
+        if libc.inotify_add_watch(self.fd, directory.encode('utf-8'), mask) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+    def wait(self, timeout):
+        if select.select([self.fd], [], [], timeout)[0]:
+            try:
+                while os.read(self.fd, 4096):
+                    pass
+            except OSError:
+                pass
+
+    def close(self):
+        os.close(self.fd)
+
+
+class NodeWatcher:
+    """
+    reports serial device nodes (or symlinks) appearing in a directory.
+    inotify is used when available, otherwise the directory is polled.
+    """
+
+    def __init__(self, directory='/dev', patterns=NODE_PATTERNS, poll_interval=1.0):
+        self.directory = directory
+        self.patterns = patterns
+        self.poll_interval = poll_interval
+        self._known = set(self.nodes())
+        try:
+            self._inotify = _Inotify(directory)
+        except (OSError, AttributeError):
+            self._inotify = None
+
+    def nodes(self):
+        """
+        :rtype: list[str]
+        """
+        return sorted(os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                      if any(fnmatch.fnmatch(name, pattern) for pattern in self.patterns))
+
+    def wait(self, timeout=None):
+        """
+        wait for changes and return the nodes added since the last call.
+        :rtype: list[str]
+        """
+        timeout = self.poll_interval if timeout is None else timeout
+        if self._inotify is not None:
+            self._inotify.wait(timeout)
+        else:
+            time.sleep(timeout)
+        current = set(self.nodes())
+        added = sorted(current - self._known)
+        self._known = current
+        return added
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+
+class HotplugDownloader:
+    """
+    downloads every logger plugged in while running.
+
+    new nodes are identified with the init handshake, then downloaded to the sink
+    (elitech.convert sinks) on a thread pool so several loggers run concurrently.
+    a node is tried again after retry_wait, doubled on every attempt, while it cannot be opened
+    or gives no answer, as a freshly plugged logger may not be ready (permissions, modem managers probing it).
+    with incremental, only records not downloaded before (same dev_num and start_time) are read.
+    the sink is only written from the thread calling run().
+    """
+
+    def __init__(self, sink, directory='/dev', patterns=NODE_PATTERNS, jobs=4, incremental=False,
+                 state_path=None, timeout=1.0, baudrate=115200, encode='utf8', on_done=None, on_error=None,
+                 retries=3, retry_wait=0.5):
+        """
+        :type sink: elitech.convert.Sink
+        :param state_path: json file keeping the last downloaded record per session for incremental
+        :param on_done: called with (port, devinfo, number of records)
+        :param on_error: called with (port, exception), once the last attempt failed
+        :param retries: attempts after the first one to identify a node
+        :param retry_wait: seconds before the first retry
+        """
+        self.sink = sink
+        self.watcher = NodeWatcher(directory, patterns)
+        self.incremental = incremental
+        self.state_path = state_path
+        self.timeout = timeout
+        self.baudrate = baudrate
+        self.encode = encode
+        self.on_done = on_done
+        self.on_error = on_error
+        self.retries = retries
+        self.retry_wait = retry_wait
+        self._executor = ThreadPoolExecutor(max_workers=jobs)
+        self._stop = threading.Event()
+        self._state = self._load_state()
+
+    def _load_state(self):
+        if self.state_path is None or not os.path.exists(self.state_path):
+            return {}
+        with io.open(self.state_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_state(self):
+        if self.state_path is None:
+            return
+        with io.open(self.state_path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(json.dumps(self._state, indent=1, sort_keys=True))
+        os.rename(self.state_path + '.tmp', self.state_path)
+
+    def _probe(self, port):
+        """
+        probe with retries. the error of the last attempt is raised.
+        :rtype: (DevInfoResponse, bytes)  None if no logger answers
+        """
+        wait = self.retry_wait
+        for attempt in range(self.retries + 1):
+            try:
+                result = probe(port, self.timeout, self.baudrate, self.encode)
+                if result is not None or attempt == self.retries:
+                    return result
+            except Exception:
+                if attempt == self.retries:
+                    raise
+            if self._stop.wait(wait):
+                return None
+            wait *= 2
+
+    def fetch(self, port):
+        """
+        identify the logger on port and read its records. None if no logger answers.
+        :rtype: (DevInfoResponse, str, int, list[tuple])  devinfo, session name, last record no, rows
+        """
+        import elitech
+        result = self._probe(port)
+        if result is None:
+            return None
+        devinfo = result[0]
+
+        device = elitech.Device(port, self.baudrate, self.timeout)
+        device.encode = self.encode
+        with device.session():
+            session = session_name(devinfo)
+            first_no = self._state.get(session, 0) + 1 if self.incremental else 1
+            last_no = device.get_data_header(devinfo.station_no).rec_count
+            data_list = device.get_records(devinfo, first_no, last_no) if first_no <= last_no else []
+        return devinfo, session, last_no, data_list
+
+    def store(self, result):
+        """
+        write a fetch() result to the sink. incremental downloads are named <session>_<first>-<last>.
+        """
+        devinfo, session, last_no, data_list = result
+        if not data_list:
+            return
+        name = session
+        if self.incremental:
+            name = '{}_{:06d}-{:06d}'.format(session, data_list[0][0], last_no)
+        self.sink.write(name, devinfo, data_list)
+        if self.incremental:
+            self._state[session] = last_no
+            self._save_state()
+
+    def download(self, port):
+        """
+        fetch and store one port.
+        :rtype: int  number of records written
+        """
+        result = self.fetch(port)
+        if result is None:
+            return 0
+        self.store(result)
+        return len(result[3])
+
+    def _finish(self, port, future):
+        try:
+            result = future.result()
+            if result is None:
+                return
+            self.store(result)
+        except Exception as e:
+            if self.on_error is not None:
+                self.on_error(port, e)
+            return
+        if self.on_done is not None:
+            self.on_done(port, result[0], len(result[3]))
+
+    def run(self):
+        """
+        watch until stop() is called. ports are read on the thread pool,
+        the sink is written from this thread only.
+        """
+        pending = {}
+        while not self._stop.is_set() or pending:
+            if not self._stop.is_set():
+                for port in self.watcher.wait(0.2):
+                    pending[self._executor.submit(self.fetch, port)] = port
+            else:
+                time.sleep(0.05)
+            for future in [f for f in pending if f.done()]:
+                self._finish(pending.pop(future), future)
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.watcher.close()
@@ -0,0 +1,64 @@
+# coding: utf-8
+
+__author__ = 'civic'
+
+import io
+import json
+import os
+
+
+class LinkState:
+    """
+    time of the last successful exchange per port, kept in a json file so that
+    short-lived processes can skip the init handshake on a port used moments ago.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._ports = self._load()
+        self._forgotten = set()
+
+    def _load(self):
+        if self.path is not None and os.path.exists(self.path):
+            try:
+                with io.open(self.path, encoding='utf-8') as f:
+                    return json.load(f)
+            except ValueError:
+                return {}
+        return {}
+
+    def last_ok(self, port):
+        """
+        :rtype: float  time.time() of the last successful exchange, None if unknown
+        """
+        return self._ports.get(port)
+
+    def mark(self, port, when):
+        """
+        :type when: float  time.time()
+        """
+        self._ports[port] = max(when, self._ports.get(port) or 0)
+        self._forgotten.discard(port)
+
+    def forget(self, port):
+        self._ports.pop(port, None)
+        self._forgotten.add(port)
+
+    def save(self):
+        """
+        write the entry of every port, keeping entries other processes wrote since loading.
+        """
+        if self.path is None:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        ports = self._load()
+        for port in self._forgotten:
+            ports.pop(port, None)
+        for port, when in self._ports.items():
+            ports[port] = max(when, ports.get(port) or 0)
+        tmp = '{}.{}.tmp'.format(self.path, os.getpid())
+        with io.open(tmp, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(ports, indent=1, sort_keys=True))
+        os.rename(tmp, self.path)
@@ -2,8 +2,8 @@
 
 __author__ = 'civic'
 
-from struct import unpack, pack
-from datetime import datetime, time
+from struct import unpack, unpack_from, pack, error as struct_error
+from datetime import datetime, time, timedelta
 from enum import Enum
 import six
 
@@ -58,6 +58,13 @@ def _interval_pack(t):
     return _intarray2bytes([t.hour, t.minute, t.second])
 
 
+def _tenths(value):
+    """
+    temperature / humidity as sent on the wire. rounded, 0.3 is 3 not 2.
+    """
+    return int(round(value * 10.0))
+
+
 def _append_checksum(byte_array):
     if six.PY2:
         checksum = sum([ord(c) for c in byte_array]) % 0x100
@@ -67,6 +74,79 @@ def _append_checksum(byte_array):
     return byte_array + _intarray2bytes([checksum])
 
 
+class ResponseError(IOError):
+    """
+    incomplete or corrupt response from the logger.
+    """
+
+
+def _check_response(msg, length, checksum=False):
+    """
+    raise ResponseError unless msg is a whole response: length bytes starting with 0x55,
+    and with checksum, ending with the sum of the other bytes.
+    :type msg: bytes
+    """
+    ba = bytearray(msg or b'')
+    if len(ba) != length:
+        raise ResponseError("response of {} bytes, expected {}".format(len(ba), length))
+    if ba[0] != 0x55:
+        raise ResponseError("response starts with 0x{:02X}, expected 0x55".format(ba[0]))
+    if checksum and sum(ba[:-1]) % 0x100 != ba[-1]:
+        raise ResponseError("response checksum 0x{:02X}, expected 0x{:02X}".format(ba[-1], sum(ba[:-1]) % 0x100))
+
+
+def _page_layout(model_no, page_size=None):
+    """
+    records per body page and values per record for the device model.
+    :type model_no: int
+    :type page_size: int
+    :rtype: (int, int)
+    """
+    if model_no == 40: # RC-4
+        default_page_size, data_size = 100, 1
+    elif model_no == 42: #RC-4HC
+        default_page_size, data_size = 200, 2
+    elif model_no == 50: #RC-5
+        default_page_size, data_size = 500, 1
+    elif page_size is not None:
+        default_page_size, data_size = page_size, 1
+    else:
+        raise ValueError("Unknowm model_no ({}). can't decide page_size".format(model_no))
+
+    return (page_size or default_page_size), data_size
+
+
+def _interval_timedelta(t):
+    """
+    :type t: time
+    :rtype: timedelta
+    """
+    return timedelta(hours=t.hour, minutes=t.minute, seconds=t.second)
+
+
+def _records_to_rows(records, model_no, no, base_time, dt):
+    """
+    convert raw body records to (no, datetime, temp[, humi]) rows.
+    :type records: list[int]
+    :type no: int
+    :type base_time: datetime
+    :type dt: timedelta
+    :rtype: list[tuple]
+    """
+    rows = []
+    if model_no == 42:
+        for rec_temp, rec_humi in zip(*[iter(records)] * 2):
+            rows.append((no, base_time, rec_temp/10.0, rec_humi/10.0))
+            no += 1
+            base_time += dt
+    else:
+        for rec in records:
+            rows.append((no, base_time, rec/10.0))
+            no += 1
+            base_time += dt
+    return rows
+
+
 class TemperatureUnit(Enum):
     C = 0x31
     F = 0x13
@@ -108,6 +188,29 @@ class ResponseMessage:
         pass
 
 
+class RawResponse(ResponseMessage):
+    """
+    undecoded response of a known length.
+    with check, a short response or one without the 0x55 header raises ResponseError (with checksum, a bad checksum too).
+    :type length: int
+    :type msg: bytes
+    """
+
+    def __init__(self, length, check=False, checksum=False):
+        self.length = length
+        self.check = check or checksum
+        self.checksum = checksum
+        self.msg = None
+
+    def read(self, ser):
+        """
+        :type ser: serial.Serial
+        """
+        self.msg = ser.read(self.length)
+        if self.check:
+            _check_response(self.msg, self.length, self.checksum)
+
+
 class InitRequest(RequestMessage):
     def to_bytes(self):
         return _bin("CC 00 0A 00 D6")
@@ -126,6 +229,7 @@ class InitResponse(ResponseMessage):
         :type ser: serial.Serial
         """
         self.msg = ser.read(3)
+        _check_response(self.msg, 3)
 
 
 class DevInfoRequest(RequestMessage):
@@ -159,6 +263,8 @@ class DevInfoResponse(ResponseMessage):
     :type humi_calibration: float
     """
 
+    LENGTH = 160
+
     def __init__(self, encode='utf8'):
         self.station_no = None
         self.rec_interval = None
@@ -187,8 +293,14 @@ class DevInfoResponse(ResponseMessage):
         """
         :type ser: serial.Serial
         """
-        res = ser.read(160)
+        res = ser.read(self.LENGTH)
+        _check_response(res, self.LENGTH)
+        self.parse(res)
 
+    def parse(self, res):
+        """
+        :type res: bytes
+        """
         (_, station_no, _, model_no, _, rec_interval, upper_limit, lower_limit, last_online, work_sts,
          start_time, stp_btn, _, rec_count, current, user_info, dev_num, delay, tone_set,
          alarm, temp_unit, temp_calib, humi_upper_limit, humi_lower_limit, _, humi_calib, _) = unpack(
@@ -237,7 +349,7 @@ class DevInfoResponse(ResponseMessage):
         except UnicodeDecodeError as e:
             self.user_info = ""
         try:
-            self.dev_num = dev_num.decode("utf-8").rstrip('\0x00')
+            self.dev_num = dev_num.decode("utf-8").rstrip('\x00')
         except UnicodeDecodeError as e:
             self.dev_num = ""
 
@@ -349,23 +461,56 @@ class ParamPutRequest(RequestMessage):
             self.target_station_no,
             _bin('05 00'),
             _interval_pack(self.rec_interval),
-            int(self.upper_limit * 10.0),
-            int(self.lower_limit * 10.0),
+            _tenths(self.upper_limit),
+            _tenths(self.lower_limit),
             self.update_station_no,
             self.stop_button.value,
             self.delay_value(self.delay),
             self.tone_set.value,
             self.alarm.value,
             self.temp_unit.value,
-            int(self.temp_calibration * 10.0),
-            int(self.humi_upper_limit * 10.0),
-            int(self.humi_lower_limit * 10.0),
+            _tenths(self.temp_calibration),
+            _tenths(self.humi_upper_limit),
+            _tenths(self.humi_lower_limit),
             _bin('00'),
-            int(self.humi_calibration * 10.0),
+            _tenths(self.humi_calibration),
         )
 
         ba = _append_checksum(write_bytes)
         return ba
+
+    def diff(self, devinfo):
+        """
+        fields this request would change on the logger described by devinfo, compared as sent on the wire.
+        :type devinfo: DevInfoResponse
+        :rtype: list[(str, object, object)]  (devinfo field, current, requested)
+        """
+        fields = [
+            ('rec_interval', self.rec_interval, _interval_pack),
+            ('upper_limit', self.upper_limit, _tenths),
+            ('lower_limit', self.lower_limit, _tenths),
+            ('station_no', self.update_station_no, int),
+            ('stop_button', self.stop_button, None),
+            ('delay', self.delay, self.delay_value),
+            ('tone_set', self.tone_set, None),
+            ('alarm', self.alarm, None),
+            ('temp_unit', self.temp_unit, None),
+            ('temp_calibration', self.temp_calibration, _tenths),
+            ('humi_upper_limit', self.humi_upper_limit, _tenths),
+            ('humi_lower_limit', self.humi_lower_limit, _tenths),
+            ('humi_calibration', self.humi_calibration, _tenths),
+        ]
+        changed = []
+        for name, requested, wire in fields:
+            current = getattr(devinfo, name)
+            if wire is None:
+                same = current == requested
+            else:
+                same = current is not None and wire(current) == wire(requested)
+            if not same:
+                changed.append((name, current, requested))
+        return changed
+
     def delay_value(self, delay):
         # 0.0=>0x00, 0.5=>0x01, 1.0=>0x10, 1.5=>0x11...
         return int(delay) * 16 + (1 if ((delay * 10) % 10 >= 5) else 0)
@@ -379,6 +524,7 @@ class ParamPutResponse(ResponseMessage):
         :type ser: serial.Serial
         """
         self.msg = ser.read(3)
+        _check_response(self.msg, 3)
 
 
 class DataHeaderRequest(RequestMessage):
@@ -400,6 +546,8 @@ class DataHeaderResponse(ResponseMessage):
     :type rec_count: int
     :type start_time: datetime
     """
+    LENGTH = 11
+
     def __init__(self):
         self.rec_count = 0
         self.start_time = None
@@ -408,8 +556,14 @@ class DataHeaderResponse(ResponseMessage):
         """
         :type ser: serial.Serial
         """
-        res = ser.read(11)
+        res = ser.read(self.LENGTH)
+        _check_response(res, self.LENGTH)
+        self.parse(res)
 
+    def parse(self, res):
+        """
+        :type res: bytes
+        """
         (_, rec_count, start_time, _) = unpack(
             '>1s'
             'h'  # record_count
@@ -449,13 +603,22 @@ class DataBodyResponse(ResponseMessage):
         """
         :type ser: serial.Serial
         """
-        res = ser.read(self.count * 2 + 2)  #data(2bytes)*count + (comand:0x55 + checksum)
+        res = ser.read(self.length(self.count))
+        _check_response(res, self.length(self.count), checksum=True)
+        self.parse(res)
 
-        unpacked = unpack(
-            '>1s'+('h'*self.count)+"b",
-            res)
+    def parse(self, res):
+        """
+        :type res: bytes
+        """
+        if len(res) != self.length(self.count):
+            raise struct_error("unpack requires a buffer of {} bytes".format(self.length(self.count)))
+
+        self.records = unpack_from('>{}h'.format(self.count), res, 1)
 
-        self.records = unpacked[1:-1]
+    @staticmethod
+    def length(count):
+        return count * 2 + 2  #data(2bytes)*count + (comand:0x55 + checksum)
 
 class ClockSetRequest(RequestMessage):
     def __init__(self, target_station_no, set_time=None):
@@ -490,6 +653,7 @@ class ClockSetResponse(ResponseMessage):
         :type ser: serial.Serial
         """
         self.msg = ser.read(3)
+        _check_response(self.msg, 3)
 
 class DevNumRequest(RequestMessage):
     """
@@ -525,6 +689,7 @@ class DevNumResponse(ResponseMessage):
         :type ser: serial.Serial
         """
         self.msg = ser.read(3)
+        _check_response(self.msg, 3)
 
 class UserInfoRequest(RequestMessage):
     """
@@ -561,3 +726,4 @@ class UserInfoResponse(ResponseMessage):
         :type ser: serial.Serial
         """
         self.msg = ser.read(3)
+        _check_response(self.msg, 3)
@@ -0,0 +1,304 @@
+# coding: utf-8
+
+__author__ = 'civic'
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime, timedelta
+
+from .msg import _interval_timedelta
+
+_clock = getattr(time, 'monotonic', time.time)
+
+Reading = namedtuple('Reading', ['port', 'polled', 'no', 'time', 'temp', 'humi'])
+
+
+class RecordClock:
+    """
+    predicts when the logger writes its next record.
+
+    the logger clock is read from devinfo.current, so host/logger drift is
+    corrected every time a devinfo is observed.
+    :type start_time: datetime
+    :type interval: timedelta
+    :type offset: timedelta  logger clock - host clock
+    """
+
+    def __init__(self, devinfo, host_time=None):
+        """
+        :type devinfo: elitech.msg.DevInfoResponse
+        :param host_time: host time when devinfo was received
+        """
+        self.start_time = None
+        self.interval = None
+        self.offset = timedelta(0)
+        self.update(devinfo, host_time)
+
+    def update(self, devinfo, host_time=None):
+        if host_time is None:
+            host_time = datetime.now()
+        self.start_time = devinfo.start_time
+        self.interval = _interval_timedelta(devinfo.rec_interval)
+        if devinfo.current is not None:
+            self.offset = devinfo.current - host_time
+
+    def record_time(self, no):
+        """
+        :param no: record number (1-based)
+        :rtype: datetime  logger time
+        """
+        return self.start_time + self.interval * (no - 1)
+
+    def next_boundary(self, now=None):
+        """
+        :param now: host time
+        :rtype: datetime  host time of the next record
+        """
+        if now is None:
+            now = datetime.now()
+        interval = self.interval.total_seconds()
+        if self.start_time is None or interval <= 0:
+            # not recording
+            return now + self.interval
+        elapsed = (now + self.offset - self.start_time).total_seconds()
+        n = int(elapsed // interval) + 1 if elapsed >= 0 else 0
+        return self.start_time + timedelta(seconds=n * interval) - self.offset
+
+    def seconds_until_next(self, now=None, margin=1.0, minimum=0):
+        """
+        seconds to sleep until `margin` seconds after the next record boundary
+        that is at least `minimum` seconds away. never less than minimum, also when not recording.
+        :rtype: float
+        """
+        if now is None:
+            now = datetime.now()
+        wait = (self.next_boundary(now) - now).total_seconds() + margin
+        interval = self.interval.total_seconds()
+        while wait < minimum and interval > 0:
+            wait += interval
+        return max(wait, minimum)
+
+
+def watch(device, callback, margin=1.0, resync_every=10, stop=None, page_size=None):
+    """
+    emit new records as the logger writes them.
+
+    sleeps until just after each record boundary predicted from start_time,
+    rec_interval and devinfo.current, then reads the data header and only the
+    pages holding records not seen yet. devinfo is re-read every `resync_every`
+    cycles to correct clock drift, and when the header shows a restarted recording
+    (another start time, or fewer records).
+    :type device: elitech.Device
+    :param callback: called with the list of new (no, datetime, temp[, humi]) rows. the first call has the latest record.
+    :type stop: threading.Event
+    """
+    if stop is None:
+        stop = threading.Event()
+
+    devinfo = device.get_devinfo()
+    clock = RecordClock(devinfo)
+    last_no = devinfo.rec_count
+    if last_no > 0:
+        callback(device.get_records(devinfo, last_no, last_no, page_size))
+
+    cycles = 0
+    while not stop.wait(clock.seconds_until_next(margin=margin)):
+        cycles += 1
+        header = device.get_data_header(devinfo.station_no)
+        restarted = header.start_time != clock.start_time or header.rec_count < last_no
+        if cycles % resync_every == 0 or restarted:
+            devinfo = device.get_devinfo()
+            if devinfo.start_time != clock.start_time:
+                last_no = 0
+            clock.update(devinfo)
+            header.rec_count = devinfo.rec_count
+
+        if header.rec_count > last_no:
+            callback(device.get_records(devinfo, last_no + 1, header.rec_count, page_size))
+            last_no = header.rec_count
+
+
+class LoggerState:
+    """
+    per port poll state. readings keeps only the last `history` readings.
+    :type port: str
+    :type devinfo: elitech.msg.DevInfoResponse
+    :type latest: Reading
+    :type readings: collections.deque
+    :type polls: int
+    :type errors: int
+    :type last_error: Exception
+    :type last_success: datetime
+    :type identity: (str, int)  dev_num, station_no of the last devinfo read, kept when a poll fails
+    """
+
+    def __init__(self, port, history):
+        self.port = port
+        self.device = None
+        self.devinfo = None
+        self.latest = None
+        self.readings = deque(maxlen=history)
+        self.polls = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_success = None
+        self.rec_count = 0
+        self.record_clock = None
+        self.identity = None
+
+    @property
+    def interval(self):
+        """
+        :rtype: float  seconds, 0 if unknown
+        """
+        if self.devinfo is None or self.devinfo.rec_interval is None:
+            return 0
+        return _interval_timedelta(self.devinfo.rec_interval).total_seconds()
+
+
+class Poller:
+    """
+    resident poller. reads the latest record of each port once per its rec_interval,
+    just after the record boundary predicted by RecordClock.
+
+    polls are spread over `workers` threads; consecutive transactions start at least
+    `min_gap` seconds apart so that ports on one usb hub are never hit at once.
+    """
+
+    def __init__(self, ports, device_factory=None, history=100, min_gap=0.5, workers=1,
+                 min_interval=10, max_interval=3600, devinfo_every=60, callback=None, margin=1.0):
+        """
+        :type ports: list[str]
+        :param device_factory: port -> elitech.Device
+        :param history: readings kept in memory per port
+        :param devinfo_every: re-read devinfo every n polls (work status, limits, ...)
+        :param callback: called with (LoggerState, Reading) after each successful poll
+        :param margin: seconds after the predicted record boundary to poll
+        """
+        if device_factory is None:
+            import elitech
+            device_factory = elitech.Device
+        self.device_factory = device_factory
+        self.min_gap = min_gap
+        self.workers = workers
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.devinfo_every = devinfo_every
+        self.callback = callback
+        self.margin = margin
+        self.loggers = dict((port, LoggerState(port, history)) for port in ports)
+
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._next_start = 0
+        self._stopping = False
+        self._threads = []
+
+        now = _clock()
+        for i, port in enumerate(sorted(self.loggers)):
+            self._schedule(self.loggers[port], now + i * min_gap)
+
+    def _schedule(self, logger, due):
+        heapq.heappush(self._queue, (due, next(self._seq), logger))
+
+    def _next_interval(self, logger):
+        if logger.record_clock is not None and logger.interval <= self.max_interval:
+            return logger.record_clock.seconds_until_next(margin=self.margin, minimum=self.min_interval)
+        return min(max(logger.interval, self.min_interval), self.max_interval)
+
+    def _read_devinfo(self, logger):
+        logger.devinfo = logger.device.get_devinfo()
+        logger.identity = (logger.devinfo.dev_num, logger.devinfo.station_no)
+        if logger.devinfo.rec_interval is not None:
+            logger.record_clock = RecordClock(logger.devinfo)
+
+    def poll(self, port):
+        """
+        poll one port now.
+        :rtype: Reading
+        """
+        logger = self.loggers[port]
+        logger.polls += 1
+        try:
+            if logger.device is None:
+                logger.device = self.device_factory(port)
+                logger.device.init()
+            if logger.devinfo is None or logger.polls % self.devinfo_every == 0:
+                self._read_devinfo(logger)
+
+            latest = logger.device.get_latest(devinfo=logger.devinfo)
+            if latest[0] is not None and latest[0] < logger.rec_count:
+                # recording was restarted. start_time changed
+                self._read_devinfo(logger)
+                latest = logger.device.get_latest(devinfo=logger.devinfo)
+        except Exception as e:
+            logger.errors += 1
+            logger.last_error = e
+            logger.device = None
+            logger.devinfo = None
+            logger.record_clock = None
+            raise
+
+        logger.rec_count = latest[0] or 0
+        logger.last_success = datetime.now()
+        if latest[0] is None:
+            return None
+
+        reading = Reading(port, logger.last_success, latest[0], latest[1], latest[2],
+                          latest[3] if len(latest) == 4 else None)
+        logger.latest = reading
+        logger.readings.append(reading)
+        if self.callback is not None:
+            self.callback(logger, reading)
+        return reading
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopping:
+                        return
+                    now = _clock()
+                    if self._queue:
+                        due = max(self._queue[0][0], self._next_start)
+                        if due <= now:
+                            break
+                        self._cond.wait(due - now)
+                    else:
+                        self._cond.wait()
+                _, _, logger = heapq.heappop(self._queue)
+                self._next_start = now + self.min_gap
+
+            try:
+                self.poll(logger.port)
+            except Exception:
+                pass  # kept in logger.errors / logger.last_error
+
+            with self._cond:
+                self._schedule(logger, _clock() + self._next_interval(logger))
+                self._cond.notify_all()
+
+    def start(self):
+        for _ in range(self.workers):
+            t = threading.Thread(target=self._worker)
+            t.daemon = True
+            t.start()
+            self._threads.append(t)
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def latest(self):
+        """
+        :rtype: dict[str, Reading]
+        """
+        return dict((port, logger.latest) for port, logger in self.loggers.items())
@@ -0,0 +1,249 @@
+# coding: utf-8
+
+__author__ = 'civic'
+
+import csv
+import io
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time
+
+import six
+
+from .clock import measure_drift
+from .msg import AlarmSetting, StopButton, TemperatureUnit, ToneSet
+
+# manifest columns / keys written with ParamPutRequest. dev_num, user_info and clock are separate frames.
+PARAM_SETTINGS = (
+    'interval', 'upper_limit', 'lower_limit', 'station_no', 'stop_button', 'delay', 'tone_set',
+    'alarm', 'temp_unit', 'temp_calibration', 'humi_upper_limit', 'humi_lower_limit', 'humi_calibration',
+)
+SETTINGS = PARAM_SETTINGS + ('dev_num', 'user_info', 'clock')
+
+ProvisionResult = namedtuple('ProvisionResult', ['port', 'devinfo', 'changes', 'mismatches', 'error'])
+
+
+def _flag(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('y', 'yes', 'true', 'on', '1')
+
+
+def _interval(value):
+    """
+    seconds, or HH:MM:SS.
+    :rtype: datetime.time
+    """
+    if isinstance(value, time):
+        return value
+    if isinstance(value, six.string_types) and ':' in value:
+        return datetime.strptime(value.strip(), '%H:%M:%S').time()
+    sec = int(value)
+    return time(hour=sec // 3600, minute=sec % 3600 // 60, second=sec % 60)
+
+
+def _alarm(value):
+    value = str(value).strip().lower()
+    if value in ('x', 'none', '0', ''):
+        return AlarmSetting.NONE
+    if value == '3':
+        return AlarmSetting.T3
+    if value == '10':
+        return AlarmSetting.T10
+    raise ValueError("alarm must be x, 3 or 10: {}".format(value))
+
+
+def _clock(value):
+    """
+    'now' (or true) for host time, or '%Y-%m-%d %H:%M:%S'.
+    :rtype: datetime
+    """
+    if isinstance(value, datetime):
+        return value
+    if _is_now(value):
+        return datetime.now()
+    return datetime.strptime(str(value).strip(), '%Y-%m-%d %H:%M:%S')
+
+
+def _is_now(value):
+    """
+    clock setting for host time.
+    """
+    if isinstance(value, datetime):
+        return False
+    return value is True or str(value).strip().lower() in ('now', 'y', 'yes', 'true')
+
+
+def apply_settings(param_put, settings):
+    """
+    set the ParamPutRequest fields given in settings. unknown keys are ignored.
+    values may be strings as read from a csv or the command line.
+    :type param_put: elitech.msg.ParamPutRequest
+    :type settings: dict
+    :rtype: elitech.msg.ParamPutRequest
+    """
+    if settings.get('interval') is not None:
+        param_put.rec_interval = _interval(settings['interval'])
+    if settings.get('upper_limit') is not None:
+        param_put.upper_limit = float(settings['upper_limit'])
+    if settings.get('lower_limit') is not None:
+        param_put.lower_limit = float(settings['lower_limit'])
+    if settings.get('station_no') is not None:
+        param_put.update_station_no = int(settings['station_no'])
+    if settings.get('stop_button') is not None:
+        param_put.stop_button = StopButton.ENABLE if _flag(settings['stop_button']) else StopButton.DISABLE
+    if settings.get('delay') is not None:
+        param_put.delay = float(settings['delay'])
+    if settings.get('tone_set') is not None:
+        param_put.tone_set = ToneSet.PERMIT if _flag(settings['tone_set']) else ToneSet.NONE
+    if settings.get('alarm') is not None:
+        param_put.alarm = _alarm(settings['alarm'])
+    if settings.get('temp_unit') is not None:
+        param_put.temp_unit = TemperatureUnit.F if str(settings['temp_unit']).upper() == 'F' else TemperatureUnit.C
+    if settings.get('temp_calibration') is not None:
+        param_put.temp_calibration = float(settings['temp_calibration'])
+    if settings.get('humi_upper_limit') is not None:
+        param_put.humi_upper_limit = float(settings['humi_upper_limit'])
+    if settings.get('humi_lower_limit') is not None:
+        param_put.humi_lower_limit = float(settings['humi_lower_limit'])
+    if settings.get('humi_calibration') is not None:
+        param_put.humi_calibration = float(settings['humi_calibration'])
+    return param_put
+
+
+def load_manifest(path):
+    """
+    read a csv (header row) or yaml (list of mappings) manifest. every entry has `port` or `dev_num`
+    and any of SETTINGS. empty csv cells are left unchanged on the logger.
+    :rtype: list[dict]
+    """
+    if path.endswith(('.yaml', '.yml')):
+        import yaml
+        with io.open(path, encoding='utf-8') as f:
+            entries = yaml.safe_load(f) or []
+    else:
+        with open(path) as f:
+            entries = [dict((k.strip(), v) for k, v in row.items() if k and v is not None and v.strip() != '')
+                       for row in csv.DictReader(f)]
+
+    for i, entry in enumerate(entries):
+        if not entry.get('port') and not entry.get('dev_num'):
+            raise ValueError("manifest entry {} has neither port nor dev_num".format(i + 1))
+        unknown = set(entry) - set(SETTINGS) - {'port'}
+        if unknown:
+            raise ValueError("manifest entry {}: unknown keys {}".format(i + 1, ', '.join(sorted(unknown))))
+    return entries
+
+
+def _dev_num(value):
+    """
+    dev_num as the logger stores it, 10 bytes.
+    """
+    return str(value).encode('utf-8')[:10].decode('utf-8', 'ignore')
+
+
+def _user_info(value, encode):
+    """
+    user_info as the logger stores it, 100 bytes.
+    """
+    return value.encode(encode)[:100].decode(encode, 'ignore').rstrip(u'\x00')
+
+
+def differences(devinfo, param_put, settings, encode='utf8'):
+    """
+    settings which are not on the logger yet. clock is not compared.
+    :type devinfo: elitech.msg.DevInfoResponse
+    :type param_put: elitech.msg.ParamPutRequest
+    :rtype: list[(str, object, object)]  (field, current, requested)
+    """
+    changed = param_put.diff(devinfo)
+    if settings.get('dev_num') is not None and devinfo.dev_num != _dev_num(settings['dev_num']):
+        changed.append(('dev_num', devinfo.dev_num, _dev_num(settings['dev_num'])))
+    if settings.get('user_info') is not None and devinfo.user_info != _user_info(settings['user_info'], encode):
+        changed.append(('user_info', devinfo.user_info, _user_info(settings['user_info'], encode)))
+    return changed
+
+
+def provision_device(device, settings, init=True, clock_threshold=2.0):
+    """
+    apply settings to the logger in one open session. only frames that change something are sent,
+    and devinfo is read back when anything was written.
+    a clock of 'now' is only written when the logger clock is off by more than clock_threshold
+    seconds (elitech.clock.measure_drift), an explicit time always is. a clock write is part of
+    the changes, (clock, logger time, written time).
+    :type device: elitech.Device
+    :param init: send init first. False when the caller already did in the same session.
+    :rtype: (elitech.msg.DevInfoResponse, list, list)  devinfo, differences() before and after writing
+    """
+    with device.session():
+        if init:
+            device.init()
+        clock = settings.get('clock')
+        if clock is not None and _is_now(clock):
+            devinfo, sample = measure_drift(device)
+            if abs(sample.offset) <= clock_threshold:
+                clock = None
+        else:
+            devinfo = device.get_devinfo()
+        param_put = apply_settings(devinfo.to_param_put(), settings)
+        changes = differences(devinfo, param_put, settings, device.encode)
+        fields = set(field for field, _, _ in changes)
+        station_no = devinfo.station_no
+
+        if fields - {'dev_num', 'user_info'}:
+            device.update(param_put)
+            station_no = param_put.update_station_no
+        if clock is not None:
+            set_time = _clock(clock)
+            device.set_clock(station_no, set_time)
+            changes.append(('clock', devinfo.current, set_time))
+        if 'dev_num' in fields:
+            device.set_device_number(station_no, _dev_num(settings['dev_num']))
+        if 'user_info' in fields:
+            device.set_user_info(station_no, settings['user_info'])
+
+        if not changes:
+            return devinfo, [], []
+        readback = device.get_devinfo()
+    return readback, changes, differences(readback, param_put, settings, device.encode)
+
+
+def provision(entries, jobs=8, timeout=5, baudrate=115200, encode='utf8', ports=None, probe_timeout=0.5,
+              clock_threshold=2.0):
+    """
+    provision loggers in parallel, one thread per port. entries without a port are
+    matched to a port by dev_num with elitech.discover.
+    :type entries: list[dict]  load_manifest()
+    :param ports: ports searched for dev_num entries, default discover.candidate_ports()
+    :param clock_threshold: see provision_device
+    :rtype: list[ProvisionResult]  in entries order
+    """
+    import elitech
+
+    targets = []
+    by_dev_num = {}
+    if any(not entry.get('port') for entry in entries):
+        from .discover import discover
+        by_dev_num = dict((found.devinfo.dev_num, found.port)
+                          for found in discover(ports, probe_timeout, baudrate, encode=encode))
+    for entry in entries:
+        settings = dict(entry)
+        port = settings.pop('port', None)
+        if not port:
+            port = by_dev_num.get(str(settings.pop('dev_num')))
+        targets.append((port, settings, entry))
+
+    def run(target):
+        port, settings, entry = target
+        if port is None:
+            return ProvisionResult(None, None, [], [], "logger {} not found".format(entry['dev_num']))
+        try:
+            device = elitech.Device(port, baudrate, timeout)
+            device.encode = encode
+            devinfo, changes, mismatches = provision_device(device, settings, clock_threshold=clock_threshold)
+        except Exception as e:
+            return ProvisionResult(port, None, [], [], str(e) or e.__class__.__name__)
+        return ProvisionResult(port, devinfo, changes, mismatches, None)
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(run, targets))
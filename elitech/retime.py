@@ -0,0 +1,125 @@
+# coding: utf-8
+
+__author__ = 'civic'
+
+import io
+import os
+from multiprocessing import Pool, cpu_count
+
+import numpy as np
+
+_US = np.timedelta64(1, 'us')
+_SECOND = np.timedelta64(1, 's')
+
+
+def retime(times, start_offset, end_offset, start=None, end=None):
+    """
+    correct logger clock timestamps with a linear drift.
+
+    the logger clock was start_offset seconds ahead of true time at `start` and end_offset at `end`
+    (both logger time, default first and last timestamp). offsets in between are interpolated,
+    outside they are extrapolated.
+    :param times: logger timestamps, list of datetime or datetime64 array
+    :rtype: numpy.ndarray  datetime64[us]
+    """
+    t = np.asarray(times, dtype='datetime64[us]')
+    if t.size == 0:
+        return t
+    t0 = t[0] if start is None else np.datetime64(start, 'us')
+    t1 = t[-1] if end is None else np.datetime64(end, 'us')
+    span = (t1 - t0) / _SECOND
+    if span > 0:
+        offset = start_offset + (end_offset - start_offset) * ((t - t0) / _SECOND / span)
+    else:
+        offset = np.full(t.shape, float(start_offset))
+    return t - np.round(offset * 1e6).astype('timedelta64[us]')
+
+
+def retime_rows(rows, start_offset, end_offset, start=None, end=None):
+    """
+    retime() the datetime column of get_data rows.
+    :type rows: list[tuple]  (no, datetime, temp[, humi])
+    :rtype: list[tuple]
+    """
+    if not rows:
+        return []
+    corrected = retime([row[1] for row in rows], start_offset, end_offset, start, end).tolist()
+    return [(row[0], t) + tuple(row[2:]) for row, t in zip(rows, corrected)]
+
+
+def history_offsets(history, dev_num, start, end):
+    """
+    (start_offset, end_offset) of a recording from a drift history. None if the logger has no samples.
+    :type history: elitech.clock.DriftHistory
+    :type start: datetime  logger time of the first record
+    :type end: datetime  logger time of the last record
+    :rtype: (float, float)
+    """
+    from datetime import timedelta
+    offsets = []
+    for logger_time in (start, end):
+        offset = history.offset_at(dev_num, logger_time)
+        if offset is None:
+            return None
+        # offset_at takes host time. one more step is enough, drift is seconds per day.
+        offsets.append(history.offset_at(dev_num, logger_time - timedelta(seconds=offset)))
+    return tuple(offsets)
+
+
+def retime_file(path, out_path, start_offset, end_offset, start=None, end=None):
+    """
+    retime a tsv written by elitech-datareader --command get (or elitech-decode --sink tsv).
+    other columns are copied as they are.
+    :rtype: int  number of records
+    """
+    with io.open(path, encoding='utf-8') as f:
+        lines = [line.rstrip(u'\n').split(u'\t') for line in f if line.strip()]
+    if not lines:
+        corrected = []
+    else:
+        times = np.array([line[1] for line in lines], dtype='datetime64[s]')
+        fixed = retime(times, start_offset, end_offset, start, end)
+        fixed = (fixed + np.timedelta64(500000, 'us')).astype('datetime64[s]')
+        corrected = np.char.replace(np.datetime_as_string(fixed), 'T', ' ')
+
+    with io.open(out_path + '.tmp', 'w', encoding='utf-8') as f:
+        for line, t in zip(lines, corrected):
+            line[1] = t
+            f.write(u'\t'.join(line) + u'\n')
+    os.rename(out_path + '.tmp', out_path)
+    return len(lines)
+
+
+def _retime_task(task):
+    path, out_path = task[:2]
+    return path, retime_file(path, out_path, *task[2:])
+
+
+def retime_files(tasks, out_dir, processes=None, progress=None):
+    """
+    retime many tsv files on a process pool. output files keep their path relative to
+    the directory containing all inputs, so files with the same name in different directories do not collide.
+    :param tasks: list of (path, start_offset, end_offset[, start, end])
+    :type progress: (int, int, str) -> None
+    :rtype: int  number of records
+    """
+    from .convert import _common_dir
+
+    root = _common_dir([os.path.abspath(task[0]) for task in tasks]) if tasks else None
+    jobs = []
+    for task in tasks:
+        out_path = os.path.join(out_dir, os.path.relpath(os.path.abspath(task[0]), root))
+        if not os.path.isdir(os.path.dirname(out_path)):
+            os.makedirs(os.path.dirname(out_path))
+        jobs.append((task[0], out_path) + tuple(task[1:]))
+    total = 0
+    pool = Pool(processes or cpu_count())
+    try:
+        for count, (path, records) in enumerate(pool.imap_unordered(_retime_task, jobs), 1):
+            total += records
+            if progress is not None:
+                progress(count, len(jobs), path)
+    finally:
+        pool.terminate()
+        pool.join()
+    return total
@@ -0,0 +1,125 @@
+# coding: utf-8
+
+__author__ = 'civic'
+
+import sqlite3
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+# bucket sizes in seconds: minute, hour, day
+LEVELS = (60, 3600, 86400)
+
+_EPOCH = datetime(1970, 1, 1)
+
+Point = namedtuple('Point', ['time', 'count', 'mean', 'min', 'max'])
+
+
+def _seconds(t):
+    return int((t - _EPOCH).total_seconds())
+
+
+class RollupIndex:
+    """
+    count, sum, min and max of archived records per source, channel (temp / humi)
+    and time bucket at several resolutions, in a sqlite database.
+
+    records are added page by page; rows up to the last record number added for a
+    source are skipped, so a source can be fed again with a longer download.
+    """
+
+    def __init__(self, path, levels=LEVELS):
+        self.levels = tuple(sorted(levels))
+        self.conn = sqlite3.connect(path)
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS rollups ("
+                              "source TEXT, channel TEXT, level INTEGER, bucket INTEGER, "
+                              "count INTEGER, total REAL, min REAL, max REAL, "
+                              "PRIMARY KEY (source, channel, level, bucket))")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS rollup_sources (source TEXT PRIMARY KEY, last_no INTEGER)")
+
+    def last_no(self, source):
+        """
+        :rtype: int  0 if nothing was added
+        """
+        row = self.conn.execute("SELECT last_no FROM rollup_sources WHERE source = ?", (source,)).fetchone()
+        return row[0] if row else 0
+
+    def add(self, source, rows):
+        """
+        :type rows: list[tuple]  (no, datetime, temp[, humi])
+        :rtype: int  number of rows added
+        """
+        last_no = self.last_no(source)
+        rows = [row for row in rows if row[0] > last_no]
+        if not rows:
+            return 0
+
+        acc = {}
+        for row in rows:
+            t = _seconds(row[1])
+            for channel, value in zip(('temp', 'humi'), row[2:4]):
+                for level in self.levels:
+                    key = (channel, level, t - t % level)
+                    a = acc.get(key)
+                    if a is None:
+                        acc[key] = [1, value, value, value]
+                    else:
+                        a[0] += 1
+                        a[1] += value
+                        a[2] = min(a[2], value)
+                        a[3] = max(a[3], value)
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO rollups VALUES (?, ?, ?, ?, 0, 0, NULL, NULL)",
+                ((source,) + key for key in acc))
+            self.conn.executemany(
+                "UPDATE rollups SET count = count + ?, total = total + ?, "
+                "min = MIN(COALESCE(min, ?), ?), max = MAX(COALESCE(max, ?), ?) "
+                "WHERE source = ? AND channel = ? AND level = ? AND bucket = ?",
+                ((a[0], a[1], a[2], a[2], a[3], a[3], source) + key for key, a in acc.items()))
+            self.conn.execute("INSERT OR REPLACE INTO rollup_sources VALUES (?, ?)", (source, rows[-1][0]))
+        return len(rows)
+
+    def callback(self, source):
+        """
+        get_data / iter_dump page callback adding to source.
+        """
+        return lambda rows: self.add(source, rows)
+
+    def sources(self):
+        """
+        :rtype: list[str]
+        """
+        return [row[0] for row in self.conn.execute("SELECT source FROM rollup_sources ORDER BY source")]
+
+    def level_for(self, start, end, max_points):
+        """
+        finest level with at most max_points buckets between start and end, else the coarsest.
+        :rtype: int  bucket seconds
+        """
+        span = (end - start).total_seconds()
+        for level in self.levels:
+            if span / level <= max_points:
+                return level
+        return self.levels[-1]
+
+    def query(self, source, start, end, max_points=1000, channel='temp', level=None):
+        """
+        buckets of source overlapping [start, end) at the level chosen for max_points.
+        :type start: datetime
+        :type end: datetime
+        :rtype: list[Point]
+        """
+        if level is None:
+            level = self.level_for(start, end, max_points)
+        first = _seconds(start)
+        rows = self.conn.execute(
+            "SELECT bucket, count, total, min, max FROM rollups "
+            "WHERE source = ? AND channel = ? AND level = ? AND bucket >= ? AND bucket < ? ORDER BY bucket",
+            (source, channel, level, first - first % level, _seconds(end)))
+        return [Point(_EPOCH + timedelta(seconds=bucket), count, total / count, lo, hi)
+                for bucket, count, total, lo, hi in rows]
+
+    def close(self):
+        self.conn.close()
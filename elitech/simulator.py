@@ -0,0 +1,245 @@
+# coding: utf-8
+
+__author__ = 'civic'
+
+import os
+import select
+import threading
+import time as _time
+from datetime import datetime, time, timedelta
+from struct import pack, unpack
+
+from .msg import (
+    ParamPutRequest,
+    StopButton,
+    ToneSet,
+    AlarmSetting,
+    TemperatureUnit,
+    WorkStatus,
+    _append_checksum,
+    _bin,
+    _datetime_pack,
+    _datetime_unpack,
+    _interval_pack,
+    _interval_unpack,
+)
+
+# request length by command byte (0x33 requests). 0xCC requests are always 5 bytes.
+_REQUEST_LENGTH = {
+    0x01: 5,    # data header
+    0x02: 5,    # data body
+    0x05: 25,   # param put
+    0x07: 12,   # clock set
+    0x09: 105,  # user info
+    0x0B: 15,   # device number
+}
+
+
+class SimulatedLogger:
+    """
+    answers protocol requests like an RC-4 (model 40) / RC-4HC (42) / RC-5 (50).
+
+    records are raw values (temperature*10, for RC-4HC temperature and humidity interleaved).
+    clock_offset is added to host time to make the logger clock.
+    """
+
+    def __init__(self, model_no=40, station_no=1, records=(), start_time=None, rec_interval=time(0, 0, 10),
+                 dev_num="9900112233", user_info="RC-4 Data Logger", clock_offset=timedelta(0)):
+        self.model_no = model_no
+        self.station_no = station_no
+        self.records = list(records)
+        self.start_time = start_time or datetime(2015, 10, 1, 0, 0, 0)
+        self.last_online = self.start_time
+        self.clock_offset = clock_offset
+        self.work_sts = WorkStatus.START
+        self.dev_num = dev_num
+        self.user_info = user_info
+        self.encode = 'utf8'
+
+        param = ParamPutRequest(station_no)
+        param.rec_interval = rec_interval
+        self.param = param
+        self.requests = []
+
+    @property
+    def data_size(self):
+        return 2 if self.model_no == 42 else 1
+
+    @property
+    def page_size(self):
+        return {40: 100, 42: 200, 50: 500}.get(self.model_no, 100)
+
+    @property
+    def rec_count(self):
+        return len(self.records) // self.data_size
+
+    def now(self):
+        return datetime.now() + self.clock_offset
+
+    def add_record(self, temp, humi=None):
+        self.records.append(int(round(temp * 10)))
+        if self.model_no == 42:
+            self.records.append(int(round(humi * 10)))
+
+    @staticmethod
+    def request_length(head):
+        """
+        :param head: first 3 bytes of a request
+        :rtype: int
+        """
+        ba = bytearray(head)
+        if ba[0] == 0xCC:
+            return 5
+        return _REQUEST_LENGTH.get(ba[2], 5)
+
+    def respond(self, request):
+        """
+        :type request: bytes
+        :rtype: bytes  empty if the request is not for this logger
+        """
+        ba = bytearray(request)
+        self.requests.append(bytes(ba))
+        if ba[0] == 0xCC:
+            if ba[2] == 0x0A:
+                return _bin("55 A5 FA")
+            if ba[2] == 0x06:
+                return self.devinfo_bytes()
+            return b''
+        if ba[0] != 0x33 or ba[1] != self.station_no:
+            return b''
+
+        command = ba[2]
+        if command == 0x01:
+            return _append_checksum(_bin("55") + pack(">h", self.rec_count) + _datetime_pack(self.start_time))
+        if command == 0x02:
+            page = ba[3]
+            start = page * self.page_size
+            values = self.records[start:start + self.page_size]
+            return _append_checksum(_bin("55") + pack(">{}h".format(len(values)), *values))
+        if command == 0x05:
+            self._param_put(bytes(ba))
+            return _bin("55 A0 F5")
+        if command == 0x07:
+            self.clock_offset = _datetime_unpack(bytes(ba[4:11])) - datetime.now()
+            return _bin("55 A3 F8")
+        if command == 0x09:
+            self.user_info = bytes(ba[4:104]).decode(self.encode, 'replace').rstrip(u"\x00")
+            return _bin("55 AB 00")
+        if command == 0x0B:
+            self.dev_num = bytes(ba[4:14]).decode("utf-8").rstrip(u"\x00")
+            return _bin("55 A7 FC")
+        return b''
+
+    def _param_put(self, request):
+        (_, _, _, interval, upper, lower, station_no, stop_button, delay, tone_set, alarm, temp_unit,
+         temp_calib, humi_upper, humi_lower, _, humi_calib) = unpack('>bB2s3shhBbbbbbbhh1sb', request[:24])
+        param = self.param
+        param.rec_interval = _interval_unpack(interval)
+        param.upper_limit = upper / 10.0
+        param.lower_limit = lower / 10.0
+        param.update_station_no = station_no
+        param.stop_button = StopButton(stop_button)
+        param.delay = int(delay / 16.0) + 0.5 * (delay % 16)
+        param.tone_set = ToneSet(tone_set)
+        param.alarm = AlarmSetting(alarm)
+        param.temp_unit = TemperatureUnit(temp_unit)
+        param.temp_calibration = temp_calib / 10.0
+        param.humi_upper_limit = humi_upper / 10.0
+        param.humi_lower_limit = humi_lower / 10.0
+        param.humi_calibration = humi_calib / 10.0
+        self.station_no = station_no
+
+    def devinfo_bytes(self):
+        param = self.param
+        body = pack(
+            '>1sB1sB1s3shh7sb7sbbh7s100s10sbbbbbhh1sb',
+            _bin("55"), self.station_no, _bin("01"), self.model_no, _bin("0A"),
+            _interval_pack(param.rec_interval),
+            int(round(param.upper_limit * 10)), int(round(param.lower_limit * 10)),
+            _datetime_pack(self.last_online), self.work_sts.value, _datetime_pack(self.start_time),
+            param.stop_button.value, 0x64, self.rec_count, _datetime_pack(self.now()),
+            self.user_info.encode(self.encode)[:100], self.dev_num.encode("utf-8")[:10],
+            param.delay_value(param.delay), param.tone_set.value, param.alarm.value, param.temp_unit.value,
+            int(round(param.temp_calibration * 10)),
+            int(round(param.humi_upper_limit * 10)), int(round(param.humi_lower_limit * 10)),
+            _bin("00"), int(round(param.humi_calibration * 10)))
+        return _append_checksum(body)
+
+
+class SimulatedSerial:
+    """
+    in-process serial.Serial look-alike connected to a SimulatedLogger.
+
+    latency is added once per response, byte_time per byte read, to model a real link.
+    """
+
+    def __init__(self, logger, latency=0.0, byte_time=0.0, timeout=5):
+        self.logger = logger
+        self.latency = latency
+        self.byte_time = byte_time
+        self.timeout = timeout
+        self.is_open = False
+        self._buf = b''
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    def write(self, ba):
+        self._buf = self.logger.respond(ba)
+        if self.latency:
+            _time.sleep(self.latency)
+
+    def read(self, length):
+        res, self._buf = self._buf[:length], self._buf[length:]
+        if self.byte_time:
+            _time.sleep(self.byte_time * len(res))
+        return res
+
+    def reset_input_buffer(self):
+        self._buf = b''
+
+
+class PtyLogger:
+    """
+    serves a SimulatedLogger on a pseudo terminal. `path` can be opened like a serial port.
+    """
+
+    def __init__(self, logger):
+        import tty
+        self.logger = logger
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.path = os.ttyname(self._slave)
+        self._stop = False
+        self._thread = threading.Thread(target=self._serve)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _read(self, length):
+        buf = b''
+        while len(buf) < length:
+            while not select.select([self._master], [], [], 0.05)[0]:
+                if self._stop:
+                    raise EOFError()
+            buf += os.read(self._master, length - len(buf))
+        return buf
+
+    def _serve(self):
+        try:
+            while True:
+                head = self._read(3)
+                request = head + self._read(self.logger.request_length(head) - 3)
+                response = self.logger.respond(request)
+                if response:
+                    os.write(self._master, response)
+        except (EOFError, OSError):
+            pass
+
+    def close(self):
+        self._stop = True
+        self._thread.join()
+        os.close(self._master)
+        os.close(self._slave)
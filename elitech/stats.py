@@ -0,0 +1,316 @@
+# coding: utf-8
+
+__author__ = 'civic'
+
+import io
+import json
+import math
+import os
+from datetime import datetime, timedelta
+
+from .dump import HEADER_FILE, iter_dump, load_dump_info
+
+# activation energy (kJ/mol) commonly used for MKT (USP <1160>), gas constant (J/mol/K)
+DELTA_H = 83.144
+GAS_CONSTANT = 8.3144598
+
+STATS_FILE = 'stats.json'
+
+# temperature unit (TemperatureUnit name) -> (offset, scale) of kelvin = (t + offset) * scale
+_KELVIN = {'C': (273.15, 1.0), 'F': (459.67, 5.0 / 9.0)}
+
+_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _time(s):
+    return datetime.strptime(s, _TIME_FORMAT) if s else None
+
+
+def _time_str(t):
+    return t.strftime(_TIME_FORMAT) if t else None
+
+
+class Summary:
+    """
+    mergeable statistics of one series: count, mean, min, max, MKT and percentiles.
+
+    values are kept in a histogram of 0.1 steps, the logger resolution, so percentiles are exact
+    and the histogram is bounded by the value range, not the number of samples.
+    MKT is kept as a running sum of exp(-dH/RT), T converted to kelvin from the temperature unit.
+    """
+
+    def __init__(self, delta_h=DELTA_H, unit='C'):
+        """
+        :param delta_h: activation energy in kJ/mol for MKT. None for series other than temperature.
+        :param unit: 'C' or 'F', elitech.msg.TemperatureUnit name of the values
+        """
+        if unit not in _KELVIN:
+            raise ValueError("unknown temperature unit: {}".format(unit))
+        self.delta_h = delta_h
+        self.unit = unit
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.arrhenius = 0.0
+        self.histogram = {}
+
+    def update(self, values):
+        """
+        :type values: collections.Iterable[float]
+        """
+        hist = self.histogram
+        k = self.delta_h * 1000.0 / GAS_CONSTANT if self.delta_h is not None else None
+        offset, scale = _KELVIN[self.unit]
+        for v in values:
+            tenths = int(round(v * 10))
+            hist[tenths] = hist.get(tenths, 0) + 1
+            self.count += 1
+            self.total += v
+            if k is not None:
+                self.arrhenius += math.exp(-k / ((v + offset) * scale))
+        if hist:
+            self.min = min(hist) / 10.0
+            self.max = max(hist) / 10.0
+        return self
+
+    def merge(self, other):
+        """
+        add the samples of other to this summary.
+        :type other: Summary
+        :rtype: Summary
+        """
+        if self.delta_h != other.delta_h and other.count and self.count:
+            raise ValueError("can not merge MKT with different delta_h")
+        if self.unit != other.unit and other.count and self.count:
+            raise ValueError("can not merge different temperature units")
+        if not self.count:
+            self.delta_h = other.delta_h
+            self.unit = other.unit
+        self.count += other.count
+        self.total += other.total
+        self.arrhenius += other.arrhenius
+        for tenths, n in other.histogram.items():
+            self.histogram[tenths] = self.histogram.get(tenths, 0) + n
+        if self.histogram:
+            self.min = min(self.histogram) / 10.0
+            self.max = max(self.histogram) / 10.0
+        return self
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def mkt(self):
+        """
+        mean kinetic temperature in the unit of the values.
+        :rtype: float
+        """
+        if not self.count or self.delta_h is None or self.arrhenius <= 0:
+            return None
+        k = self.delta_h * 1000.0 / GAS_CONSTANT
+        offset, scale = _KELVIN[self.unit]
+        return k / -math.log(self.arrhenius / self.count) / scale - offset
+
+    def percentile(self, q):
+        """
+        :param q: 0 - 100. linear between ranks like numpy.percentile.
+        :rtype: float
+        """
+        if not self.count:
+            return None
+        rank = (self.count - 1) * q / 100.0
+        lower, upper = int(math.floor(rank)), int(math.ceil(rank))
+        values = {}
+        seen = 0
+        for tenths in sorted(self.histogram):
+            n = self.histogram[tenths]
+            for r in (lower, upper):
+                if r not in values and seen <= r < seen + n:
+                    values[r] = tenths / 10.0
+            seen += n
+            if upper in values:
+                break
+        return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+    def to_dict(self):
+        return {
+            'delta_h': self.delta_h,
+            'unit': self.unit,
+            'count': self.count,
+            'total': self.total,
+            'arrhenius': self.arrhenius,
+            'histogram': dict((str(k), v) for k, v in self.histogram.items()),
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        """
+        :rtype: Summary
+        """
+        summary = cls(d['delta_h'], d.get('unit', 'C'))
+        summary.count = d['count']
+        summary.total = d['total']
+        summary.arrhenius = d['arrhenius']
+        summary.histogram = dict((int(k), v) for k, v in d['histogram'].items())
+        if summary.histogram:
+            summary.min = min(summary.histogram) / 10.0
+            summary.max = max(summary.histogram) / 10.0
+        return summary
+
+
+class RecordStats:
+    """
+    temperature (with MKT) and humidity summaries of recordings, updated page by page.
+
+    pass it as the get_data / iter_dump callback. rows up to last_no are skipped, so feeding
+    the tail of the same recording again only adds new records. with bucket, temperature is
+    also summarized per time bucket for window() and rolling().
+    """
+
+    def __init__(self, bucket=None, delta_h=DELTA_H, unit='C'):
+        """
+        :type bucket: timedelta
+        :param unit: temperature unit, devinfo.temp_unit.name
+        """
+        self.temp = Summary(delta_h, unit)
+        self.humi = Summary(None)
+        self.first_time = None
+        self.last_time = None
+        self.last_no = None
+        self.bucket = bucket
+        self.buckets = {}
+
+    def _bucket_start(self, t):
+        size = int(self.bucket.total_seconds())
+        return _EPOCH + timedelta(seconds=int((t - _EPOCH).total_seconds()) // size * size)
+
+    def __call__(self, rows):
+        """
+        :type rows: list[tuple]  (no, datetime, temp[, humi])
+        """
+        if self.last_no is not None:
+            rows = [row for row in rows if row[0] > self.last_no]
+        if not rows:
+            return
+        self.temp.update(row[2] for row in rows)
+        if len(rows[0]) > 3:
+            self.humi.update(row[3] for row in rows)
+        if self.first_time is None:
+            self.first_time = rows[0][1]
+        self.last_time = rows[-1][1]
+        self.last_no = rows[-1][0]
+
+        if self.bucket is not None:
+            by_bucket = {}
+            for row in rows:
+                by_bucket.setdefault(self._bucket_start(row[1]), []).append(row[2])
+            for start, values in by_bucket.items():
+                self.buckets.setdefault(start, Summary(self.temp.delta_h, self.temp.unit)).update(values)
+
+    def merge(self, other):
+        """
+        combine statistics of another session or logger. the result no longer follows one recording (last_no is cleared).
+        :type other: RecordStats
+        :rtype: RecordStats
+        """
+        self.temp.merge(other.temp)
+        self.humi.merge(other.humi)
+        times = [t for t in (self.first_time, other.first_time) if t is not None]
+        self.first_time = min(times) if times else None
+        times = [t for t in (self.last_time, other.last_time) if t is not None]
+        self.last_time = max(times) if times else None
+        self.last_no = None
+        if other.buckets and self.bucket != other.bucket and self.buckets:
+            raise ValueError("can not merge different buckets")
+        self.bucket = self.bucket or other.bucket
+        for start, summary in other.buckets.items():
+            self.buckets.setdefault(start, Summary(summary.delta_h, summary.unit)).merge(summary)
+        return self
+
+    def window(self, start, end):
+        """
+        temperature summary of buckets starting in [start, end).
+        :rtype: Summary
+        """
+        summary = Summary(self.temp.delta_h, self.temp.unit)
+        for bucket_start, bucket in self.buckets.items():
+            if start <= bucket_start < end:
+                summary.merge(bucket)
+        return summary
+
+    def rolling(self, window):
+        """
+        temperature summary of the window ending at each bucket end.
+        :type window: timedelta  multiple of bucket
+        :rtype: list[(datetime, Summary)]
+        """
+        result = []
+        for bucket_start in sorted(self.buckets):
+            end = bucket_start + self.bucket
+            result.append((end, self.window(end - window, end)))
+        return result
+
+    def to_dict(self):
+        d = {
+            'temp': self.temp.to_dict(),
+            'first_time': _time_str(self.first_time),
+            'last_time': _time_str(self.last_time),
+            'last_no': self.last_no,
+        }
+        if self.humi.count:
+            d['humi'] = self.humi.to_dict()
+        if self.bucket is not None:
+            d['bucket'] = int(self.bucket.total_seconds())
+            d['buckets'] = dict((_time_str(k), v.to_dict()) for k, v in self.buckets.items())
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        """
+        :rtype: RecordStats
+        """
+        stats = cls(timedelta(seconds=d['bucket']) if 'bucket' in d else None)
+        stats.temp = Summary.from_dict(d['temp'])
+        if 'humi' in d:
+            stats.humi = Summary.from_dict(d['humi'])
+        stats.first_time = _time(d['first_time'])
+        stats.last_time = _time(d['last_time'])
+        stats.last_no = d['last_no']
+        stats.buckets = dict((_time(k), Summary.from_dict(v)) for k, v in d.get('buckets', {}).items())
+        return stats
+
+    def save(self, path):
+        with io.open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(json.dumps(self.to_dict(), sort_keys=True))
+        os.rename(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        :rtype: RecordStats
+        """
+        with io.open(path, encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+
+def dump_stats(directory, bucket=None, encode='utf8'):
+    """
+    statistics of a dump directory, kept in stats.json next to the pages.
+    the file is reused while it covers every record of the dump.
+    :type directory: str
+    :rtype: RecordStats
+    """
+    path = os.path.join(directory, STATS_FILE)
+    devinfo, header = load_dump_info(directory, encode)
+    unit = devinfo.temp_unit.name if devinfo.temp_unit is not None else 'C'
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(os.path.join(directory, HEADER_FILE)):
+        stats = RecordStats.load(path)
+        if (stats.last_no or 0) == header.rec_count and stats.bucket == bucket and stats.temp.unit == unit:
+            return stats
+    stats = RecordStats(bucket, unit=unit)
+    for rows in iter_dump(directory, encode):
+        stats(rows)
+    stats.save(path)
+    return stats
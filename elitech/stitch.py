@@ -0,0 +1,213 @@
+# coding: utf-8
+
+__author__ = 'civic'
+
+from collections import namedtuple
+
+import numpy as np
+
+from .dump import iter_dump, load_dump_info
+from .msg import _interval_timedelta
+
+SessionKey = namedtuple('SessionKey', ['dev_num', 'station_no', 'start_time'])
+
+# reason: 'missing' records not downloaded inside a session (also before the first or after the last
+# downloaded record), 'session' between two sessions.
+# start / end: times of the records on both sides of the gap.
+Gap = namedtuple('Gap', ['start', 'end', 'reason', 'session'])
+
+_COLUMNS = ('no', 'time', 'temp', 'humi')
+
+
+def _columns(rows):
+    """
+    :type rows: list[tuple]  (no, datetime, temp[, humi])
+    :rtype: dict[str, numpy.ndarray]
+    """
+    cols = list(zip(*rows))
+    columns = {
+        'no': np.asarray(cols[0], dtype='int64'),
+        'time': np.asarray(cols[1], dtype='datetime64[us]'),
+        'temp': np.asarray(cols[2], dtype=float),
+    }
+    if len(cols) > 3:
+        columns['humi'] = np.asarray(cols[3], dtype=float)
+    return columns
+
+
+def _rows(columns):
+    cols = [columns[k].tolist() for k in _COLUMNS if k in columns]
+    return list(zip(*cols))
+
+
+def _merge(a, b):
+    """
+    sorted merge of two record column sets by record number. a record in both is kept once, from a.
+    """
+    if a is None:
+        merged = b
+    else:
+        merged = dict((k, np.concatenate((a[k], b[k]))) for k in a if k in b)
+    order = np.argsort(merged['no'], kind='mergesort')
+    no = merged['no'][order]
+    keep = np.concatenate(([True], no[1:] != no[:-1]))
+    index = order[keep]
+    return dict((k, v[index]) for k, v in merged.items())
+
+
+class Timeline:
+    """
+    records of one logger over all its sessions, in session then record order.
+    session is the index in sessions of each record.
+    :type sessions: list[SessionKey]
+    :type gaps: list[Gap]
+    """
+
+    def __init__(self, sessions, columns, ends=None):
+        """
+        :param ends: per session (rec_count, time of the last record) known from the logger, or None
+        """
+        self.sessions = sessions
+        self.columns = columns
+        self.gaps = []
+        session = columns['session']
+        no = columns['no']
+        times = columns['time'].tolist()
+        if len(no) == 0:
+            return
+        same = session[1:] == session[:-1]
+        for i in np.flatnonzero(same & (no[1:] - no[:-1] > 1)):
+            self.gaps.append(Gap(times[i], times[i + 1], 'missing', int(session[i])))
+        for i in np.flatnonzero(~same):
+            self.gaps.append(Gap(times[i], times[i + 1], 'session', int(session[i + 1])))
+        # records of a session start at 1 (at start_time) and end at the record count of the logger
+        for i in np.flatnonzero(np.concatenate(([True], ~same))):
+            if no[i] > 1:
+                self.gaps.append(Gap(sessions[session[i]].start_time, times[i], 'missing', int(session[i])))
+        for i in np.flatnonzero(np.concatenate((~same, [True]))):
+            end = ends[session[i]] if ends is not None else None
+            if end is not None and no[i] < end[0]:
+                self.gaps.append(Gap(times[i], end[1], 'missing', int(session[i])))
+        self.gaps.sort(key=lambda gap: (gap.session, gap.start))
+
+    def __len__(self):
+        return len(self.columns['no'])
+
+    def rows(self):
+        """
+        :rtype: list[tuple]  (no, datetime, temp[, humi]) like get_data, record numbers restart per session
+        """
+        return _rows(self.columns)
+
+
+class Stitcher:
+    """
+    collects overlapping downloads and merges them per session (dev_num, station_no, start_time).
+
+    each download is merged into its session as sorted record-number columns, so a record
+    downloaded many times is stored once.
+    """
+
+    def __init__(self):
+        self._sessions = {}
+        self._devinfo = {}
+        self._counts = {}
+
+    def add(self, devinfo, rows, rec_count=None):
+        """
+        :type devinfo: elitech.msg.DevInfoResponse
+        :type rows: list[tuple]  get_data rows of that session
+        :param rec_count: records on the logger when downloaded, default devinfo.rec_count
+        """
+        if not rows:
+            return
+        key = SessionKey(devinfo.dev_num, devinfo.station_no, devinfo.start_time)
+        self._devinfo[key] = devinfo
+        self._sessions[key] = _merge(self._sessions.get(key), _columns(rows))
+        if rec_count is None:
+            rec_count = getattr(devinfo, 'rec_count', None)
+        if rec_count is not None:
+            self._counts[key] = max(rec_count, self._counts.get(key, 0))
+
+    def add_dump(self, directory, encode='utf8'):
+        """
+        :type directory: str  dump written by dump_data
+        """
+        devinfo, header = load_dump_info(directory, encode)
+        for rows in iter_dump(directory, encode):
+            self.add(devinfo, rows, header.rec_count)
+
+    def rec_count(self, key):
+        """
+        most records the logger had in the session over all downloads, None if unknown.
+        :rtype: int
+        """
+        return self._counts.get(key)
+
+    def loggers(self):
+        """
+        :rtype: list[(str, int)]  (dev_num, station_no)
+        """
+        return sorted(set((key.dev_num, key.station_no) for key in self._sessions))
+
+    def sessions(self):
+        """
+        :rtype: list[SessionKey]
+        """
+        return sorted(self._sessions)
+
+    def devinfo(self, key):
+        """
+        devinfo of the last download added to the session.
+        :rtype: elitech.msg.DevInfoResponse
+        """
+        return self._devinfo[key]
+
+    def rows(self, key):
+        """
+        :rtype: list[tuple]  merged (no, datetime, temp[, humi]) rows of one session
+        """
+        return _rows(self._sessions[key])
+
+    def records(self, key):
+        """
+        merged columns of one session.
+        :type key: SessionKey
+        :rtype: dict[str, numpy.ndarray]
+        """
+        return self._sessions[key]
+
+    def timeline(self, dev_num, station_no):
+        """
+        :rtype: Timeline
+        """
+        keys = sorted((key for key in self._sessions if (key.dev_num, key.station_no) == (dev_num, station_no)),
+                      key=lambda key: key.start_time)
+        parts = [self._sessions[key] for key in keys]
+        names = [k for k in _COLUMNS if all(k in part for part in parts)]
+        columns = dict((k, np.concatenate([part[k] for part in parts])) for k in names)
+        columns['session'] = np.concatenate([np.full(len(part['no']), i, dtype='int64') for i, part in enumerate(parts)])
+        return Timeline(keys, columns, [self._end(key) for key in keys])
+
+    def _end(self, key):
+        """
+        (rec_count, time of the last record) of a session, None if unknown.
+        """
+        count = self._counts.get(key)
+        interval = getattr(self._devinfo[key], 'rec_interval', None)
+        if not count or interval is None:
+            return None
+        return count, key.start_time + _interval_timedelta(interval) * (count - 1)
+
+
+def stitch_dumps(paths, encode='utf8'):
+    """
+    :type paths: list[str]  dump directories or directories containing them, see convert.find_dumps
+    :rtype: Stitcher
+    """
+    from .convert import find_dumps
+
+    stitcher = Stitcher()
+    for path, _ in find_dumps(paths):
+        stitcher.add_dump(path, encode)
+    return stitcher
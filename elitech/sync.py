@@ -0,0 +1,147 @@
+# coding: utf-8
+
+__author__ = 'civic'
+
+import threading
+from collections import deque
+from six.moves import queue
+
+
+class FairLock:
+    """
+    reentrant lock. waiting threads acquire it in arrival order.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._waiters = deque()
+        self._owner = None
+        self._depth = 0
+
+    def acquire(self):
+        me = threading.current_thread()
+        with self._cond:
+            if self._owner is me:
+                self._depth += 1
+                return True
+            ticket = object()
+            self._waiters.append(ticket)
+            while self._owner is not None or self._waiters[0] is not ticket:
+                self._cond.wait()
+            self._waiters.popleft()
+            self._owner = me
+            self._depth = 1
+        return True
+
+    def release(self):
+        with self._cond:
+            if self._owner is not threading.current_thread():
+                raise RuntimeError("cannot release un-acquired lock")
+            self._depth -= 1
+            if self._depth == 0:
+                self._owner = None
+                self._cond.notify_all()
+
+    def owned(self):
+        """
+        :rtype: bool
+        :return: True if the current thread holds the lock.
+        """
+        return self._owner is threading.current_thread()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    concurrent calls with the same key share one execution and its result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+_STOP = object()
+
+
+class ReadAhead:
+    """
+    runs consume(item) on a worker thread, in put order.
+
+    at most size items wait; put blocks beyond that, so a slow consumer throttles the
+    producer instead of buffering everything. an exception raised by consume is raised
+    again by the next put or by close, and the items after it are dropped.
+    """
+
+    def __init__(self, consume, size=4):
+        self._consume = consume
+        self._queue = queue.Queue(size)
+        self._error = None
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            if self._error is not None:
+                continue
+            try:
+                self._consume(item)
+            except BaseException as e:
+                self._error = e
+
+    def _raise(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def put(self, item):
+        self._raise()
+        self._queue.put(item)
+
+    def close(self):
+        """
+        wait until every item is consumed.
+        """
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._raise()
@@ -0,0 +1,118 @@
+# coding: utf-8
+
+__author__ = 'civic'
+
+import threading
+from concurrent.futures import Future
+from six.moves import queue
+
+
+def _queued(name):
+    def method(self, *args, **kwargs):
+        return self.submit(getattr(self.device, name), *args, **kwargs)
+    method.__name__ = name
+    method.__doc__ = """
+        queue Device.{}. callbacks run on the I/O thread.
+        :rtype: concurrent.futures.Future
+        """.format(name)
+    return method
+
+
+class ThreadedDevice:
+    """
+    thread-safe front of a Device.
+
+    calls from any thread are queued and run in order by one I/O thread that keeps
+    the port open while there is work. the port is closed after `idle_timeout`
+    seconds without calls and reopened on the next one.
+    """
+
+    def __init__(self, device, idle_timeout=1.0):
+        """
+        :type device: elitech.Device
+        """
+        self.device = device
+        self.idle_timeout = idle_timeout
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        :rtype: concurrent.futures.Future
+        """
+        if self._closed:
+            raise RuntimeError("ThreadedDevice is closed")
+        future = Future()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def _run(self):
+        item = self._queue.get()
+        while item is not None:
+            try:
+                with self.device.session():
+                    while item:
+                        self._call(*item)
+                        try:
+                            item = self._queue.get(timeout=self.idle_timeout)
+                        except queue.Empty:
+                            item = False
+            except Exception as e:
+                # the port did not open (calls never raise here). later calls open it again.
+                if item:
+                    item = self._fail(item, e)
+            if item is False:
+                item = self._queue.get()
+
+    def _fail(self, item, error):
+        """
+        fail item and every call queued behind it.
+        :rtype: None if close was queued, else False
+        """
+        while item:
+            future = item[0]
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return False
+        return item
+
+    def _call(self, future, fn, args, kwargs):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    def close(self):
+        """
+        finish queued calls and stop the I/O thread.
+        """
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    init = _queued('init')
+    get_devinfo = _queued('get_devinfo')
+    update = _queued('update')
+    get_data = _queued('get_data')
+    get_raw_data = _queued('get_raw_data')
+    get_records = _queued('get_records')
+    get_data_header = _queued('get_data_header')
+    set_clock = _queued('set_clock')
+    set_device_number = _queued('set_device_number')
+    set_user_info = _queued('set_user_info')
+    raw_send = _queued('raw_send')
+    get_latest = _queued('get_latest')
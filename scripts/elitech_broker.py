@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import argparse
+import time
+import serial
+from elitech.broker import Broker
+
+def main():
+    args = parse_args()
+    ser = serial.Serial(args.serial_port, baudrate=args.ser_baudrate, timeout=args.ser_timeout)
+    broker = Broker(ser, args.socket, devinfo_ttl=args.devinfo_ttl)
+    broker.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        broker.shutdown()
+        ser.close()
+
+def parse_args():
+    """
+    :rtype: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser('description Elitech RC-4 / RC-5 serial port broker')
+    parser.add_argument('--socket', type=str, required=True, help='unix socket path. clients use unix:<path> as serial port')
+    parser.add_argument('--devinfo_ttl', type=float, default=5.0, help='seconds a devinfo response is answered from memory')
+    parser.add_argument('--ser_baudrate', help='serial port baudrate default=115200', default=115200, type=int)
+    parser.add_argument('--ser_timeout', help='serial port reading timeout sec', default=5, type=int)
+    parser.add_argument('serial_port')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import argparse
+import sys
+from elitech.dump import iter_dump
+from scripts.elitech_device import output_rows
+
+def main():
+    args = parse_args()
+    if args.stats:
+        command_stats(args)
+    elif args.stitch:
+        command_stitch(args)
+    elif args.out is None:
+        for dump_dir in args.dump_dir:
+            for rows in iter_dump(dump_dir, args.encode):
+                output_rows(rows)
+    else:
+        command_convert(args)
+
+def command_convert(args):
+    from elitech.convert import convert_dumps
+
+    def progress(count, total, path):
+        sys.stderr.write("[{}/{}] {}\n".format(count, total, path))
+
+    convert_dumps(args.dump_dir, args.sink, args.out, processes=args.jobs, encode=args.encode,
+                  progress=progress, resume=not args.restart)
+
+def command_stats(args):
+    from elitech.convert import find_dumps
+    from elitech.stats import dump_stats
+
+    for path, name in find_dumps(args.dump_dir):
+        temp = dump_stats(path, encode=args.encode).temp
+        if not temp.count:
+            print(u"{}\t0".format(name))
+            continue
+        print(u"{}\t{}\t{:.1f}\t{:.1f}\t{:.2f}\t{:.2f}\t{:.1f}\t{:.1f}".format(
+            name, temp.count, temp.min, temp.max, temp.mean, temp.mkt(), temp.percentile(5), temp.percentile(95)))
+
+def command_stitch(args):
+    from elitech.convert import SINKS
+    from elitech.stitch import stitch_dumps
+
+    stitcher = stitch_dumps(args.dump_dir, args.encode)
+    sink = SINKS[args.sink](args.out) if args.out is not None else None
+    try:
+        for dev_num, station_no in stitcher.loggers():
+            timeline = stitcher.timeline(dev_num, station_no)
+            print(u"{}\t{}\t{} sessions\t{} records".format(dev_num, station_no, len(timeline.sessions), len(timeline)))
+            for gap in timeline.gaps:
+                print(u"\t{}\t{:%Y-%m-%d %H:%M:%S}\t{:%Y-%m-%d %H:%M:%S}".format(gap.reason, gap.start, gap.end))
+            if sink is not None:
+                for key in timeline.sessions:
+                    name = u"{}_{}_{:%Y%m%d%H%M%S}".format(key.dev_num, key.station_no, key.start_time)
+                    sink.write(name, stitcher.devinfo(key), stitcher.rows(key))
+    finally:
+        if sink is not None:
+            sink.close()
+
+def parse_args():
+    """
+    :rtype: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser('description Elitech raw page dump decoder')
+    parser.add_argument('--encode', type=str, default='utf8', help='user_info encode')
+    parser.add_argument('--out', type=str, help='batch convert to the directory (tsv, parquet) or database file (sqlite, rollup)')
+    parser.add_argument('--sink', choices=['tsv', 'sqlite', 'parquet', 'rollup'], default='tsv', help='for batch convert')
+    parser.add_argument('--jobs', type=int, help='for batch convert. number of processes default=cpu count')
+    parser.add_argument('--restart', action='store_true', help='for batch convert. ignore the journal of a previous run')
+    parser.add_argument('--stats', action='store_true', help='print count, min, max, mean, MKT, 5th and 95th percentile of each dump. '
+                                                            'kept in stats.json in the dump directory')
+    parser.add_argument('--stitch', action='store_true', help='merge overlapping dumps per session and print the gaps of each logger. '
+                                                             'with --out, write one de-duplicated output per session')
+    parser.add_argument('dump_dir', nargs='+', help='directory written by elitech-datareader --command get --raw_out, '
+                                                    'or a directory containing them (batch convert)')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,20 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+# only the standard library is imported here. elitech, serial and the modules of each
+# command are imported by the command, so short runs like latest --value_only start fast.
 import argparse
-import elitech
 import datetime
-from elitech.msg import (
-    StopButton,
-    ToneSet,
-    AlarmSetting,
-    TemperatureUnit,
-
-)
-from elitech.msg import _bin
-import six
 import os
+import sys
 
 def main():
     args = parse_args()
-    if (args.command == 'simple-set'):
+    if args.batch:
+        command_batch(args)
+    elif (args.command == 'discover'):
+        command_discover(args)
+    elif (args.command == 'simple-set'):
         command_simpleset(args)
     elif(args.command == 'get'):
         command_get(args)
@@ -25,12 +22,31 @@ def main():
         command_set(args)
     elif(args.command == 'devinfo'):
         command_devinfo(args)
+    elif(args.command == 'excursions'):
+        command_excursions(args)
+    elif(args.command == 'clock-sync'):
+        command_clock_sync(args)
     elif(args.command == 'clock'):
         command_clock(args)
     elif(args.command == 'raw'):
         command_raw_send(args)
     elif(args.command == 'latest'):
         command_latest(args)
+    elif(args.command == 'provision'):
+        command_provision(args)
+    elif(args.command == 'hotplug'):
+        command_hotplug(args)
+    elif(args.command == 'stations'):
+        command_stations(args)
+
+def _device(args):
+    import elitech
+    device = elitech.Device(args.serial_port, args.ser_baudrate, args.ser_timeout)
+    if args.link_ttl > 0:
+        from elitech.link import LinkState
+        device.link_ttl = args.link_ttl
+        device.link_state = LinkState(os.path.expanduser(args.link_state))
+    return device
 
 def _convert_time(sec):
     hour = int(sec / 3600.0)
@@ -39,7 +55,7 @@ def _convert_time(sec):
     return datetime.time(hour=hour, minute=min, second=sec)
 
 def command_simpleset(args):
-    device = elitech.Device(args.serial_port, args.ser_baudrate, args.ser_timeout)
+    device = _device(args)
     device.init()
     dev_info = device.get_devinfo()
 
@@ -51,24 +67,30 @@ def command_simpleset(args):
         param_put.rec_interval = _convert_time(args.interval)
     device.update(param_put)
 
+def output_rows(data_list):
+    for line in data_list:
+        if len(line) == 3:
+            print("{0}\t{1:%Y-%m-%d %H:%M:%S}\t{2:.1f}".format(*line))
+        elif len(line) == 4:
+            print("{0}\t{1:%Y-%m-%d %H:%M:%S}\t{2:.1f}\t{3:.1f}".format(*line))
+
 def command_get(args):
-    device = elitech.Device(args.serial_port, args.ser_baudrate, args.ser_timeout)
+    device = _device(args)
+    device.encode = args.encode
     device.init()
 
-    def output(data_list):
-        for line in data_list:
-            if len(line) == 3:
-                print("{0}\t{1:%Y-%m-%d %H:%M:%S}\t{2:.1f}".format(*line))
-            elif len(line) == 4:
-                print("{0}\t{1:%Y-%m-%d %H:%M:%S}\t{2:.1f}\t{3:.1f}".format(*line))
+    if args.raw_out:
+        from elitech.dump import dump_data
+        dump_data(device, args.raw_out, page_size=args.page_size)
+        return
 
     if args.page_size:
-        device.get_data(callback=output, page_size=args.page_size)
+        device.get_data(callback=output_rows, page_size=args.page_size, read_ahead=args.read_ahead)
     else:
-        device.get_data(callback=output)
+        device.get_data(callback=output_rows, read_ahead=args.read_ahead)
 
 def command_latest(args):
-    device = elitech.Device(args.serial_port, args.ser_baudrate, args.ser_timeout)
+    device = _device(args)
     device.init()
 
     def output(latest):
@@ -83,70 +105,48 @@ def command_latest(args):
             else:
                 print("{0}\t{1:%Y-%m-%d %H:%M:%S}\t{2:.1f}\t{3:.1f}".format(*latest))
 
+    if args.watch:
+        from elitech.poller import watch
+
+        def output_watch(data_list):
+            for latest in data_list:
+                output(latest)
+            sys.stdout.flush()
+
+        try:
+            watch(device, output_watch, page_size=args.page_size)
+        except KeyboardInterrupt:
+            pass
+        return
+
     if args.page_size:
         device.get_latest(callback=output, page_size=args.page_size)
     else:
         device.get_latest(callback=output)
 
+def _print_changes(changes):
+    for field, current, requested in changes:
+        print(u"{}: {} -> {}".format(field, current, requested))
+
 def command_set(args):
-    device = elitech.Device(args.serial_port, args.ser_baudrate, args.ser_timeout)
+    import six
+    from elitech.provision import SETTINGS, provision_device
+    device = _device(args)
     device.encode = args.encode
-    device.init()
-    dev_info = device.get_devinfo()
-    param_put = dev_info.to_param_put()
-
-    station_no = dev_info.station_no
-
-    if args.interval is not None:
-        param_put.rec_interval = _convert_time(args.interval)
-    if args.upper_limit is not None:
-        param_put.upper_limit = args.upper_limit
-    if args.lower_limit is not None:
-        param_put.lower_limit = args.lower_limit
-    if args.station_no is not None:
-        param_put.update_station_no = int(args.station_no)
-        station_no = param_put.update_station_no
-    if args.stop_button is not None:
-        param_put.stop_button = StopButton.ENABLE if args.stop_button == 'y' else StopButton.DISABLE
-    if args.delay is not None:
-        param_put.delay = float(args.delay)
-    if args.tone_set is not None:
-        param_put.tone_set = ToneSet.PERMIT if args.tone_set == 'y' else ToneSet.NONE
-    if args.alarm is not None:
-        if args.alarm == 'x':
-            param_put.alarm = AlarmSetting.NONE
-        elif args.alarm == '3':
-            param_put.alarm = AlarmSetting.T3
-        elif args.alarm == '10':
-            param_put.alarm = AlarmSetting.T10
-    if args.temp_unit is not None:
-        param_put.temp_unit = TemperatureUnit.C if args.temp_unit == 'C' else TemperatureUnit.F
-
-    if args.temp_calibration is not None:
-        param_put.temp_calibration = float(args.temp_calibration)
-    if args.humi_upper_limit:
-        param_put.humi_upper_limit = args.humi_upper_limit
-    if args.humi_lower_limit:
-        param_put.humi_lower_limit = args.humi_lower_limit
-    if args.humi_calibration:
-        param_put.humi_calibration = float(args.humi_calibration)
-    for k,v in vars(param_put).items():
-        print("{}={}".format(k, v))
-
-    device.update(param_put)
-
-    if args.dev_num is not None:
-        device.set_device_number(station_no, args.dev_num)
-        print("{}={}".format("dev_num", args.dev_num))
-
-    if args.user_info is not None:
-        if type(args.user_info) == six.binary_type:
-            args.user_info = args.user_info.decode("utf-8")
-        device.set_user_info(station_no, args.user_info)
-        print(u"{}={}".format("user_info", args.user_info))
+    if type(args.user_info) == six.binary_type:
+        args.user_info = args.user_info.decode("utf-8")
+
+    devinfo, changes, mismatches = provision_device(device, dict((k, getattr(args, k, None)) for k in SETTINGS))
+    if not changes:
+        print("no changes")
+    _print_changes(changes)
+    if mismatches:
+        print("read back differs:")
+        _print_changes(mismatches)
+        sys.exit(1)
 
 def command_devinfo(args):
-    device = elitech.Device(args.serial_port, args.ser_baudrate, args.ser_timeout)
+    device = _device(args)
     device.encode = args.encode
     device.init()
     dev_info = device.get_devinfo()
@@ -154,8 +154,78 @@ def command_devinfo(args):
         if k.startswith("_"): continue
         print(u"{}={}".format(k, v))
 
+def command_batch(args):
+    from elitech.batch import run_batch
+    device = _device(args)
+    device.encode = args.encode
+    if run_batch(device, sys.stdin, sys.stdout):
+        sys.exit(1)
+
+def command_stations(args):
+    from elitech.bus import Bus, Station
+    device = _device(args)
+    bus = Bus(device, probe_timeout=args.probe_timeout)
+    stations = [Station(station_no) for station_no in bus.discover()]
+    bus.read_headers(stations)
+    for station in stations:
+        print("{}\t{}\t{}".format(station.station_no, station.header.rec_count, station.header.start_time))
+
+def command_discover(args):
+    from elitech.discover import discover
+    ports = [args.serial_port] if args.serial_port else None
+    cache = None if args.no_cache else os.path.expanduser(args.cache)
+    for found in discover(ports, timeout=args.probe_timeout, baudrate=args.ser_baudrate, cache_path=cache, encode=args.encode):
+        devinfo = found.devinfo
+        print(u"{}\t{}\t{}\t{}\t{}".format(found.port, devinfo.model_no, devinfo.station_no, devinfo.dev_num, devinfo.user_info))
+
+def command_provision(args):
+    from elitech.provision import load_manifest, provision
+    ports = [args.serial_port] if args.serial_port else None
+    failed = 0
+    for result in provision(load_manifest(args.manifest), jobs=args.jobs, timeout=args.ser_timeout,
+                            baudrate=args.ser_baudrate, encode=args.encode, ports=ports, probe_timeout=args.probe_timeout,
+                            clock_threshold=args.threshold):
+        if result.error is not None:
+            failed += 1
+            print(u"{}\terror: {}".format(result.port, result.error))
+        elif result.mismatches:
+            failed += 1
+            print(u"{}\t{}\tmismatch: {}".format(result.port, result.devinfo.dev_num, ", ".join(
+                u"{}={} (expected {})".format(field, got, want) for field, got, want in result.mismatches)))
+        elif result.changes:
+            print(u"{}\t{}\tchanged: {}".format(result.port, result.devinfo.dev_num, ", ".join(
+                u"{} {} -> {}".format(field, current, requested) for field, current, requested in result.changes)))
+        else:
+            print(u"{}\t{}\tunchanged".format(result.port, result.devinfo.dev_num))
+    if failed:
+        sys.exit(1)
+
+def command_hotplug(args):
+    from elitech.convert import SINKS
+    from elitech.hotplug import HotplugDownloader
+
+    def done(port, devinfo, count):
+        sys.stderr.write(u"{}\t{}\t{} records\n".format(port, devinfo.dev_num, count))
+
+    def error(port, e):
+        sys.stderr.write(u"{}\terror: {}\n".format(port, e))
+
+    state = os.path.expanduser(args.state) if args.incremental else None
+    if state is not None and not os.path.isdir(os.path.dirname(state)):
+        os.makedirs(os.path.dirname(state))
+    downloader = HotplugDownloader(SINKS[args.sink](args.out), args.watch_dir, jobs=args.jobs,
+                                   incremental=args.incremental, state_path=state, timeout=args.ser_timeout,
+                                   baudrate=args.ser_baudrate, encode=args.encode, on_done=done, on_error=error)
+    try:
+        downloader.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        downloader.close()
+        downloader.sink.close()
+
 def command_clock(args):
-    device = elitech.Device(args.serial_port, args.ser_baudrate, args.ser_timeout)
+    device = _device(args)
     dev_info = device.get_devinfo()
     if args.time:
         clock = datetime.datetime.strptime(args.time, '%Y%m%d%H%M%S')
@@ -163,8 +233,36 @@ def command_clock(args):
         clock = None
     device.set_clock(dev_info.station_no, clock)
 
+def command_excursions(args):
+    from elitech.analysis import analyze
+    device = _device(args)
+    device.encode = args.encode
+    device.init()
+    analyzer = analyze(device, page_size=args.page_size)
+    for e in analyzer.excursions:
+        print(u"{}\t{:%Y-%m-%d %H:%M:%S}\t{:%Y-%m-%d %H:%M:%S}\t{}\t{:.1f}\t{}".format(
+            e.channel, e.start, e.end, e.duration, e.peak, 'alarm' if e.alarm else ''))
+
+def command_clock_sync(args):
+    from elitech.clock import DriftHistory, sync_clocks
+    if args.serial_port:
+        ports = [args.serial_port]
+    else:
+        from elitech.discover import discover
+        cache = None if args.no_cache else os.path.expanduser(args.cache)
+        ports = [found.port for found in discover(timeout=args.probe_timeout, baudrate=args.ser_baudrate, cache_path=cache)]
+    history = DriftHistory(os.path.expanduser(args.drift_history))
+    for result in sync_clocks(ports, threshold=args.threshold, history=history, jobs=args.jobs, force=args.force,
+                              baudrate=args.ser_baudrate, timeout=args.ser_timeout, encode=args.encode):
+        if result.error is not None:
+            print(u"{}\terror: {}".format(result.port, result.error))
+        else:
+            print(u"{}\t{}\t{:+.1f}\t{}".format(result.port, result.dev_num, result.offset, result.action))
+
 def command_raw_send(args):
-    device = elitech.Device(args.serial_port, args.ser_baudrate, args.ser_timeout)
+    import six
+    from elitech.msg import _bin
+    device = _device(args)
 
     request_bytes = _bin(args.req)
 
@@ -186,7 +284,7 @@ def parse_args():
     :rtype: argparse.Namespace
     """
     parser = argparse.ArgumentParser('description Elitech RC-4 / RC-5 data reader')
-    parser.add_argument('-c', "--command", choices=['init', 'get', 'latest', 'simple-set', 'set', 'devinfo', 'clock', 'raw'])
+    parser.add_argument('-c', "--command", choices=['init', 'get', 'latest', 'simple-set', 'set', 'devinfo', 'clock', 'raw', 'stations', 'discover', 'hotplug', 'provision', 'clock-sync', 'excursions'])
     parser.add_argument('-i', "--interval", type=int)
     parser.add_argument("--upper_limit", type=float)
     parser.add_argument("--lower_limit", type=float)
@@ -204,14 +302,38 @@ def parse_args():
     parser.add_argument('--dev_num', type=str)
     parser.add_argument('--user_info', type=str)
     parser.add_argument('--encode', type=str, default='utf8', help='user_info encode')
-    parser.add_argument('--page_size', type=int, help='for command get')
+    parser.add_argument('--page_size', type=int, help='for command get, excursions')
+    parser.add_argument('--read_ahead', type=int, default=4, help='for command get. pages decoded and printed on a worker thread '
+                                                                  'while the next is read. 0 in line')
+    parser.add_argument('--raw_out', '--raw-out', type=str, help='for command get. write raw response pages to the directory without decoding')
     parser.add_argument('--req', type=str, help='for raw command')
     parser.add_argument('--res_len', type=int, help='for raw command', default=1000)
     parser.add_argument('--value_only', help='for latest command', action='store_true')
+    parser.add_argument('--watch', help='for latest command. print each new record just after the logger writes it', action='store_true')
+    parser.add_argument('--probe_timeout', type=float, default=0.2, help='for stations, discover, clock-sync command. reading timeout sec per probe')
+    parser.add_argument('--cache', type=str, default='~/.cache/elitech/ports.json', help='for discover, clock-sync command. probe result cache')
+    parser.add_argument('--no_cache', action='store_true', help='for discover, clock-sync command. probe every port')
+    parser.add_argument('--threshold', type=float, default=2.0, help='for clock-sync, provision command. set the clock when drift exceeds sec')
+    parser.add_argument('--drift_history', type=str, default='~/.cache/elitech/drift.json', help='for clock-sync command. drift samples per logger')
+    parser.add_argument('--force', action='store_true', help='for clock-sync command. measure every logger even when drift is predictable')
+    parser.add_argument('--manifest', type=str, help='for provision command. csv or yaml: port or dev_num and settings per logger')
+    parser.add_argument('--watch_dir', type=str, default='/dev', help='for hotplug command. directory of serial device nodes')
+    parser.add_argument('--out', type=str, default='.', help='for hotplug command. output directory (tsv, parquet) or database file (sqlite, rollup)')
+    parser.add_argument('--sink', choices=['tsv', 'sqlite', 'parquet', 'rollup'], default='tsv', help='for hotplug command')
+    parser.add_argument('--jobs', type=int, default=4, help='for hotplug, provision, clock-sync command. concurrent loggers')
+    parser.add_argument('--incremental', action='store_true', help='for hotplug command. download only records not downloaded before')
+    parser.add_argument('--state', type=str, default='~/.cache/elitech/downloads.json', help='for hotplug command. last downloaded record per logger')
+    parser.add_argument('--batch', action='store_true', help='read json lines commands (devinfo, latest, get, set, clock, raw) from stdin '
+                                                            'and run them in one port session. json lines results to stdout')
+    parser.add_argument('--link_ttl', type=float, default=30, help='skip the init handshake when the port answered within sec. 0 always init')
+    parser.add_argument('--link_state', type=str, default='~/.cache/elitech/link.json', help='last successful exchange per port, shared by runs')
     parser.add_argument('--ser_baudrate', help='serial port baudrate default=115200', default=115200, type=int)
     parser.add_argument('--ser_timeout', help='serial port reading timeout sec', default=5, type=int)
-    parser.add_argument('serial_port')
-    return parser.parse_args()
+    parser.add_argument('serial_port', nargs='?')
+    args = parser.parse_args()
+    if args.serial_port is None and args.command not in ('discover', 'hotplug', 'provision', 'clock-sync'):
+        parser.error('serial_port is required')
+    return args
 
 
 
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import argparse
+import sys
+import time
+import elitech
+from elitech.poller import Poller
+
+def main():
+    args = parse_args()
+
+    def device_factory(port):
+        return elitech.Device(port, args.ser_baudrate, args.ser_timeout)
+
+    def output(logger, reading):
+        if reading.humi is None:
+            print("{0}\t{1}\t{2:%Y-%m-%d %H:%M:%S}\t{3:.1f}".format(reading.port, reading.no, reading.time, reading.temp))
+        else:
+            print("{0}\t{1}\t{2:%Y-%m-%d %H:%M:%S}\t{3:.1f}\t{4:.1f}".format(reading.port, reading.no, reading.time, reading.temp, reading.humi))
+        sys.stdout.flush()
+
+    poller = Poller(args.serial_port, device_factory=device_factory, history=args.history,
+                    min_gap=args.min_gap, workers=args.workers, min_interval=args.min_interval,
+                    callback=None if args.quiet else output)
+    poller.start()
+    if args.http_port:
+        from elitech.exporter import MetricsServer
+        MetricsServer(poller, (args.http_host, args.http_port)).start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        poller.stop()
+
+def parse_args():
+    """
+    :rtype: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser('description Elitech RC-4 / RC-5 latest data poller')
+    parser.add_argument('--history', type=int, default=100, help='readings kept in memory per port')
+    parser.add_argument('--min_gap', type=float, default=0.5, help='minimum seconds between serial transactions')
+    parser.add_argument('--workers', type=int, default=1, help='number of ports polled concurrently')
+    parser.add_argument('--min_interval', type=float, default=10, help='minimum poll interval sec')
+    parser.add_argument('--http_port', type=int, help='serve prometheus metrics on the port (/metrics)')
+    parser.add_argument('--http_host', type=str, default='', help='bind address for --http_port')
+    parser.add_argument('--quiet', action='store_true', help='do not print readings')
+    parser.add_argument('--ser_baudrate', help='serial port baudrate default=115200', default=115200, type=int)
+    parser.add_argument('--ser_timeout', help='serial port reading timeout sec', default=5, type=int)
+    parser.add_argument('serial_port', nargs='+')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+import argparse
+import csv
+import io
+import os
+import sys
+from datetime import datetime
+
+def main():
+    args = parse_args()
+    from elitech.retime import retime_files
+
+    if args.offsets:
+        tasks = _offsets_tasks(args.offsets, args.tsv)
+    else:
+        dev_nums = _read_table(args.dev_nums, 'dev_num') if args.dev_nums else {}
+        tasks = _history_tasks(os.path.expanduser(args.drift_history), args.tsv,
+                               lambda path: _lookup(dev_nums, path) or args.dev_num)
+
+    def progress(count, total, path):
+        sys.stderr.write("[{}/{}] {}\n".format(count, total, path))
+
+    retime_files(tasks, args.out, processes=args.jobs, progress=progress)
+
+def _parse_time(s):
+    return datetime.strptime(s, '%Y-%m-%d %H:%M:%S') if s else None
+
+def _read_table(csv_path, *columns):
+    """
+    csv rows keyed by the file column (a path, or a bare file name).
+    """
+    table = {}
+    with open(csv_path) as f:
+        for row in csv.DictReader(f):
+            values = tuple(row.get(c) for c in columns)
+            table[os.path.normpath(row['file'])] = values if len(values) > 1 else values[0]
+    return table
+
+def _lookup(table, path):
+    """
+    entry of path, else of its file name.
+    """
+    key = os.path.normpath(path)
+    return table[key] if key in table else table.get(os.path.basename(path))
+
+def _offsets_tasks(offsets_path, paths):
+    """
+    csv columns: file, start_offset, end_offset, optional start, end (logger time)
+    """
+    offsets = _read_table(offsets_path, 'start_offset', 'end_offset', 'start', 'end')
+    tasks = []
+    for path in paths:
+        row = _lookup(offsets, path)
+        if row is None:
+            sys.stderr.write("no offsets for {}, skipped\n".format(path))
+            continue
+        tasks.append((path, float(row[0]), float(row[1]), _parse_time(row[2]), _parse_time(row[3])))
+    return tasks
+
+def _history_tasks(history_path, paths, dev_num_of):
+    """
+    :param dev_num_of: path -> dev_num of the logger that recorded it. tsv files do not carry it.
+    """
+    from elitech.clock import DriftHistory
+    from elitech.retime import history_offsets
+    history = DriftHistory(history_path)
+    tasks = []
+    for path in paths:
+        dev_num = dev_num_of(path)
+        if not dev_num:
+            sys.stderr.write("no dev_num for {}, skipped\n".format(path))
+            continue
+        with io.open(path, encoding='utf-8') as f:
+            times = [line.split(u'\t')[1] for line in f if line.strip()]
+        offsets = history_offsets(history, dev_num, _parse_time(times[0]), _parse_time(times[-1])) if times else None
+        if offsets is None:
+            sys.stderr.write("no drift samples for {}, skipped\n".format(path))
+            continue
+        tasks.append((path,) + offsets)
+    return tasks
+
+def parse_args():
+    """
+    :rtype: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser('description Elitech recording clock drift correction')
+    parser.add_argument('--out', type=str, required=True, help='output directory')
+    parser.add_argument('--offsets', type=str, help='csv: file,start_offset,end_offset[,start,end] (logger - true clock sec)')
+    parser.add_argument('--drift_history', type=str, default='~/.cache/elitech/drift.json',
+                        help='drift samples written by elitech-datareader --command clock-sync. used without --offsets')
+    parser.add_argument('--dev_num', type=str, help='with --drift_history. dev_num of the logger of every tsv')
+    parser.add_argument('--dev_nums', type=str, help='with --drift_history. csv: file,dev_num')
+    parser.add_argument('--jobs', type=int, help='number of processes default=cpu count')
+    parser.add_argument('tsv', nargs='+', help='tsv written by elitech-datareader --command get or elitech-decode')
+    args = parser.parse_args()
+    if not args.offsets and not (args.dev_num or args.dev_nums):
+        parser.error('--drift_history needs --dev_num or --dev_nums')
+    return args
+
+
+if __name__ == '__main__':
+    main()
@@ -37,9 +37,19 @@ setup(
     platforms='any',
     test_suite = "tests",
     install_requires=open('requirements.txt').read().splitlines(),
+    extras_require={
+        'parquet': ['pyarrow'],
+        'yaml': ['PyYAML'],
+        'numpy': ['numpy'],
+        'pandas': ['pandas'],
+    },
     entry_points="""
     [console_scripts]
     elitech-datareader=scripts.elitech_device:main
+    elitech-decode=scripts.elitech_decode:main
+    elitech-poller=scripts.elitech_poller:main
+    elitech-broker=scripts.elitech_broker:main
+    elitech-retime=scripts.elitech_retime:main
     """,
     dependency_links=["http://www.silabs.com/products/mcu/Pages/USBtoUARTBridgeVCPDrivers.aspx"]
 
@@ -0,0 +1,92 @@
+# coding: utf8
+"""
+fixtures shared by the test modules.
+"""
+
+__author__ = 'civic'
+
+from io import BytesIO
+from struct import pack
+
+import six
+
+import elitech
+from elitech.msg import _bin, _append_checksum
+from elitech.simulator import SimulatedSerial
+
+
+class DummySerial:
+    def __init__(self, res, callback=None):
+        if res:
+            self.buf = BytesIO(res)
+        else:
+            self.buf = None
+            self.callback = callback
+
+        self.ba = None
+
+    def write(self, ba):
+        self.ba = ba
+
+    def read(self, length):
+        if self.buf:
+            return self.buf.read(length)
+        else:
+            if six.PY2:
+                return self.callback(length, [int(ord(b)) for b in self.ba])
+            else:
+                return self.callback(length, self.ba)
+
+    def open(self):
+        pass
+    def close(self):
+        pass
+
+
+DEVINFO_RC4_110 = ("55 01 01 28 0A 01 02 03 02 58 FE D4 07 DF 0A 01 "
+                   "00 00 00 02 07 DF 0A 01 00 00 00 13 64 00 6E 07 "
+                   "DF 05 0E 16 2F 36 52 43 2D 34 20 44 61 74 61 20 "
+                   "4C 6F 67 67 65 72 00 00 00 00 00 00 00 00 00 00 "
+                   "00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 "
+                   "00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 "
+                   "00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 "
+                   "00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 00 "
+                   "00 00 00 00 00 00 00 00 00 00 39 39 30 30 31 31 "
+                   "32 32 33 33 11 31 00 31 F1 00 00 00 00 00 00 FF")
+
+
+def body_page(values):
+    return _append_checksum(_bin("55") + pack(">{}h".format(len(values)), *values))
+
+
+def rc4_110_callback(length, ba):
+    if ba[0] == 0xCC and ba[2] == 0x0A:
+        return _bin("55 A5 FA")
+    elif ba[0] == 0xCC:
+        return _bin(DEVINFO_RC4_110)
+    elif ba[0] == 0x33 and ba[2] == 0x01:
+        return _append_checksum(_bin("55 00 6E 07 DF 0A 01 00 00 00"))
+    elif ba[0] == 0x33 and ba[2] == 0x02:
+        if ba[3] == 0:
+            return body_page(range(0, 100))
+        elif ba[3] == 1:
+            return body_page(range(100, 110))
+    raise ValueError("invalid request data length")
+
+
+def make_device(port, callback=rc4_110_callback):
+    device = elitech.Device(None)
+    device.wait_time = 0
+    device._ser = DummySerial(None, callback=callback)
+    return device
+
+
+def simulated_device(logger, ser=None):
+    """
+    device talking to a SimulatedLogger, through ser if given.
+    :type logger: elitech.simulator.SimulatedLogger
+    """
+    device = elitech.Device(None)
+    device.wait_time = 0
+    device._ser = ser or SimulatedSerial(logger)
+    return device
@@ -0,0 +1,77 @@
+# coding: utf8
+
+__author__ = 'civic'
+
+import unittest
+from datetime import datetime, timedelta
+
+try:
+    import numpy
+    from elitech.align import Series, align, grid, iter_align
+except ImportError:
+    numpy = None
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class AlignTest(unittest.TestCase):
+    start = datetime(2026, 1, 1)
+
+    def series(self, offset, step, count, first_value=0.0, name=None):
+        times = [self.start + timedelta(seconds=offset + step * i) for i in range(count)]
+        return Series(times, [first_value + i for i in range(count)], name)
+
+    def test_methods(self):
+        s = self.series(0, 60, 5)   # 00:00 .. 00:04, values 0 .. 4
+        points = grid(self.start - timedelta(seconds=30), self.start + timedelta(minutes=6, seconds=30), timedelta(seconds=30))
+        m = align([s], points, 'linear')[:, 0]
+        self.assertTrue(numpy.isnan(m[0]))
+        self.assertEqual(list(m[1:10]), [0, 0.5, 1, 1.5, 2, 2.5, 3, 3.5, 4])
+        self.assertTrue(numpy.isnan(m[10:]).all())
+
+        m = align([s], points, 'hold')[:, 0]
+        self.assertEqual(list(m[1:13]), [0, 0, 1, 1, 2, 2, 3, 3, 4, 4, 4, 4])
+        self.assertTrue(numpy.isnan(m[13]))   # more than 1.5 steps after the last sample
+
+        m = align([s], points, 'nearest')[:, 0]
+        self.assertEqual(list(m[:11]), [0, 0, 0, 1, 1, 2, 2, 3, 3, 4, 4])
+        self.assertTrue(numpy.isnan(m[11]))
+        self.assertRaises(ValueError, align, [s], points, 'cubic')
+
+    def test_gap_between_sessions(self):
+        first = self.series(0, 60, 3)
+        second = self.series(600, 60, 3, first_value=10)
+        s = Series.concat([second, first])
+        points = grid(self.start, self.start + timedelta(minutes=13), timedelta(minutes=1))
+        m = align([s, self.series(30, 120, 7)], points, 'linear')
+        self.assertEqual(list(m[:3, 0]), [0, 1, 2])
+        self.assertTrue(numpy.isnan(m[3:10, 0]).all())
+        self.assertEqual(list(m[10:, 0]), [10, 11, 12])
+        # second logger on its own 2 minute interval, 30 seconds later
+        self.assertTrue(numpy.isnan(m[0, 1]))
+        self.assertEqual(m[1, 1], 0.25)
+        self.assertEqual(m.shape, (13, 2))
+
+    def test_iter_align(self):
+        a = self.series(0, 60, 1000)
+        b = self.series(20, 30, 2000, first_value=5)
+
+        def chunks(s, size):
+            for i in range(0, len(s.times), size):
+                yield s.times[i:i + size], s.values[i:i + size]
+
+        end = self.start + timedelta(minutes=1100)
+        expect = align([a, b], grid(self.start, end, timedelta(seconds=45)), 'linear', timedelta(seconds=90))
+        got = [m for _, m in iter_align([chunks(a, 77), chunks(b, 130)], self.start, end, timedelta(seconds=45),
+                                        timedelta(seconds=90), chunk_points=100)]
+        self.assertEqual(len(got), 15)
+        numpy.testing.assert_array_equal(numpy.concatenate(got), expect)
+
+        # the grid of a century in microseconds does not fit in memory, chunks are generated one by one
+        points, matrix = next(iter_align([chunks(a, 77)], self.start, datetime(2126, 1, 1), timedelta(microseconds=1),
+                                         timedelta(seconds=90), chunk_points=100))
+        self.assertEqual((len(points), points[-1]), (100, numpy.datetime64(self.start, 'us') + 99))
+        self.assertEqual(matrix[0, 0], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+# coding: utf8
+
+__author__ = 'civic'
+
+import unittest
+from datetime import datetime, time, timedelta
+
+from elitech.msg import AlarmSetting
+from elitech.simulator import SimulatedLogger
+from tests.helpers import simulated_device
+
+try:
+    from elitech.analysis import ExcursionAnalyzer, analyze
+except ImportError:
+    ExcursionAnalyzer = None
+
+
+@unittest.skipIf(ExcursionAnalyzer is None, "numpy is not installed")
+class ExcursionAnalyzerTest(unittest.TestCase):
+    def logger(self, model_no=40):
+        logger = SimulatedLogger(model_no=model_no, rec_interval=time(0, 1, 0))
+        logger.param.upper_limit = 8.0
+        logger.param.lower_limit = 2.0
+        logger.param.alarm = AlarmSetting.T3
+        return logger
+
+    def test_pages(self):
+        logger = self.logger()
+        temps = [5.0] * 250
+        temps[95:105] = [9.0] * 10      # across the first page boundary
+        temps[103] = 12.5
+        temps[150:152] = [8.5, 8.1]     # too short for T3
+        temps[160] = 8.0                # on the limit is in range
+        temps[245:] = [1.0] * 5         # still out at the last record
+        for t in temps:
+            logger.add_record(t)
+
+        analyzer = analyze(simulated_device(logger))
+        start = datetime(2015, 10, 1)
+        self.assertEqual([(e.channel, e.first_no, e.last_no, e.samples, e.peak, e.alarm) for e in analyzer.excursions],
+                         [('temp_upper', 96, 105, 10, 12.5, True),
+                          ('temp_upper', 151, 152, 2, 8.5, False),
+                          ('temp_lower', 246, 250, 5, 1.0, True)])
+        first = analyzer.excursions[0]
+        self.assertEqual((first.start, first.end, first.duration, first.limit),
+                         (start + timedelta(minutes=95), start + timedelta(minutes=104), timedelta(minutes=10), 8.0))
+        self.assertEqual(analyzer.time_out()['temp_upper'], timedelta(minutes=12))
+        self.assertEqual(analyzer.samples, 250)
+
+    def test_humidity_and_alarm_override(self):
+        logger = self.logger(model_no=42)
+        logger.param.humi_upper_limit = 70.0
+        logger.param.humi_lower_limit = 20.0
+        for n in range(120):
+            logger.add_record(5.0, 75.0 if 10 <= n < 14 else 50.0)
+
+        analyzer = analyze(simulated_device(logger), alarm=AlarmSetting.T10)
+        self.assertEqual([(e.channel, e.first_no, e.samples, e.peak, e.alarm) for e in analyzer.excursions],
+                         [('humi_upper', 11, 4, 75.0, False)])
+
+    def test_callback(self):
+        logger = self.logger()
+        devinfo = simulated_device(logger).get_devinfo()
+        found = []
+        analyzer = ExcursionAnalyzer(devinfo, on_excursion=found.append)
+        start = datetime(2015, 10, 1)
+        analyzer([(1, start, 9.0), (2, start, 9.0)])
+        analyzer([(3, start, 9.0), (4, start, 5.0)])
+        self.assertEqual([(e.first_no, e.last_no, e.alarm) for e in found], [(1, 3, True)])
+        self.assertEqual(analyzer.excursions, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+# coding: utf8
+
+__author__ = 'civic'
+
+import io
+import json
+import unittest
+from datetime import datetime
+
+from elitech.batch import BatchRunner, run_batch
+from elitech.simulator import SimulatedLogger
+from tests.helpers import simulated_device
+
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.logger = SimulatedLogger(model_no=42, records=[250, 601, 251, 602, 252, 603])
+        self.device = simulated_device(self.logger)
+
+    def run_lines(self, lines):
+        out = io.StringIO()
+        failed = run_batch(self.device, lines, out)
+        return failed, [json.loads(line) for line in out.getvalue().splitlines()]
+
+    def test_commands_in_one_session(self):
+        opened = []
+        ser_open = self.device._ser.open
+        self.device._ser.open = lambda: opened.append(1) or ser_open()
+
+        failed, results = self.run_lines([
+            '{"id": 1, "command": "devinfo"}',
+            '',
+            '{"id": 2, "command": "latest"}',
+            '{"id": 3, "command": "get"}',
+            '{"id": 4, "command": "set", "upper_limit": 30.0, "user_info": "room 1"}',
+            '{"id": 5, "command": "set", "upper_limit": 30.0, "user_info": "room 1"}',
+            '{"id": 6, "command": "clock", "time": "2016-01-02 03:04:05"}',
+            '{"id": 7, "command": "raw", "req": "CC 00 0A 00 D6", "res_len": 3}',
+        ])
+        self.assertEqual(failed, 0)
+        self.assertEqual([r['id'] for r in results], [1, 2, 3, 4, 5, 6, 7])
+        self.assertTrue(all(r['ok'] for r in results))
+        self.assertEqual(results[0]['result']['dev_num'], '9900112233')
+        self.assertEqual(results[0]['result']['start_time'], '2015-10-01 00:00:00')
+        self.assertEqual(results[1]['result'], [3, '2015-10-01 00:00:20', 25.2, 60.3])
+        self.assertEqual(results[2]['result'][0], [1, '2015-10-01 00:00:00', 25.0, 60.1])
+        self.assertEqual(len(results[2]['result']), 3)
+        self.assertEqual(sorted(c[0] for c in results[3]['result']['changes']), ['upper_limit', 'user_info'])
+        self.assertEqual(results[3]['result']['mismatches'], [])
+        self.assertEqual(results[4]['result']['changes'], [])
+        self.assertEqual(results[5]['result'], '2016-01-02 03:04:05')
+        self.assertEqual(results[6]['result'], '55 A5 FA')
+
+        self.assertEqual(len(opened), 1)
+        init = bytes(bytearray([0xCC, 0x00, 0x0A, 0x00, 0xD6]))
+        self.assertEqual(self.logger.requests[0], init)
+        self.assertEqual(self.logger.requests.count(init), 2)   # session start and the raw command
+
+    def test_errors(self):
+        failed, results = self.run_lines([
+            'not json',
+            '[1]',
+            '{"command": "reboot"}',
+            '{"id": "x", "command": "set", "colour": "red"}',
+            '{"command": "devinfo"}',
+        ])
+        self.assertEqual(failed, 4)
+        self.assertEqual([r['ok'] for r in results], [False, False, False, False, True])
+        self.assertEqual(results[3]['id'], 'x')
+        self.assertIn('colour', results[3]['error'])
+
+    def test_runner(self):
+        results = list(BatchRunner(self.device).run([{'command': 'latest'}]))
+        self.assertEqual(results[0]['result'][0], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
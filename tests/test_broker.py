@@ -0,0 +1,112 @@
+# coding: utf8
+
+__author__ = 'civic'
+
+import unittest
+import os
+import shutil
+import tempfile
+import socket
+import threading
+import time
+from datetime import timedelta
+
+import elitech
+from elitech.broker import Broker, BrokerTransport, classify, PRIORITY_BULK, PRIORITY_INTERACTIVE
+from elitech.clock import measure_drift
+from elitech.msg import _bin, DataBodyRequest, DataHeaderRequest, DevInfoRequest, DevInfoResponse, ParamPutRequest
+from elitech.simulator import SimulatedLogger, SimulatedSerial
+from tests.helpers import DummySerial, rc4_110_callback
+
+
+def callback(length, ba):
+    if ba[0] == 0x33 and ba[2] == 0x05:
+        return _bin("55 A0 F5")
+    return rc4_110_callback(length, ba)
+
+
+class RecordingSerial(DummySerial):
+    def __init__(self, callback):
+        DummySerial.__init__(self, None, callback=callback)
+        self.requests = []
+
+    def write(self, ba):
+        DummySerial.write(self, ba)
+        self.requests.append(bytearray(ba)[:3])
+
+
+class BrokerTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'broker.sock')
+        self.ser = RecordingSerial(callback)
+        self.broker = Broker(self.ser, self.path)
+        self.broker.start()
+
+    def tearDown(self):
+        self.broker.shutdown()
+        shutil.rmtree(self.dir)
+
+    def test_classify(self):
+        self.assertEqual(classify(DataBodyRequest(1, 0).to_bytes()), PRIORITY_BULK)
+        self.assertEqual(classify(DataHeaderRequest(1).to_bytes()), PRIORITY_INTERACTIVE)
+        self.assertEqual(classify(DevInfoRequest().to_bytes()), PRIORITY_INTERACTIVE)
+
+    def test_get_data(self):
+        device = elitech.Device('unix:' + self.path)
+        self.assertEqual(device.wait_time, 0)
+        res = device.get_data()
+        self.assertEqual(len(res), 110)
+        self.assertEqual(res[-1][2], 10.9)
+
+    def test_devinfo_cache(self):
+        devices = [elitech.Device('unix:' + self.path) for _ in range(3)]
+        threads = [threading.Thread(target=d.get_devinfo) for d in devices]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(devices[0].get_devinfo().dev_num, "9900112233")
+        devinfo_requests = [r for r in self.ser.requests if r[0] == 0xCC]
+        self.assertEqual(len(devinfo_requests), 1)
+
+        # a write command drops the cache
+        self.broker.submit(ParamPutRequest(1).to_bytes(), 3)
+        devices[0].get_devinfo()
+        self.assertEqual(len([r for r in self.ser.requests if r[0] == 0xCC]), 2)
+
+    def test_drift_bypasses_cache(self):
+        logger = SimulatedLogger()
+        path = os.path.join(self.dir, 'sim.sock')
+        broker = Broker(SimulatedSerial(logger), path)
+        broker.start()
+        try:
+            device = elitech.Device('unix:' + path)
+            device.get_devinfo()
+            logger.clock_offset = timedelta(seconds=-60)
+            _, sample = measure_drift(device)
+            self.assertTrue(abs(sample.offset + 60) <= 1.0, sample)
+            self.assertTrue(device._ser.use_cache)
+        finally:
+            broker.shutdown()
+
+    def test_timeout(self):
+        def slow(length, ba):
+            time.sleep(0.5)
+            return callback(length, ba)
+        path = os.path.join(self.dir, 'slow.sock')
+        broker = Broker(DummySerial(None, callback=slow), path)
+        broker.start()
+        try:
+            transport = BrokerTransport(path, timeout=0.1, queue_wait=0.1)
+            transport.write(DevInfoRequest().to_bytes())
+            started = time.time()
+            self.assertRaises(socket.timeout, transport.read, DevInfoResponse.LENGTH)
+            self.assertTrue(time.time() - started < 0.4)
+            self.assertIsNone(transport._sock)
+        finally:
+            broker.shutdown()
+
+    def test_error(self):
+        device = elitech.Device('unix:' + self.path)
+        self.assertRaises(IOError, device.raw_send, b'\x00\x00\x00', 3)
@@ -0,0 +1,75 @@
+# coding: utf8
+
+__author__ = 'civic'
+
+import unittest
+from datetime import datetime, time, timedelta
+from struct import pack
+
+import elitech
+from elitech.bus import Bus, Station
+from elitech.msg import _bin, _append_checksum
+from tests.helpers import DummySerial, body_page
+
+
+class BusSerial(DummySerial):
+    """
+    stations 1 (110 records) and 3 (5 records) on one line.
+    """
+    counts = {1: 110, 3: 5}
+
+    def __init__(self):
+        DummySerial.__init__(self, None, callback=self.answer)
+        self.timeout = 5
+        self.bodies = []
+        self.flushes = 0
+
+    def flushInput(self):
+        # pyserial 2.7 name of reset_input_buffer
+        self.flushes += 1
+
+    def answer(self, length, ba):
+        station_no = ba[1]
+        if station_no not in self.counts:
+            return b''  # timeout
+        if ba[2] == 0x01:
+            return _append_checksum(_bin("55") + pack(">h", self.counts[station_no]) + _bin("07 DF 0A 01 00 00 00"))
+        if ba[2] == 0x02:
+            self.bodies.append((station_no, ba[3]))
+            first = ba[3] * 100 + station_no * 1000
+            return body_page(range(first, first + (length - 2) // 2))
+        raise ValueError("invalid request data length")
+
+
+class BusTest(unittest.TestCase):
+    def setUp(self):
+        self.device = elitech.Device(None)
+        self.device.wait_time = 0
+        self.device._ser = BusSerial()
+        self.bus = Bus(self.device)
+
+    def test_discover(self):
+        self.assertEqual(self.bus.discover(range(1, 6)), [1, 3])
+        self.assertEqual(self.device._ser.timeout, 5)
+        self.assertEqual(self.device._ser.flushes, 3)
+
+    def test_download_interleaved(self):
+        stations = [Station(1, 40, time(0, 1, 0)), Station(3, 40, time(0, 0, 10))]
+        pages = {1: [], 3: []}
+        self.bus.download(stations, lambda station_no, rows: pages[station_no].extend(rows))
+
+        self.assertEqual(self.device._ser.bodies, [(1, 0), (3, 0), (1, 1)])
+        self.assertEqual(len(pages[1]), 110)
+        self.assertEqual(pages[1][-1], (110, datetime(2015, 10, 1) + timedelta(minutes=109), 110.9))
+        self.assertEqual(pages[3], [(n + 1, datetime(2015, 10, 1) + timedelta(seconds=10 * n), 300.0 + n / 10.0)
+                                    for n in range(5)])
+
+    def test_poll_latest(self):
+        stations = [Station(1, 40, time(0, 1, 0)), Station(3, 40, time(0, 0, 10))]
+        latest = self.bus.poll_latest(stations)
+        self.assertEqual(latest[1][0], 110)
+        self.assertEqual(latest[3][2], 300.4)
+        self.assertEqual(stations[1].header.rec_count, 5)
+
+    def test_unknown_interval(self):
+        self.assertRaises(ValueError, self.bus.download, [Station(3)], lambda station_no, rows: None)
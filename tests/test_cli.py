@@ -0,0 +1,36 @@
+# coding: utf8
+
+__author__ = 'civic'
+
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def modules_after(code):
+    """
+    top level modules loaded by a fresh interpreter running code.
+    """
+    out = subprocess.check_output([sys.executable, '-c', code + '; import sys; print(" ".join(sys.modules))'], cwd=ROOT)
+    return set(out.decode('ascii').split())
+
+
+class StartupTest(unittest.TestCase):
+    def test_cli_imports_standard_library_only(self):
+        loaded = modules_after('import sys, scripts.elitech_device as m; '
+                               'sys.argv = ["x", "-c", "latest", "--value_only", "/dev/null"]; m.parse_args()')
+        for name in ('elitech', 'serial', 'six', 'numpy'):
+            self.assertNotIn(name, loaded)
+
+    def test_device_module_defers_transports(self):
+        loaded = modules_after('import elitech')
+        self.assertNotIn('serial', loaded)
+        self.assertNotIn('elitech.broker', loaded)
+        self.assertIn('elitech.broker', modules_after('import elitech.broker'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+# coding: utf8
+
+__author__ = 'civic'
+
+import unittest
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+import elitech
+from elitech.clock import DriftHistory, DriftSample, measure_drift, sync_clocks
+from elitech.simulator import PtyLogger, SimulatedLogger, SimulatedSerial
+
+
+class MeasureDriftTest(unittest.TestCase):
+    def test_measure(self):
+        device = elitech.Device(None)
+        device.wait_time = 0
+        device._ser = SimulatedSerial(SimulatedLogger(clock_offset=timedelta(seconds=-42)), latency=0.05)
+        devinfo, sample = measure_drift(device)
+        self.assertEqual(devinfo.dev_num, "9900112233")
+        self.assertTrue(abs(sample.offset + 42) <= 0.6, sample)
+        self.assertTrue(sample.rtt >= 0.05)
+
+
+class DriftHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_line_and_segments(self):
+        path = os.path.join(self.dir, 'drift.json')
+        history = DriftHistory(path)
+        t0 = datetime(2026, 1, 1)
+        # 2 seconds per day
+        for day in range(4):
+            history.add("A", DriftSample(t0 + timedelta(days=day), 1.0 + 2.0 * day, 0.01), port="/dev/ttyUSB0")
+        history.save()
+
+        history = DriftHistory(path)
+        self.assertEqual(history.dev_num_on("/dev/ttyUSB0"), "A")
+        self.assertAlmostEqual(history.rate("A", t0), 2.0)
+        self.assertAlmostEqual(history.offset_at("A", t0 + timedelta(hours=12)), 2.0)
+        self.assertAlmostEqual(history.offset_at("A", t0 + timedelta(days=5)), 11.0)
+
+        # a clock set starts a new segment, older samples still correct older times
+        history.clock_set("A", t0 + timedelta(days=4))
+        history.add("A", DriftSample(t0 + timedelta(days=4, hours=1), 0.1, 0.01))
+        self.assertEqual(history.offset_at("A", t0 + timedelta(days=5)), 0.1)
+        self.assertEqual(history.rate("A", t0 + timedelta(days=5)), None)
+        self.assertAlmostEqual(history.offset_at("A", t0 + timedelta(days=1)), 3.0)
+        self.assertEqual(history.offset_at("B"), None)
+
+
+class SyncClocksTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.loggers = [PtyLogger(SimulatedLogger(dev_num="1111111111", clock_offset=timedelta(seconds=30))),
+                        PtyLogger(SimulatedLogger(dev_num="2222222222"))]
+        self.ports = [logger.path for logger in self.loggers]
+
+    def tearDown(self):
+        for logger in self.loggers:
+            logger.close()
+        shutil.rmtree(self.dir)
+
+    def test_sync(self):
+        history = DriftHistory(os.path.join(self.dir, 'drift.json'))
+        results = sync_clocks(self.ports, threshold=2.0, history=history)
+        self.assertEqual([(r.dev_num, r.action, r.error) for r in results],
+                         [("1111111111", 'set', None), ("2222222222", 'ok', None)])
+        self.assertTrue(abs(results[0].offset - 30) <= 1.0)
+        self.assertTrue(abs(self.loggers[0].logger.clock_offset.total_seconds()) < 1.0)
+        self.assertTrue(abs(history.offset_at("1111111111")) < 1.0)
+
+        # second sample of each segment, then both are predicted without a round trip
+        self.assertEqual([r.action for r in sync_clocks(self.ports, history=history)], ['ok', 'ok'])
+        requests = [len(logger.logger.requests) for logger in self.loggers]
+        results = sync_clocks(self.ports, history=DriftHistory(history.path))
+        self.assertEqual([r.action for r in results], ['predicted', 'predicted'])
+        self.assertEqual([len(logger.logger.requests) for logger in self.loggers], requests)
+
+        results = sync_clocks(self.ports, history=history, force=True)
+        self.assertEqual([r.action for r in results], ['ok', 'ok'])
+
+    def test_swapped_logger_is_measured(self):
+        ports = [os.path.join(self.dir, 'ttyUSB{}'.format(i)) for i in range(2)]
+        for logger, port in zip(self.loggers, ports):
+            os.symlink(logger.path, port)
+        history = DriftHistory(os.path.join(self.dir, 'drift.json'))
+        for _ in range(2):
+            sync_clocks(ports, history=history)
+        self.assertEqual([r.action for r in sync_clocks(ports, history=history)], ['predicted', 'predicted'])
+
+        # the second logger moved to the first port
+        os.unlink(ports[0])
+        os.symlink(self.loggers[1].path, ports[0])
+        results = sync_clocks(ports, history=history)
+        self.assertEqual([(r.dev_num, r.action) for r in results], [("2222222222", 'ok'), ("2222222222", 'predicted')])
+
+
+if __name__ == '__main__':
+    unittest.main()
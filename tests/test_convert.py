@@ -0,0 +1,104 @@
+# coding: utf8
+
+__author__ = 'civic'
+
+import unittest
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+
+import elitech
+from elitech.convert import convert_dumps, find_dumps
+from elitech.dump import dump_data
+from tests.helpers import DummySerial, rc4_110_callback
+
+
+class ConvertTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.src = os.path.join(self.dir, 'src')
+        for name in ['b', 'a', os.path.join('c', 'd')]:
+            device = elitech.Device(None)
+            device.wait_time = 0
+            device._ser = DummySerial(None, callback=rc4_110_callback)
+            dump_data(device, os.path.join(self.src, name))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _device(self):
+        device = elitech.Device(None)
+        device.wait_time = 0
+        device._ser = DummySerial(None, callback=rc4_110_callback)
+        return device
+
+    def test_find_dumps(self):
+        self.assertEqual([name for _, name in find_dumps([self.src])], ['a', 'b', 'c_d'])
+        self.assertEqual([name for _, name in find_dumps([os.path.join(self.src, 'a'), self.src])],
+                         ['a', 'src_b', 'src_c_d'])
+        self.assertEqual([name for _, name in find_dumps([os.path.join(self.src, 'c')])], ['d'])
+        self.assertEqual([name for _, name in find_dumps([os.path.join(self.src, 'c'), os.path.join(self.src, 'b')])],
+                         ['b', 'c_d'])
+
+        # names do not depend on the other dumps found
+        dump_data(self._device(), os.path.join(self.dir, 'x', 'y', 'z'))
+        self.assertEqual([name for _, name in find_dumps([os.path.join(self.dir, 'x')])], ['y_z'])
+        dump_data(self._device(), os.path.join(self.dir, 'other'))
+        self.assertEqual([name for _, name in find_dumps([self.dir])], ['other', 'src_a', 'src_b', 'src_c_d', 'x_y_z'])
+        self.assertEqual([name for _, name in find_dumps([self.src])], ['a', 'b', 'c_d'])
+
+    def test_same_name_under_different_roots(self):
+        for week in ('week1', 'week2'):
+            dump_data(self._device(), os.path.join(self.dir, week, 'dev1'))
+        roots = [os.path.join(self.dir, 'week1'), os.path.join(self.dir, 'week2')]
+        self.assertEqual([name for _, name in find_dumps(roots)], ['week1_dev1', 'week2_dev1'])
+
+        out = os.path.join(self.dir, 'out')
+        self.assertEqual(convert_dumps(roots, 'tsv', out, processes=1), 2)
+        self.assertEqual(sorted(n for n in os.listdir(out) if n.endswith('.tsv')), ['week1_dev1.tsv', 'week2_dev1.tsv'])
+
+        dump_data(self._device(), os.path.join(self.src, 'c_d'))
+        self.assertRaises(ValueError, find_dumps, [self.src])
+
+    def test_convert_tsv(self):
+        out = os.path.join(self.dir, 'out')
+        progress = []
+        count = convert_dumps([self.src], 'tsv', out, processes=2,
+                              progress=lambda n, total, path: progress.append((n, total)))
+        self.assertEqual(count, 3)
+        self.assertEqual(progress, [(1, 3), (2, 3), (3, 3)])
+        with io.open(os.path.join(out, 'c_d.tsv'), encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 110)
+        self.assertEqual(lines[-1], u"110\t2015-10-05 16:43:27\t10.9")
+
+        # resume: nothing left to convert
+        self.assertEqual(convert_dumps([self.src], 'tsv', out, processes=1), 0)
+
+    def test_convert_resume(self):
+        out = os.path.join(self.dir, 'out')
+        os.makedirs(out)
+        with io.open(os.path.join(out, '.elitech-convert.tsv.done'), 'w', encoding='utf-8') as f:
+            f.write(os.path.join(self.src, 'a') + u'\n')
+
+        self.assertEqual(convert_dumps([self.src], 'tsv', out, processes=1), 2)
+        self.assertEqual(sorted(os.listdir(out)), ['.elitech-convert.tsv.done', 'b.tsv', 'c_d.tsv'])
+
+    def test_journal_per_target(self):
+        out = os.path.join(self.dir, 'out')
+        os.makedirs(out)
+        self.assertEqual(convert_dumps([self.src], 'tsv', out, processes=1), 3)
+        self.assertEqual(convert_dumps([self.src], 'sqlite', os.path.join(out, 'a.db'), processes=1), 3)
+        self.assertEqual(convert_dumps([self.src], 'sqlite', os.path.join(out, 'b.db'), processes=1), 3)
+        self.assertEqual(convert_dumps([self.src], 'sqlite', os.path.join(out, 'b.db'), processes=1), 0)
+        self.assertTrue(os.path.exists(os.path.join(out, 'a.db.elitech-convert.sqlite.done')))
+
+    def test_convert_sqlite(self):
+        db = os.path.join(self.dir, 'records.db')
+        convert_dumps([self.src], 'sqlite', db, processes=2)
+        conn = sqlite3.connect(db)
+        self.assertEqual(conn.execute("SELECT source, COUNT(*) FROM records GROUP BY source ORDER BY source").fetchall(),
+                         [('a', 110), ('b', 110), ('c_d', 110)])
+        conn.close()
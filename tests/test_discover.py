@@ -0,0 +1,61 @@
+# coding: utf8
+
+__author__ = 'civic'
+
+import json
+import unittest
+import os
+import shutil
+import tempfile
+
+from elitech.discover import discover, probe
+from elitech.simulator import PtyLogger, SimulatedLogger
+
+
+class DiscoverTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.loggers = [PtyLogger(SimulatedLogger(station_no=1, dev_num="1111111111")),
+                        PtyLogger(SimulatedLogger(model_no=42, station_no=2, dev_num="2222222222"))]
+        self.silent = os.openpty()
+
+    def tearDown(self):
+        for logger in self.loggers:
+            logger.close()
+        for fd in self.silent:
+            os.close(fd)
+        shutil.rmtree(self.dir)
+
+    def test_probe(self):
+        devinfo, raw = probe(self.loggers[1].path, timeout=0.5)
+        self.assertEqual((devinfo.model_no, devinfo.station_no, devinfo.dev_num), (42, 2, "2222222222"))
+        self.assertEqual(len(raw), 160)
+        self.assertEqual(probe(os.ttyname(self.silent[1]), timeout=0.1), None)
+        self.assertRaises(IOError, probe, os.path.join(self.dir, 'nothing'), timeout=0.1)
+
+    def test_discover_cache(self):
+        ports = [logger.path for logger in self.loggers] + [os.ttyname(self.silent[1])]
+        cache = os.path.join(self.dir, 'ports.json')
+
+        found = discover(ports, timeout=0.2, cache_path=cache)
+        self.assertEqual(sorted(f.devinfo.dev_num for f in found), ["1111111111", "2222222222"])
+        requests = [len(logger.logger.requests) for logger in self.loggers]
+
+        # unchanged ports are answered from the cache
+        found = discover(ports, timeout=0.2, cache_path=cache)
+        self.assertEqual(sorted(f.devinfo.dev_num for f in found), ["1111111111", "2222222222"])
+        self.assertEqual([len(logger.logger.requests) for logger in self.loggers], requests)
+
+    def test_port_error_not_cached(self):
+        # opens as a file but not as a serial port, like a port busy or without permission
+        broken = os.path.join(self.dir, 'ttyBROKEN')
+        open(broken, 'w').close()
+        ports = [self.loggers[0].path, broken, os.ttyname(self.silent[1])]
+        cache = os.path.join(self.dir, 'ports.json')
+
+        found = discover(ports, timeout=0.2, cache_path=cache)
+        self.assertEqual([f.port for f in found], [self.loggers[0].path])
+        with open(cache) as f:
+            entries = json.load(f)
+        self.assertEqual(sorted(entries), sorted([self.loggers[0].path, os.ttyname(self.silent[1])]))
+        self.assertIsNone(entries[os.ttyname(self.silent[1])]['devinfo'])
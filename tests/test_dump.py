@@ -0,0 +1,95 @@
+# coding: utf8
+
+__author__ = 'civic'
+
+import unittest
+import os
+import shutil
+import tempfile
+
+import elitech
+from elitech.dump import dump_data, iter_dump, load_dump, load_dump_info, page_files
+from elitech.msg import _append_checksum
+from elitech.msg import *
+from tests.helpers import DummySerial, body_page, rc4_110_callback
+
+
+class DumpTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_dump_data(self):
+        device = elitech.Device(None)
+        device.wait_time = 0
+        device._ser = DummySerial(None, callback=rc4_110_callback)
+
+        devinfo = dump_data(device, self.dir)
+        self.assertEqual(devinfo.rec_count, 110)
+        self.assertEqual(sorted(os.listdir(self.dir)),
+                         ['devinfo.bin', 'header.bin', 'page_000.bin', 'page_001.bin'])
+        with open(os.path.join(self.dir, 'page_001.bin'), 'rb') as f:
+            self.assertEqual(f.read(), body_page(range(100, 110)))
+
+    def test_load_dump(self):
+        device = elitech.Device(None)
+        device.wait_time = 0
+        device._ser = DummySerial(None, callback=rc4_110_callback)
+        dump_data(device, self.dir)
+
+        devinfo, header = load_dump_info(self.dir)
+        self.assertEqual(devinfo.dev_num, "9900112233")
+        self.assertEqual(header.rec_count, 110)
+        self.assertEqual(len(page_files(self.dir)), 2)
+
+        expect = device.get_data()
+        self.assertEqual(load_dump(self.dir), expect)
+        self.assertEqual(expect[-1][2], 10.9)
+
+    def device(self, callback=rc4_110_callback):
+        device = elitech.Device(None)
+        device.wait_time = 0
+        device._ser = DummySerial(None, callback=callback)
+        return device
+
+    def test_short_page(self):
+        def timed_out(length, ba):
+            res = rc4_110_callback(length, ba)
+            return res[:52] if ba[0] == 0x33 and ba[2] == 0x02 and ba[3] == 0 else res
+
+        self.assertRaises(ResponseError, dump_data, self.device(timed_out), self.dir)
+        self.assertEqual(page_files(self.dir), [])
+
+        def corrupt(length, ba):
+            res = bytearray(rc4_110_callback(length, ba))
+            if ba[0] == 0x33 and ba[2] == 0x02 and ba[3] == 1:
+                res[5] ^= 0x01
+            return bytes(res)
+
+        self.assertRaises(ResponseError, dump_data, self.device(corrupt), self.dir)
+
+    def test_truncated_dump(self):
+        dump_data(self.device(), self.dir)
+        path = os.path.join(self.dir, 'page_000.bin')
+        with open(path, 'rb') as f:
+            page = f.read()
+
+        # a short page written by an older version would renumber every later record
+        with open(path, 'wb') as f:
+            f.write(_append_checksum(page[:51]))
+        self.assertRaises(ValueError, list, iter_dump(self.dir))
+
+        with open(path, 'wb') as f:
+            f.write(page[:-1] + b'\x00')
+        self.assertRaises(ResponseError, list, iter_dump(self.dir))
+
+        os.remove(path)
+        self.assertRaises(ValueError, list, iter_dump(self.dir))
+
+    def test_record_numbers_from_page(self):
+        device = self.device()
+        dump_data(device, self.dir)
+        rows = list(iter_dump(self.dir))
+        self.assertEqual(rows[1][0], device.get_data()[100])
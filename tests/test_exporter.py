@@ -0,0 +1,56 @@
+# coding: utf8
+
+__author__ = 'civic'
+
+import unittest
+from six.moves.urllib.request import urlopen
+from six.moves.urllib.error import HTTPError
+
+from elitech.exporter import MetricsServer, render_metrics
+from elitech.poller import Poller
+from tests.helpers import make_device
+
+
+class ExporterTest(unittest.TestCase):
+    def test_render_metrics(self):
+        poller = Poller(['a', 'b'], device_factory=make_device)
+        poller.poll('a')
+        text = render_metrics(poller)
+        labels = 'port="a",dev_num="9900112233",station_no="1"'
+        self.assertIn('elitech_temperature{' + labels + ',unit="C"} 10.9\n', text)
+        self.assertIn('elitech_record_count{' + labels + '} 110\n', text)
+        self.assertIn('elitech_work_status{' + labels + ',status="STOP"} 1\n', text)
+        self.assertIn('elitech_up{port="b"} 0\n', text)
+        self.assertNotIn('elitech_humidity_percent{', text)
+
+    def test_failed_poll(self):
+        poller = Poller(['a'], device_factory=make_device)
+        poller.poll('a')
+        poller.device_factory = lambda port: make_device(port, callback=lambda length, ba: b'')
+        poller.loggers['a'].device = None
+        self.assertRaises(Exception, poller.poll, 'a')
+
+        text = render_metrics(poller)
+        labels = 'port="a",dev_num="9900112233",station_no="1"'
+        self.assertIn('elitech_up{' + labels + '} 0\n', text)
+        self.assertIn('elitech_poll_errors_total{' + labels + '} 1\n', text)
+        self.assertIn('elitech_last_success_timestamp_seconds{' + labels + '} ', text)
+        self.assertNotIn('elitech_temperature{', text)
+        self.assertNotIn('elitech_record_count{', text)
+
+    def test_server(self):
+        polled = []
+        poller = Poller(['a'], device_factory=lambda port: polled.append(port) or make_device(port))
+        poller.poll('a')
+        server = MetricsServer(poller, ('127.0.0.1', 0))
+        server.start()
+        try:
+            url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+            for _ in range(3):
+                body = urlopen(url + '/metrics').read().decode('utf-8')
+                self.assertIn('elitech_polls_total{port="a",dev_num="9900112233",station_no="1"} 1\n', body)
+            self.assertEqual(polled, ['a'])
+            self.assertRaises(HTTPError, urlopen, url + '/')
+        finally:
+            server.shutdown()
+            server.server_close()
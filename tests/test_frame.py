@@ -0,0 +1,70 @@
+# coding: utf8
+
+__author__ = 'civic'
+
+import unittest
+from datetime import datetime, time, timedelta
+
+from elitech.simulator import SimulatedLogger
+from tests.helpers import simulated_device
+
+try:
+    import pandas
+    from elitech.frame import records_to_dataframe, to_dataframe
+except ImportError:
+    pandas = None
+
+
+@unittest.skipIf(pandas is None, "pandas is not installed")
+class FrameTest(unittest.TestCase):
+    def test_get_data_as_frame(self):
+        logger = SimulatedLogger(records=[(n * 7) % 300 - 100 for n in range(1000)], rec_interval=time(0, 5, 0))
+        device = simulated_device(logger)
+        rows = device.get_data()
+        pages = []
+        frame = device.get_data(pages.extend, as_frame=True)
+
+        self.assertEqual(len(frame), 1000)
+        self.assertEqual(list(frame.columns), ['no', 'temp'])
+        self.assertEqual(list(frame.index.to_pydatetime()), [row[1] for row in rows])
+        self.assertEqual(list(frame['temp']), [row[2] for row in rows])
+        self.assertEqual(list(frame['no']), list(range(1, 1001)))
+        self.assertEqual(frame.index[1] - frame.index[0], pandas.Timedelta(minutes=5))
+        self.assertEqual(frame.attrs['dev_num'], '9900112233')
+        self.assertEqual(frame.attrs['model_no'], 40)
+        self.assertEqual(pages, rows)
+
+    def test_humidity(self):
+        logger = SimulatedLogger(model_no=42, records=[250, 601, 251, 602, 252, 603])
+        frame = simulated_device(logger).get_data(as_frame=True)
+        self.assertEqual(list(frame.columns), ['no', 'temp', 'humi'])
+        self.assertEqual(list(frame['temp']), [25.0, 25.1, 25.2])
+        self.assertEqual(list(frame['humi']), [60.1, 60.2, 60.3])
+        self.assertEqual(frame.index[0], pandas.Timestamp(datetime(2015, 10, 1)))
+
+    def test_to_dataframe(self):
+        device = simulated_device(SimulatedLogger(records=range(100)))
+        devinfo = device.get_devinfo()
+        rows = device.get_data()
+
+        frame = to_dataframe(rows[10:], devinfo)
+        self.assertEqual(frame.index[0], pandas.Timestamp(rows[10][1]))
+        self.assertEqual(list(frame['no'])[:2], [11, 12])
+
+        # not consecutive: times are taken from the rows
+        frame = to_dataframe(rows[:5] + rows[50:], devinfo)
+        self.assertEqual(list(frame.index.to_pydatetime()), [row[1] for row in rows[:5] + rows[50:]])
+
+        # consecutive but retimed: times are taken from the rows
+        retimed = [(row[0], row[1] - timedelta(seconds=row[0])) + row[2:] for row in rows]
+        frame = to_dataframe(retimed, devinfo)
+        self.assertEqual(list(frame.index.to_pydatetime()), [row[1] for row in retimed])
+
+        self.assertEqual(len(to_dataframe([], devinfo)), 0)
+        self.assertEqual(len(records_to_dataframe([], devinfo)), 0)
+        self.assertEqual(records_to_dataframe([1, 2], devinfo, first_no=3).index[0],
+                         pandas.Timestamp(devinfo.start_time + timedelta(seconds=20)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+# coding: utf8
+
+__author__ = 'civic'
+
+import unittest
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from elitech.convert import RollupSink, Sink, TsvSink
+from elitech.hotplug import HotplugDownloader, NodeWatcher
+from elitech.msg import DevInfoRequest
+from elitech.simulator import PtyLogger, SimulatedLogger
+
+
+class ListSink(Sink):
+    def __init__(self):
+        self.written = []
+
+    def write(self, name, devinfo, data_list):
+        self.written.append((name, data_list))
+
+
+class HotplugTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.dev = os.path.join(self.dir, 'dev')
+        os.makedirs(self.dev)
+        self.loggers = []
+
+    def tearDown(self):
+        for logger in self.loggers:
+            logger.close()
+        shutil.rmtree(self.dir)
+
+    def plug(self, name, **kwargs):
+        logger = PtyLogger(SimulatedLogger(**kwargs))
+        self.loggers.append(logger)
+        os.symlink(logger.path, os.path.join(self.dev, name))
+        return logger
+
+    def test_watcher(self):
+        watcher = NodeWatcher(self.dev, poll_interval=0.05)
+        try:
+            self.assertEqual(watcher.wait(0), [])
+            self.plug('ttyUSB0')
+            io.open(os.path.join(self.dev, 'other'), 'w').close()
+            self.assertEqual(watcher.wait(1.0), [os.path.join(self.dev, 'ttyUSB0')])
+            self.assertEqual(watcher.wait(0), [])
+        finally:
+            watcher.close()
+
+    def test_run_concurrent(self):
+        out = os.path.join(self.dir, 'out')
+        done = []
+        downloader = HotplugDownloader(TsvSink(out), self.dev, jobs=2, timeout=1.0,
+                                       on_done=lambda port, devinfo, count: done.append((devinfo.dev_num, count)))
+        thread = threading.Thread(target=downloader.run)
+        thread.start()
+        try:
+            self.plug('ttyUSB0', dev_num="1111111111", records=range(150))
+            self.plug('ttyACM0', model_no=42, dev_num="2222222222", records=range(20))
+            deadline = time.time() + 10
+            while len(done) < 2 and time.time() < deadline:
+                time.sleep(0.05)
+        finally:
+            downloader.stop()
+            thread.join()
+            downloader.close()
+
+        self.assertEqual(sorted(done), [("1111111111", 150), ("2222222222", 10)])
+        self.assertEqual(sorted(os.listdir(out)), ["1111111111_20151001000000.tsv", "2222222222_20151001000000.tsv"])
+        with io.open(os.path.join(out, "1111111111_20151001000000.tsv"), encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 150)
+        self.assertEqual(lines[-1], u"150\t2015-10-01 00:24:50\t14.9")
+
+    def test_incremental(self):
+        logger = self.plug('ttyUSB0', records=range(120))
+        port = os.path.join(self.dev, 'ttyUSB0')
+        state = os.path.join(self.dir, 'state.json')
+
+        sink = ListSink()
+        downloader = HotplugDownloader(sink, self.dev, incremental=True, state_path=state)
+        self.assertEqual(downloader.download(port), 120)
+        downloader.close()
+
+        logger.logger.add_record(50.0)
+        downloader = HotplugDownloader(sink, self.dev, incremental=True, state_path=state)
+        self.assertEqual(downloader.download(port), 1)
+        self.assertEqual(downloader.download(port), 0)
+        downloader.close()
+
+        self.assertEqual([name for name, _ in sink.written],
+                         ["9900112233_20151001000000_000001-000120", "9900112233_20151001000000_000121-000121"])
+        self.assertEqual(sink.written[1][1][0][0], 121)
+        self.assertEqual(sink.written[1][1][0][2], 50.0)
+
+    def test_incremental_rollup(self):
+        logger = self.plug('ttyUSB0', records=range(120))
+        port = os.path.join(self.dev, 'ttyUSB0')
+        sink = RollupSink(os.path.join(self.dir, 'rollup.db'))
+        downloader = HotplugDownloader(sink, self.dev, incremental=True, state_path=os.path.join(self.dir, 'state.json'))
+        try:
+            self.assertEqual(downloader.download(port), 120)
+            logger.logger.add_record(50.0)
+            self.assertEqual(downloader.download(port), 1)
+        finally:
+            downloader.close()
+
+        # both downloads extend the source of the session
+        self.assertEqual(sink.index.sources(), ["9900112233_20151001000000"])
+        self.assertEqual(sink.index.last_no("9900112233_20151001000000"), 121)
+        sink.close()
+
+    def test_retry_new_node(self):
+        # the node shows up before the logger behind it can be opened
+        logger = PtyLogger(SimulatedLogger(records=range(10)))
+        self.loggers.append(logger)
+        later = os.path.join(self.dir, 'later')
+        port = os.path.join(self.dev, 'ttyUSB0')
+        os.symlink(later, port)
+        timer = threading.Timer(0.1, os.symlink, (logger.path, later))
+        timer.start()
+
+        sink = ListSink()
+        downloader = HotplugDownloader(sink, self.dev, retry_wait=0.05)
+        try:
+            self.assertEqual(downloader.download(port), 10)
+        finally:
+            timer.join()
+            downloader.close()
+        # the devinfo of the probe is used for the download
+        self.assertEqual(logger.logger.requests.count(DevInfoRequest().to_bytes()), 1)
+
+    def test_error_after_last_retry(self):
+        port = os.path.join(self.dev, 'ttyUSB0')
+        errors = []
+        downloader = HotplugDownloader(ListSink(), self.dev, retries=2, retry_wait=0.01,
+                                       on_error=lambda port, e: errors.append(port))
+        thread = threading.Thread(target=downloader.run)
+        thread.start()
+        try:
+            os.symlink(os.path.join(self.dir, 'nothing'), port)
+            deadline = time.time() + 5
+            while not errors and time.time() < deadline:
+                time.sleep(0.05)
+        finally:
+            downloader.stop()
+            thread.join()
+            downloader.close()
+        self.assertEqual(errors, [port])
+
+
+if __name__ == '__main__':
+    unittest.main()
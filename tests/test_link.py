@@ -0,0 +1,164 @@
+# coding: utf8
+
+__author__ = 'civic'
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime
+
+from elitech.link import LinkState
+from elitech.msg import InitRequest, ResponseError
+from elitech.simulator import SimulatedLogger, SimulatedSerial
+from tests.helpers import simulated_device
+
+INIT = InitRequest().to_bytes()
+
+
+class SleepingSerial(SimulatedSerial):
+    """
+    logger that ignores every request until it gets init.
+    """
+
+    def __init__(self, logger):
+        SimulatedSerial.__init__(self, logger)
+        self.asleep = True
+
+    def write(self, ba):
+        if bytes(ba) == INIT:
+            self.asleep = False
+        if self.asleep:
+            self._buf = b''
+            return
+        SimulatedSerial.write(self, ba)
+
+
+class NoisySerial(SleepingSerial):
+    """
+    asleep logger on a noisy line: requests get junk bytes back, left in the input buffer like a real port.
+    """
+
+    def write(self, ba):
+        if self.asleep and bytes(ba) != INIT:
+            self._buf += b'\x00' * 5
+            return
+        self.asleep = False
+        self._buf += self.logger.respond(ba)
+
+
+class CorruptBodySerial(SimulatedSerial):
+    """
+    data body replies with a wrong checksum.
+    """
+
+    def write(self, ba):
+        SimulatedSerial.write(self, ba)
+        ba = bytearray(ba)
+        if ba[0] == 0x33 and ba[2] == 0x02:
+            buf = bytearray(self._buf)
+            buf[-1] = (buf[-1] + 1) % 0x100
+            self._buf = bytes(buf)
+
+
+class LinkTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'link.json')
+        self.logger = SimulatedLogger()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def device(self, ser=None, ttl=30):
+        device = simulated_device(self.logger, ser)
+        device.serial_port = '/dev/ttyUSB0'
+        device.link_ttl = ttl
+        device.link_state = LinkState(self.path)
+        return device
+
+    def inits(self):
+        return self.logger.requests.count(INIT)
+
+    def test_skip_within_ttl(self):
+        device = self.device()
+        self.assertIsNotNone(device.init().msg)
+        device.get_devinfo()
+        self.assertIsNone(device.init().msg)
+        self.assertEqual(self.inits(), 1)
+
+        # another process on the same port
+        other = self.device()
+        other.init()
+        other.get_latest()
+        self.assertEqual(self.inits(), 1)
+
+        # disabled
+        self.device(ttl=0).init()
+        self.assertEqual(self.inits(), 2)
+
+    def test_expired(self):
+        device = self.device(ttl=0.05)
+        device.init()
+        device.get_devinfo()
+        time.sleep(0.1)
+        device.init()
+        self.assertEqual(self.inits(), 2)
+
+    def test_reinit_and_retry(self):
+        self.device().get_devinfo()   # link known good, but the logger went to sleep since
+        ser = SleepingSerial(self.logger)
+        device = self.device(ser)
+        self.assertIsNone(device.init().msg)
+        devinfo = device.get_devinfo()
+        self.assertEqual(devinfo.dev_num, '9900112233')
+        self.assertEqual(self.inits(), 1)
+
+        # a failure after a real init is not retried, and forgets the link
+        ser.asleep = True
+        self.assertRaises(Exception, device.get_devinfo)
+        self.assertIsNone(LinkState(self.path).last_ok('/dev/ttyUSB0'))
+        self.assertIsNotNone(device.init().msg)
+
+    def test_state_file(self):
+        state = LinkState(self.path)
+        state.mark('/dev/a', 100.0)
+        state.save()
+        other = LinkState(self.path)
+        other.mark('/dev/b', 200.0)
+        state.mark('/dev/a', 50.0)
+        state.forget('/dev/c')
+        other.save()
+        state.save()
+        loaded = LinkState(self.path)
+        self.assertEqual((loaded.last_ok('/dev/a'), loaded.last_ok('/dev/b')), (100.0, 200.0))
+        state.forget('/dev/a')
+        state.save()
+        self.assertIsNone(LinkState(self.path).last_ok('/dev/a'))
+        with open(self.path, 'w') as f:
+            f.write('{')
+        self.assertIsNone(LinkState(self.path).last_ok('/dev/b'))
+
+    def test_reject_noise_and_flush(self):
+        self.device().get_devinfo()
+        ser = NoisySerial(self.logger)
+        device = self.device(ser)
+        self.assertIsNone(device.init().msg)
+
+        # the junk reply is not taken as an ack, the leftover junk is dropped before the re-init
+        res = device.set_clock(1, datetime(2015, 10, 1))
+        self.assertEqual(bytearray(res.msg)[0], 0x55)
+        self.assertEqual(self.inits(), 1)
+        self.assertEqual(ser._buf, b'')
+
+    def test_bad_body_checksum(self):
+        self.logger.records = [100, 101, 102]
+        device = self.device(CorruptBodySerial(self.logger))
+        self.assertRaises(ResponseError, device.get_data)
+        self.assertIsNone(LinkState(self.path).last_ok('/dev/ttyUSB0'))
+        self.assertIsNotNone(device.init().msg)
+
+
+if __name__ == '__main__':
+    unittest.main()
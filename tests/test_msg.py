@@ -14,6 +14,7 @@ from elitech.msg import (
     _append_checksum,
 )
 from elitech.msg import *
+from tests.helpers import DEVINFO_RC4_110
 from six import (
     b,
 )
@@ -45,8 +46,11 @@ class TestMessages(unittest.TestCase):
 
     def test_InitResponse(self):
         res = InitResponse()
-        res.read(BytesIO(_bin("01 02 03")))
-        self.assertEqual(res.msg, b'\x01\x02\x03')
+        res.read(BytesIO(_bin("55 02 03")))
+        self.assertEqual(res.msg, b'\x55\x02\x03')
+
+        self.assertRaises(ResponseError, InitResponse().read, BytesIO(_bin("01 02 03")))
+        self.assertRaises(ResponseError, InitResponse().read, BytesIO(_bin("55 02")))
 
     def test_DevInfoRequest(self):
         self.assertEqual(DevInfoRequest().to_bytes(), _bin("CC 00 06 00 D2"))
@@ -207,6 +211,29 @@ class TestMessages(unittest.TestCase):
         self.assertEqual(req.to_bytes(), _bin("33 82 05 00 00 00 1E 02 58 FE D4 82 13 00 31 00 "
                                                "31 F1 00 00 00 00 00 00 EC"))
 
+    def test_ParamPutRequest_diff(self):
+        res = DevInfoResponse()
+        res.parse(_bin(DEVINFO_RC4_110))
+        req = res.to_param_put()
+        self.assertEqual(req.diff(res), [])
+
+        req.rec_interval = time(0, 5, 0)
+        req.temp_calibration = res.temp_calibration + 0.3
+        req.alarm = AlarmSetting.T10
+        self.assertEqual([name for name, _, _ in req.diff(res)], ['rec_interval', 'alarm', 'temp_calibration'])
+        self.assertEqual(req.diff(res)[0], ('rec_interval', time(1, 2, 3), time(0, 5, 0)))
+
+    def test_ParamPutRequest_rounding(self):
+        req = ParamPutRequest(1)
+        req.temp_calibration = 1.0 - 0.9
+        self.assertEqual(bytearray(req.to_bytes())[17], 1)
+
+    def test_DevInfoResponse_devnum_trailing_zero(self):
+        from elitech.simulator import SimulatedLogger
+        res = DevInfoResponse()
+        res.parse(SimulatedLogger(dev_num="1234567000").devinfo_bytes())
+        self.assertEqual(res.dev_num, "1234567000")
+
     def test_deleay_value(self):
         req = ParamPutRequest(130)
         self.assertEqual(req.delay_value(0.0), 0x00)
@@ -223,8 +250,10 @@ class TestMessages(unittest.TestCase):
 
     def test_ParamPutResponse(self):
         res = ParamPutResponse()
-        res.read(BytesIO(_bin("01 02 03")))
-        self.assertTrue(res.msg, b'\x01\x02\x03')
+        res.read(BytesIO(_bin("55 02 03")))
+        self.assertTrue(res.msg, b'\x55\x02\x03')
+
+        self.assertRaises(ResponseError, ParamPutResponse().read, BytesIO(_bin("01 02 03")))
 
     def test_DataHeaderRequest(self):
         req = DataHeaderRequest(130)
@@ -242,7 +271,7 @@ class TestMessages(unittest.TestCase):
 
     def test_DataBodyResponse(self):
         res = DataBodyResponse(10)
-        res.read(BytesIO(_bin("55 00 01 FF FF 00 03 00 04 00 05 00 06 00 07 00 08 00 09 00 0A 8C")))
+        res.read(BytesIO(_bin("55 00 01 FF FF 00 03 00 04 00 05 00 06 00 07 00 08 00 09 00 0A 88")))
         self.assertEqual(len(res.records), 10)
         self.assertEqual(res.records, (1, -1, 3, 4, 5, 6, 7, 8, 9, 10))
 
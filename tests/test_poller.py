@@ -0,0 +1,136 @@
+# coding: utf8
+
+__author__ = 'civic'
+
+import unittest
+import threading
+import time as _time
+from datetime import datetime, time, timedelta
+
+from elitech.msg import DevInfoResponse, _bin, _append_checksum
+from elitech.poller import Poller, RecordClock, watch
+from elitech.simulator import SimulatedLogger
+from tests.helpers import DummySerial, body_page, make_device, rc4_110_callback, simulated_device
+
+
+class PollerTest(unittest.TestCase):
+    def test_poll(self):
+        poller = Poller(['a', 'b'], device_factory=make_device, history=2)
+        reading = poller.poll('a')
+        self.assertEqual((reading.port, reading.no, reading.temp, reading.humi), ('a', 110, 10.9, None))
+
+        for _ in range(3):
+            poller.poll('a')
+        self.assertEqual(len(poller.loggers['a'].readings), 2)
+        self.assertEqual(poller.loggers['a'].polls, 4)
+        self.assertEqual(poller.latest()['b'], None)
+
+    def test_poll_error(self):
+        def broken(port):
+            raise IOError("no such port")
+        poller = Poller(['a'], device_factory=broken)
+        self.assertRaises(IOError, poller.poll, 'a')
+        self.assertEqual(poller.loggers['a'].errors, 1)
+
+    def test_start_stop(self):
+        readings = []
+        poller = Poller(['a', 'b', 'c'], device_factory=make_device, min_gap=0.01,
+                        min_interval=0.05, max_interval=0.05, callback=lambda logger, r: readings.append(r.port))
+        poller.start()
+        _time.sleep(0.3)
+        poller.stop()
+        self.assertEqual(readings[:3], ['a', 'b', 'c'])
+        self.assertTrue(len(readings) > 3)
+
+
+class RecordClockTest(unittest.TestCase):
+    def devinfo(self, current):
+        devinfo = DevInfoResponse()
+        devinfo.start_time = datetime(2015, 10, 1, 0, 0, 0)
+        devinfo.rec_interval = time(0, 1, 0)
+        devinfo.current = current
+        return devinfo
+
+    def test_next_boundary(self):
+        now = datetime(2015, 10, 1, 1, 0, 20)
+        clock = RecordClock(self.devinfo(now), now)
+        self.assertEqual(clock.next_boundary(now), datetime(2015, 10, 1, 1, 1, 0))
+        self.assertEqual(clock.seconds_until_next(now, margin=1.0), 41.0)
+        self.assertEqual(clock.seconds_until_next(now, margin=1.0, minimum=60), 101.0)
+        self.assertEqual(clock.record_time(2), datetime(2015, 10, 1, 0, 1, 0))
+
+    def test_not_recording(self):
+        now = datetime(2015, 10, 1, 1, 0, 20)
+        devinfo = self.devinfo(now)
+        devinfo.rec_interval = time(0, 0, 0)
+        clock = RecordClock(devinfo, now)
+        self.assertEqual(clock.seconds_until_next(now, margin=1.0, minimum=10), 10)
+        self.assertEqual(clock.seconds_until_next(now, margin=1.0), 1.0)
+
+    def test_drift(self):
+        # logger clock is 15 sec ahead of host
+        now = datetime(2015, 10, 1, 1, 0, 20)
+        clock = RecordClock(self.devinfo(now + timedelta(seconds=15)), now)
+        self.assertEqual(clock.next_boundary(now), datetime(2015, 10, 1, 1, 0, 45))
+
+
+class WatchTest(unittest.TestCase):
+    def test_watch(self):
+        device = make_device(None)
+        stop = threading.Event()
+        emitted = []
+
+        def callback(rows):
+            emitted.append([row[0] for row in rows])
+            if len(emitted) == 2:
+                stop.set()
+
+        # header answers 110 then 112 records; the pages for 111-112 are read.
+        headers = ["55 00 6E 07 DF 0A 01 00 00 00", "55 00 70 07 DF 0A 01 00 00 00"]
+
+        def serial_callback(length, ba):
+            if ba[0] == 0x33 and ba[2] == 0x01:
+                return _append_checksum(_bin(headers.pop(0) if len(headers) > 1 else headers[0]))
+            elif ba[0] == 0x33 and ba[2] == 0x02 and ba[3] == 1:
+                return body_page(range(100, 100 + (length - 2) // 2))
+            return rc4_110_callback(length, ba)
+        device._ser = DummySerial(None, callback=serial_callback)
+
+        clock_wait = RecordClock.seconds_until_next
+        RecordClock.seconds_until_next = lambda self, now=None, margin=1.0, minimum=0: 0
+        try:
+            watch(device, callback, stop=stop)
+        finally:
+            RecordClock.seconds_until_next = clock_wait
+        self.assertEqual(emitted, [[110], [111, 112]])
+
+    def test_watch_restart(self):
+        logger = SimulatedLogger(records=range(100, 105))
+        device = simulated_device(logger)
+        stop = threading.Event()
+        emitted = []
+
+        def callback(rows):
+            emitted.append([row[0] for row in rows])
+            if len(emitted) == 1:
+                # restarted with more records than before: the count alone does not show it
+                logger.start_time = datetime(2015, 11, 1, 0, 0, 0)
+                logger.records = list(range(200, 207))
+            else:
+                stop.set()
+
+        clock_wait = RecordClock.seconds_until_next
+        RecordClock.seconds_until_next = lambda self, now=None, margin=1.0, minimum=0: 0
+        try:
+            watch(device, callback, stop=stop)
+        finally:
+            RecordClock.seconds_until_next = clock_wait
+        self.assertEqual(emitted, [[5], [1, 2, 3, 4, 5, 6, 7]])
+
+    def test_get_records(self):
+        device = make_device(None)
+        devinfo = device.get_devinfo()
+        rows = device.get_records(devinfo, 99, 110)
+        self.assertEqual([row[0] for row in rows], list(range(99, 111)))
+        self.assertEqual(rows[0][2], 9.8)
+        self.assertEqual(rows[-1], device.get_latest())
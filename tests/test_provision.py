@@ -0,0 +1,118 @@
+# coding: utf8
+
+__author__ = 'civic'
+
+import unittest
+import io
+import os
+import shutil
+import tempfile
+from datetime import datetime, time, timedelta
+
+from elitech.msg import AlarmSetting, ParamPutRequest, StopButton, TemperatureUnit, ToneSet
+from elitech.provision import apply_settings, load_manifest, provision
+from elitech.simulator import PtyLogger, SimulatedLogger
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+class ApplySettingsTest(unittest.TestCase):
+    def test_strings(self):
+        param_put = apply_settings(ParamPutRequest(1), {
+            'interval': '90', 'upper_limit': '8.5', 'lower_limit': '2', 'station_no': '3', 'stop_button': 'y',
+            'delay': '1.5', 'tone_set': 'n', 'alarm': '10', 'temp_unit': 'F', 'temp_calibration': '-0.3',
+            'humi_upper_limit': None, 'dev_num': '1234567891',
+        })
+        self.assertEqual(param_put.rec_interval, time(0, 1, 30))
+        self.assertEqual((param_put.upper_limit, param_put.lower_limit), (8.5, 2.0))
+        self.assertEqual(param_put.update_station_no, 3)
+        self.assertEqual(param_put.stop_button, StopButton.ENABLE)
+        self.assertEqual(param_put.delay, 1.5)
+        self.assertEqual(param_put.tone_set, ToneSet.NONE)
+        self.assertEqual(param_put.alarm, AlarmSetting.T10)
+        self.assertEqual(param_put.temp_unit, TemperatureUnit.F)
+        self.assertEqual(param_put.temp_calibration, -0.3)
+        self.assertEqual(param_put.humi_upper_limit, 0)
+
+    def test_bad_alarm(self):
+        self.assertRaises(ValueError, apply_settings, ParamPutRequest(1), {'alarm': '5'})
+
+
+class ProvisionTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.loggers = [PtyLogger(SimulatedLogger(dev_num="1111111111")),
+                        PtyLogger(SimulatedLogger(model_no=42, dev_num="2222222222"))]
+
+    def tearDown(self):
+        for logger in self.loggers:
+            logger.close()
+        shutil.rmtree(self.dir)
+
+    def write(self, name, text):
+        path = os.path.join(self.dir, name)
+        with io.open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def test_csv(self):
+        self.loggers[0].logger.clock_offset = timedelta(seconds=-30)
+        path = self.write('fleet.csv', u"port,dev_num,interval,upper_limit,alarm,user_info,clock\n"
+                                       u"{},3333333331,60,8.0,3,Dock A,now\n"
+                                       u",2222222222,00:05:00,,,,\n".format(self.loggers[0].path))
+        entries = load_manifest(path)
+        self.assertEqual(entries[1], {'dev_num': '2222222222', 'interval': '00:05:00'})
+
+        ports = [logger.path for logger in self.loggers]
+        results = provision(entries, timeout=1, ports=ports, probe_timeout=0.5)
+        self.assertEqual([(r.port, r.error, r.mismatches) for r in results],
+                         [(self.loggers[0].path, None, []), (self.loggers[1].path, None, [])])
+        self.assertEqual(results[1].changes, [('rec_interval', time(0, 0, 10), time(0, 5, 0))])
+        self.assertEqual([field for field, _, _ in results[0].changes],
+                         ['rec_interval', 'upper_limit', 'alarm', 'dev_num', 'user_info', 'clock'])
+        self.assertEqual(results[0].devinfo.dev_num, "3333333331")
+        self.assertEqual(results[0].devinfo.user_info, "Dock A")
+        self.assertEqual(results[1].devinfo.rec_interval, time(0, 5, 0))
+
+        first = self.loggers[0].logger
+        self.assertEqual(first.param.rec_interval, time(0, 1, 0))
+        self.assertEqual(first.param.alarm, AlarmSetting.T3)
+        self.assertTrue(abs((first.now() - datetime.now()).total_seconds()) < 2)
+        # after the discover probe: init, devinfo, param put, clock, dev num, user info, devinfo in one session
+        self.assertEqual([bytearray(r)[2] for r in first.requests[-7:]], [0x0A, 0x06, 0x05, 0x07, 0x0B, 0x09, 0x06])
+
+        # nothing left to change, the clock is within the threshold: no write command is sent
+        entries[0]['dev_num'] = "3333333331"
+        del first.requests[:]
+        results = provision(entries, timeout=1, ports=ports, probe_timeout=0.5)
+        self.assertEqual([(r.error, r.changes) for r in results], [(None, []), (None, [])])
+        self.assertEqual(set(bytearray(r)[2] for r in first.requests), {0x0A, 0x06})
+
+    def test_only_changed_frames(self):
+        results = provision([{'port': self.loggers[0].path, 'dev_num': '1111111111', 'user_info': 'Dock B',
+                              'temp_calibration': '0.0'}], timeout=1)
+        self.assertEqual(results[0].changes, [('user_info', 'RC-4 Data Logger', 'Dock B')])
+        self.assertEqual([bytearray(r)[2] for r in self.loggers[0].logger.requests], [0x0A, 0x06, 0x09, 0x06])
+
+    def test_not_found(self):
+        results = provision([{'dev_num': '9999999999', 'interval': 60}], ports=[], probe_timeout=0.1)
+        self.assertEqual(results[0].error, "logger 9999999999 not found")
+
+    def test_manifest_errors(self):
+        self.assertRaises(ValueError, load_manifest, self.write('a.csv', u"interval\n60\n"))
+        self.assertRaises(ValueError, load_manifest, self.write('b.csv', u"port,intreval\n/dev/ttyUSB0,60\n"))
+
+    @unittest.skipIf(yaml is None, "PyYAML is not installed")
+    def test_yaml(self):
+        path = self.write('fleet.yaml', u"- port: {}\n  tone_set: y\n  temp_unit: F\n".format(self.loggers[1].path))
+        results = provision(load_manifest(path), timeout=1)
+        self.assertEqual((results[0].error, results[0].mismatches), (None, []))
+        self.assertEqual(results[0].devinfo.tone_set, ToneSet.PERMIT)
+        self.assertEqual(results[0].devinfo.temp_unit, TemperatureUnit.F)
+
+
+if __name__ == '__main__':
+    unittest.main()
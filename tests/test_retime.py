@@ -0,0 +1,86 @@
+# coding: utf8
+
+__author__ = 'civic'
+
+import unittest
+import io
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+from elitech.clock import DriftHistory, DriftSample
+
+try:
+    from elitech.retime import history_offsets, retime, retime_files, retime_rows
+except ImportError:
+    retime = None
+
+
+@unittest.skipIf(retime is None, "numpy is not installed")
+class RetimeTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_retime(self):
+        start = datetime(2026, 1, 1)
+        times = [start + timedelta(hours=h) for h in range(11)]
+        # 0 s ahead at the first record, 10 s ahead at the last
+        fixed = retime(times, 0.0, 10.0).tolist()
+        self.assertEqual(fixed[0], start)
+        self.assertEqual(fixed[5], start + timedelta(hours=5, seconds=-5))
+        self.assertEqual(fixed[10], start + timedelta(hours=10, seconds=-10))
+
+        # offsets observed outside the recording
+        fixed = retime(times, 2.0, 4.0, start=start - timedelta(hours=10), end=start + timedelta(hours=10)).tolist()
+        self.assertEqual(fixed[0], start - timedelta(seconds=3))
+        self.assertEqual(len(retime([], 0, 1)), 0)
+
+    def test_rows(self):
+        rows = [(1, datetime(2026, 1, 1), 20.0, 50.0), (2, datetime(2026, 1, 1, 0, 10), 20.1, 50.5)]
+        self.assertEqual(retime_rows(rows, -1.5, -1.5),
+                         [(1, datetime(2026, 1, 1, 0, 0, 1, 500000), 20.0, 50.0),
+                          (2, datetime(2026, 1, 1, 0, 10, 1, 500000), 20.1, 50.5)])
+
+    def test_history_offsets(self):
+        history = DriftHistory()
+        t0 = datetime(2026, 1, 1)
+        history.add("A", DriftSample(t0, 0.0, 0.01))
+        history.add("A", DriftSample(t0 + timedelta(days=10), 20.0, 0.01))
+        start, end = history_offsets(history, "A", t0 + timedelta(days=1), t0 + timedelta(days=9))
+        self.assertAlmostEqual(start, 2.0, 3)
+        self.assertAlmostEqual(end, 18.0, 3)
+        self.assertEqual(history_offsets(history, "B", t0, t0), None)
+
+    def test_files(self):
+        tasks = []
+        for n in range(3):
+            path = os.path.join(self.dir, '99001122{:02d}_a.tsv'.format(n))
+            with io.open(path, 'w', encoding='utf-8') as f:
+                f.write(u"1\t2026-01-01 00:00:00\t20.0\n2\t2026-01-01 01:00:00\t20.5\t55.0\n")
+            tasks.append((path, 0.0, 60.0 * (n + 1)))
+        out = os.path.join(self.dir, 'out')
+        self.assertEqual(retime_files(tasks, out, processes=2), 6)
+        with io.open(os.path.join(out, '9900112202_a.tsv'), encoding='utf-8') as f:
+            self.assertEqual(f.read(), u"1\t2026-01-01 00:00:00\t20.0\n2\t2026-01-01 00:57:00\t20.5\t55.0\n")
+
+    def test_files_same_name(self):
+        tasks = []
+        for n, week in enumerate(('week1', 'week2')):
+            os.makedirs(os.path.join(self.dir, 'in', week))
+            path = os.path.join(self.dir, 'in', week, 'dev1.tsv')
+            with io.open(path, 'w', encoding='utf-8') as f:
+                f.write(u"1\t2026-01-01 00:00:00\t20.0\n")
+            tasks.append((path, 60.0 * (n + 1), 60.0 * (n + 1)))
+        out = os.path.join(self.dir, 'out')
+        self.assertEqual(retime_files(tasks, out, processes=1), 2)
+        with io.open(os.path.join(out, 'week2', 'dev1.tsv'), encoding='utf-8') as f:
+            self.assertEqual(f.read(), u"1\t2025-12-31 23:58:00\t20.0\n")
+        self.assertTrue(os.path.exists(os.path.join(out, 'week1', 'dev1.tsv')))
+
+
+if __name__ == '__main__':
+    unittest.main()
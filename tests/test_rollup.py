@@ -0,0 +1,70 @@
+# coding: utf8
+
+__author__ = 'civic'
+
+import unittest
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+from elitech.convert import RollupSink
+from elitech.rollup import RollupIndex
+
+
+class RollupIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'rollup.db')
+        self.start = datetime(2026, 1, 1)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def rows(self, first, last, humi=False):
+        # one record per 30 seconds
+        return [(no, self.start + timedelta(seconds=30 * (no - 1)), float(no % 50) / 10) + ((60.0,) if humi else ())
+                for no in range(first, last + 1)]
+
+    def test_levels(self):
+        index = RollupIndex(self.path)
+        rows = self.rows(1, 3 * 2880)  # 3 days
+        for p in range(0, len(rows), 100):
+            index.add('a', rows[p:p + 100])
+        self.assertEqual(index.add('a', rows[:500]), 0)
+
+        end = self.start + timedelta(days=3)
+        self.assertEqual(index.level_for(self.start, end, 5000), 60)
+        self.assertEqual(index.level_for(self.start, end, 100), 3600)
+        self.assertEqual(index.level_for(self.start, end, 3), 86400)
+        self.assertEqual(index.level_for(self.start, end, 1), 86400)
+
+        days = index.query('a', self.start, end, max_points=3)
+        self.assertEqual([p.time for p in days], [self.start + timedelta(days=d) for d in range(3)])
+        values = [row[2] for row in rows[:2880]]
+        self.assertEqual((days[0].count, days[0].min, days[0].max), (2880, min(values), max(values)))
+        self.assertAlmostEqual(days[0].mean, sum(values) / 2880)
+
+        hours = index.query('a', self.start + timedelta(minutes=90), self.start + timedelta(hours=5), max_points=10)
+        self.assertEqual([p.time.hour for p in hours], [1, 2, 3, 4])
+        self.assertEqual(hours[0].count, 120)
+        index.close()
+
+        # reopened index continues after the last record
+        index = RollupIndex(self.path)
+        self.assertEqual(index.last_no('a'), 3 * 2880)
+        index.add('a', self.rows(1, 3 * 2880 + 2))
+        self.assertEqual(index.query('a', end, end + timedelta(minutes=1))[0].count, 2)
+        self.assertEqual(index.sources(), ['a'])
+        index.close()
+
+    def test_sink(self):
+        sink = RollupSink(self.path)
+        sink.write('b', None, self.rows(1, 10, humi=True))
+        humi = sink.index.query('b', self.start, self.start + timedelta(hours=1), channel='humi')
+        self.assertEqual([(p.count, p.mean) for p in humi], [(2, 60.0)] * 5)
+        sink.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+# coding: utf8
+
+__author__ = 'civic'
+
+import time as _time
+import unittest
+from datetime import datetime, time, timedelta
+
+from elitech.msg import AlarmSetting, ResponseError
+from elitech.simulator import SimulatedLogger, SimulatedSerial
+from tests.helpers import simulated_device
+
+
+class DroppingSerial(SimulatedSerial):
+    """
+    no answer from the second data body request on.
+    """
+
+    def __init__(self, logger):
+        SimulatedSerial.__init__(self, logger)
+        self.bodies = 0
+
+    def write(self, ba):
+        SimulatedSerial.write(self, ba)
+        if bytearray(ba)[0] == 0x33 and bytearray(ba)[2] == 0x02:
+            self.bodies += 1
+            if self.bodies > 1:
+                self._buf = b''
+
+
+class SimulatorTest(unittest.TestCase):
+    def test_get_data_rc4hc(self):
+        logger = SimulatedLogger(model_no=42, rec_interval=time(0, 0, 30))
+        for n in range(250):
+            logger.add_record(20 + n / 10.0, 50.5)
+        data = simulated_device(logger).get_data()
+        self.assertEqual(len(data), 250)
+        self.assertEqual(data[-1], (250, datetime(2015, 10, 1) + timedelta(seconds=30 * 249), 44.9, 50.5))
+
+    def test_get_data_read_ahead(self):
+        logger = SimulatedLogger(records=[n % 400 - 100 for n in range(2050)])
+        expect = simulated_device(logger).get_data()
+        pages = []
+        device = simulated_device(logger)
+        device._ser.latency = 0.001
+        self.assertEqual(device.get_data(pages.append, read_ahead=2), [])
+        self.assertEqual([len(rows) for rows in pages], [100] * 20 + [50])
+        self.assertEqual(sum(pages, []), expect)
+        self.assertEqual(device.get_data(read_ahead=2), expect)
+
+        def fail(rows):
+            raise IOError("sink full")
+        self.assertRaises(IOError, device.get_data, fail, read_ahead=2)
+
+    def test_read_ahead_keeps_exchange_error(self):
+        logger = SimulatedLogger(records=range(300))
+        device = simulated_device(logger, DroppingSerial(logger))
+
+        def slow_fail(rows):
+            _time.sleep(0.1)
+            raise ValueError("sink full")
+        # the link failed while the first page was decoding. the link error is reported
+        self.assertRaises(ResponseError, device.get_data, slow_fail, read_ahead=2)
+
+    def test_get_latest_after_restart(self):
+        logger = SimulatedLogger(records=range(10))
+        device = simulated_device(logger)
+        devinfo = device.get_devinfo()
+        logger.start_time = datetime(2016, 1, 1)
+        logger.records = [100, 101]
+        self.assertEqual(device.get_latest(devinfo=devinfo), (2, datetime(2016, 1, 1, 0, 0, 10), 10.1))
+
+    def test_param_put(self):
+        logger = SimulatedLogger(clock_offset=timedelta(hours=-1))
+        device = simulated_device(logger)
+        param_put = device.get_devinfo().to_param_put()
+        param_put.upper_limit = 8.0
+        param_put.alarm = AlarmSetting.T10
+        param_put.update_station_no = 5
+        device.update(param_put)
+        device.set_device_number(5, "1234567891")
+        device.set_clock(5)
+
+        devinfo = device.get_devinfo()
+        self.assertEqual((devinfo.upper_limit, devinfo.alarm, devinfo.station_no), (8.0, AlarmSetting.T10, 5))
+        self.assertEqual(devinfo.dev_num, "1234567891")
+        self.assertTrue(abs((devinfo.current - datetime.now()).total_seconds()) < 2)
@@ -0,0 +1,116 @@
+# coding: utf8
+
+__author__ = 'civic'
+
+import unittest
+import math
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+import elitech
+from elitech.dump import dump_data
+from elitech.stats import RecordStats, Summary, dump_stats
+from tests.helpers import DummySerial, rc4_110_callback
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def mkt(values, delta_h=83.144):
+    k = delta_h * 1000 / 8.3144598
+    return k / -math.log(sum(math.exp(-k / (v + 273.15)) for v in values) / len(values)) - 273.15
+
+
+class SummaryTest(unittest.TestCase):
+    values = [((n * 37) % 101 - 20) / 10.0 + 5 for n in range(1000)]
+
+    def test_summary(self):
+        summary = Summary().update(self.values)
+        self.assertEqual(summary.count, 1000)
+        self.assertEqual((summary.min, summary.max), (min(self.values), max(self.values)))
+        self.assertAlmostEqual(summary.mean, sum(self.values) / 1000)
+        self.assertAlmostEqual(summary.mkt(), mkt(self.values), 9)
+        self.assertEqual(Summary().mkt(), None)
+        self.assertEqual(Summary(None).update([20.0]).mkt(), None)
+
+    def test_fahrenheit(self):
+        fahrenheit = [v * 9 / 5.0 + 32 for v in self.values]
+        summary = Summary(unit='F').update(fahrenheit)
+        self.assertAlmostEqual(summary.mkt(), mkt(self.values) * 9 / 5.0 + 32, 6)
+        self.assertAlmostEqual(Summary.from_dict(summary.to_dict()).mkt(), summary.mkt(), 9)
+        self.assertRaises(ValueError, Summary().update(self.values).merge, summary)
+        self.assertRaises(ValueError, Summary, unit='K')
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_percentile(self):
+        summary = Summary().update(self.values)
+        for q in (0, 5, 50, 95, 99.5, 100):
+            self.assertAlmostEqual(summary.percentile(q), numpy.percentile(self.values, q))
+
+    def test_merge(self):
+        merged = Summary().update(self.values[:300]).merge(Summary().update(self.values[300:]))
+        whole = Summary().update(self.values)
+        self.assertEqual(merged.histogram, whole.histogram)
+        self.assertAlmostEqual(merged.mkt(), whole.mkt(), 9)
+        restored = Summary.from_dict(merged.to_dict())
+        self.assertEqual((restored.count, restored.min, restored.max), (1000, whole.min, whole.max))
+        self.assertAlmostEqual(restored.mkt(), whole.mkt(), 9)
+        self.assertRaises(ValueError, Summary(100.0).update([1.0]).merge, whole)
+
+
+class RecordStatsTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def rows(self, first, last):
+        start = datetime(2026, 1, 1)
+        return [(no, start + timedelta(minutes=10 * (no - 1)), 2.0 + no % 7, 50.0) for no in range(first, last + 1)]
+
+    def test_incremental_and_windows(self):
+        stats = RecordStats(bucket=timedelta(hours=1))
+        stats(self.rows(1, 100))
+        stats(self.rows(1, 130))   # tail download of the same recording
+        self.assertEqual((stats.temp.count, stats.humi.count, stats.last_no), (130, 130, 130))
+
+        whole = Summary().update(row[2] for row in self.rows(1, 130))
+        self.assertAlmostEqual(stats.temp.mkt(), whole.mkt(), 9)
+        self.assertEqual(stats.window(datetime(2026, 1, 1), datetime(2026, 1, 1, 2)).count, 12)
+        rolling = stats.rolling(timedelta(hours=3))
+        self.assertEqual(rolling[0][0], datetime(2026, 1, 1, 1))
+        self.assertEqual([s.count for _, s in rolling[:4]], [6, 12, 18, 18])
+
+        path = os.path.join(self.dir, 'stats.json')
+        stats.save(path)
+        loaded = RecordStats.load(path)
+        self.assertEqual(loaded.to_dict(), stats.to_dict())
+        loaded(self.rows(131, 140))
+        self.assertEqual(loaded.temp.count, 140)
+
+        other = RecordStats(bucket=timedelta(hours=1))
+        other(self.rows(1, 10))
+        loaded.merge(other)
+        self.assertEqual((loaded.temp.count, loaded.last_no), (150, None))
+
+    def test_dump_stats(self):
+        device = elitech.Device(None)
+        device.wait_time = 0
+        device._ser = DummySerial(None, callback=rc4_110_callback)
+        dump_data(device, self.dir)
+
+        stats = dump_stats(self.dir)
+        self.assertEqual((stats.temp.count, stats.temp.min, stats.temp.max), (110, 0.0, 10.9))
+        self.assertTrue(os.path.exists(os.path.join(self.dir, 'stats.json')))
+        os.remove(os.path.join(self.dir, 'page_000.bin'))
+        # reused without reading pages
+        self.assertEqual(dump_stats(self.dir).temp.count, 110)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+# coding: utf8
+
+__author__ = 'civic'
+
+import unittest
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+import elitech
+from elitech.dump import dump_data
+from tests.helpers import DummySerial, rc4_110_callback
+
+try:
+    import numpy
+    from elitech.stitch import Gap, SessionKey, Stitcher, stitch_dumps
+except ImportError:
+    numpy = None
+
+Info = namedtuple('Info', ['dev_num', 'station_no', 'start_time'])
+CountedInfo = namedtuple('CountedInfo', ['dev_num', 'station_no', 'start_time', 'rec_count', 'rec_interval'])
+
+
+def rows(start, first, last, step=60):
+    return [(no, start + timedelta(seconds=step * (no - 1)), no / 10.0) for no in range(first, last + 1)]
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class StitcherTest(unittest.TestCase):
+    first = datetime(2026, 1, 1)
+    second = datetime(2026, 1, 2)
+
+    def test_overlapping_downloads(self):
+        info = Info('9900112233', 1, self.first)
+        stitcher = Stitcher()
+        # re-downloads of a growing recording, and one that missed records 21 - 30
+        stitcher.add(info, rows(self.first, 1, 50))
+        stitcher.add(info, rows(self.first, 1, 20) + rows(self.first, 31, 80))
+        stitcher.add(info, rows(self.first, 60, 100))
+        stitcher.add(info, [])
+
+        merged = stitcher.records(SessionKey('9900112233', 1, self.first))
+        self.assertEqual(list(merged['no']), list(range(1, 101)))
+        self.assertEqual(merged['temp'][-1], 10.0)
+
+        timeline = stitcher.timeline('9900112233', 1)
+        self.assertEqual(len(timeline), 100)
+        self.assertEqual(timeline.rows(), rows(self.first, 1, 100))
+        self.assertEqual(timeline.gaps, [])
+
+    def test_timeline_gaps(self):
+        stitcher = Stitcher()
+        stitcher.add(Info('9900112233', 1, self.second), rows(self.second, 1, 10))
+        stitcher.add(Info('9900112233', 1, self.first), rows(self.first, 1, 5) + rows(self.first, 8, 10))
+        stitcher.add(Info('9900112233', 2, self.first), rows(self.first, 1, 3))
+        stitcher.add(Info('9900445566', 1, self.first), rows(self.first, 1, 3))
+        self.assertEqual(stitcher.loggers(), [('9900112233', 1), ('9900112233', 2), ('9900445566', 1)])
+
+        timeline = stitcher.timeline('9900112233', 1)
+        self.assertEqual([key.start_time for key in timeline.sessions], [self.first, self.second])
+        self.assertEqual(list(timeline.columns['session']), [0] * 8 + [1] * 10)
+        self.assertEqual(list(timeline.columns['no'][:9]), [1, 2, 3, 4, 5, 8, 9, 10, 1])
+        self.assertEqual(timeline.gaps, [
+            Gap(self.first + timedelta(minutes=4), self.first + timedelta(minutes=7), 'missing', 0),
+            Gap(self.first + timedelta(minutes=9), self.second, 'session', 1),
+        ])
+
+    def test_leading_and_trailing_gaps(self):
+        stitcher = Stitcher()
+        # the logger had 20 records, only 4 - 15 were downloaded
+        stitcher.add(CountedInfo('9900112233', 1, self.first, 15, time(0, 1, 0)), rows(self.first, 4, 15))
+        stitcher.add(CountedInfo('9900112233', 1, self.first, 20, time(0, 1, 0)), rows(self.first, 10, 12))
+        self.assertEqual(stitcher.rec_count(SessionKey('9900112233', 1, self.first)), 20)
+
+        timeline = stitcher.timeline('9900112233', 1)
+        self.assertEqual(timeline.gaps, [
+            Gap(self.first, self.first + timedelta(minutes=3), 'missing', 0),
+            Gap(self.first + timedelta(minutes=14), self.first + timedelta(minutes=19), 'missing', 0),
+        ])
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class StitchDumpsTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_stitch_dumps(self):
+        for name in ('a', 'b'):
+            device = elitech.Device(None)
+            device.wait_time = 0
+            device._ser = DummySerial(None, callback=rc4_110_callback)
+            dump_data(device, os.path.join(self.dir, name))
+
+        stitcher = stitch_dumps([self.dir])
+        (dev_num, station_no), = stitcher.loggers()
+        timeline = stitcher.timeline(dev_num, station_no)
+        self.assertEqual(len(timeline.sessions), 1)
+        self.assertEqual(list(timeline.columns['no']), list(range(1, 111)))
+        self.assertEqual(timeline.gaps, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
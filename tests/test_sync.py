@@ -0,0 +1,163 @@
+# coding: utf8
+
+__author__ = 'civic'
+
+import unittest
+import threading
+import time
+
+import elitech
+from elitech.sync import FairLock, ReadAhead, SingleFlight
+from tests.helpers import DummySerial, rc4_110_callback
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_shared_result(self):
+        flight = SingleFlight()
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return object()
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do('k', slow)))
+        leader.start()
+        started.wait()
+        followers = [threading.Thread(target=lambda: results.append(flight.do('k', slow))) for _ in range(3)]
+        for t in followers:
+            t.start()
+        time.sleep(0.05)
+        release.set()
+        for t in [leader] + followers:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(r is results[0] for r in results))
+        # next call after completion runs again
+        flight.do('k', slow)
+        self.assertEqual(len(calls), 2)
+
+    def test_error(self):
+        flight = SingleFlight()
+
+        def fail():
+            raise IOError("timeout")
+        self.assertRaises(IOError, flight.do, 'k', fail)
+
+
+class FairLockTest(unittest.TestCase):
+    def test_arrival_order(self):
+        lock = FairLock()
+        order = []
+        lock.acquire()
+        threads = []
+        for i in range(5):
+            t = threading.Thread(target=lambda i=i: (lock.acquire(), order.append(i), lock.release()))
+            t.start()
+            threads.append(t)
+            time.sleep(0.02)
+        lock.release()
+        for t in threads:
+            t.join()
+        self.assertEqual(order, [0, 1, 2, 3, 4])
+
+    def test_reentrant(self):
+        lock = FairLock()
+        with lock:
+            with lock:
+                pass
+        self.assertRaises(RuntimeError, lock.release)
+
+
+class ReadAheadTest(unittest.TestCase):
+    def test_order_and_bound(self):
+        consumed = []
+        release = threading.Event()
+
+        def consume(item):
+            release.wait()
+            consumed.append(item)
+
+        worker = ReadAhead(consume, 2)
+        worker.put(0)   # taken by the worker, waiting for release
+        time.sleep(0.05)
+        worker.put(1)
+        worker.put(2)
+        t = threading.Thread(target=worker.put, args=(3,))
+        t.start()
+        t.join(0.1)
+        self.assertTrue(t.is_alive())   # queue full
+        release.set()
+        t.join()
+        worker.close()
+        self.assertEqual(consumed, [0, 1, 2, 3])
+
+    def test_error(self):
+        consumed = []
+
+        def consume(item):
+            if item == 1:
+                raise ValueError(item)
+            consumed.append(item)
+
+        worker = ReadAhead(consume, 1)
+        worker.put(0)
+        worker.put(1)
+        worker.put(2)
+        self.assertRaises(ValueError, worker.close)
+        self.assertEqual(consumed, [0])
+
+
+class DeviceConcurrencyTest(unittest.TestCase):
+    def test_coalesced_devinfo(self):
+        requests = []
+
+        def callback(length, ba):
+            requests.append(ba[2] if ba[0] == 0xCC else None)
+            time.sleep(0.05)
+            return rc4_110_callback(length, ba)
+
+        device = elitech.Device(None)
+        device.wait_time = 0
+        device._ser = DummySerial(None, callback=callback)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(device.get_devinfo())) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(results), 4)
+        self.assertEqual(requests, [0x06])
+        self.assertEqual(results[0].dev_num, "9900112233")
+
+    def test_devinfo_inside_session(self):
+        device = elitech.Device(None)
+        device.wait_time = 0
+        device._ser = DummySerial(None, callback=rc4_110_callback)
+
+        results = []
+        other = threading.Thread(target=lambda: results.append(device.get_devinfo()))
+
+        def in_session():
+            with device.session():
+                # the other thread leads the devinfo flight and waits for the port
+                other.start()
+                while ('devinfo',) not in device._flight._calls:
+                    time.sleep(0.01)
+                results.append(device.get_devinfo())
+
+        owner = threading.Thread(target=in_session)
+        owner.daemon = True
+        other.daemon = True
+        owner.start()
+        owner.join(5)
+        other.join(5)
+        self.assertFalse(owner.is_alive() or other.is_alive())
+        self.assertEqual([r.dev_num for r in results], ["9900112233"] * 2)
@@ -0,0 +1,89 @@
+# coding: utf8
+
+__author__ = 'civic'
+
+import unittest
+import threading
+
+import elitech
+from elitech.threaded import ThreadedDevice
+from tests.helpers import DummySerial, rc4_110_callback
+
+
+class CountingSerial(DummySerial):
+    def __init__(self, callback):
+        DummySerial.__init__(self, None, callback=callback)
+        self.opened = 0
+        self.is_open = False
+
+    def open(self):
+        assert not self.is_open
+        self.is_open = True
+        self.opened += 1
+
+    def close(self):
+        self.is_open = False
+
+
+class ThreadedDeviceTest(unittest.TestCase):
+    def setUp(self):
+        self.device = elitech.Device(None)
+        self.device.wait_time = 0
+        self.device._ser = CountingSerial(rc4_110_callback)
+
+    def test_futures(self):
+        with ThreadedDevice(self.device, idle_timeout=1.0) as threaded:
+            futures = []
+            threads = [threading.Thread(target=lambda: futures.append(threaded.get_latest())) for _ in range(8)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            data = threaded.get_data().result()
+            for f in futures:
+                self.assertEqual(f.result()[0], 110)
+        self.assertEqual(len(data), 110)
+        self.assertEqual(self.device._ser.opened, 1)
+        self.assertFalse(self.device._ser.is_open)
+
+    def test_exception(self):
+        with ThreadedDevice(self.device) as threaded:
+            future = threaded.raw_send(b'\x00\x00\x00', 3)
+            self.assertRaises(ValueError, future.result)
+            self.assertEqual(threaded.get_devinfo().result().dev_num, "9900112233")
+
+    def test_open_error(self):
+        ser = self.device._ser
+        ser_open = ser.open
+        failures = [IOError("port busy")]
+        queued = threading.Event()
+
+        def flaky_open():
+            if failures:
+                queued.wait(2)
+                raise failures.pop()
+            ser_open()
+        ser.open = flaky_open
+
+        with ThreadedDevice(self.device) as threaded:
+            first = threaded.get_latest()
+            second = threaded.get_devinfo()   # queued while the port fails to open
+            queued.set()
+            self.assertRaises(IOError, first.result, 2)
+            self.assertRaises(IOError, second.result, 2)
+            self.assertEqual(threaded.get_devinfo().result(2).dev_num, "9900112233")
+
+    def test_idle_close(self):
+        with ThreadedDevice(self.device, idle_timeout=0.01) as threaded:
+            threaded.get_devinfo().result()
+            threading.Event().wait(0.1)
+            self.assertFalse(self.device._ser.is_open)
+            threaded.get_devinfo().result()
+        self.assertEqual(self.device._ser.opened, 2)
+
+    def test_session(self):
+        with self.device.session():
+            self.device.init()
+            self.device.get_devinfo()
+            self.device.get_latest()
+        self.assertEqual(self.device._ser.opened, 1)